@@ -6,15 +6,25 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
-from app.core.database import engine, Base
-from app.routers import health, workflow_runs, workflow_steps, orchestration, streams, approvals
+from app.core.database import (
+    ReadYourWritesMiddleware, dispose_async_engines, engine, Base,
+)
+from app.routers import (
+    health, workflow_runs, workflow_steps, orchestration, streams, approvals, multiplex,
+)
+from services.timeline import timeline_writer
+from services.timeline_hub import timeline_hub
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Create database tables on startup."""
+    """Create database tables on startup; flush buffered timeline events on shutdown."""
     Base.metadata.create_all(bind=engine)
+    timeline_writer.start()
     yield
+    await timeline_hub.stop()
+    timeline_writer.close()
+    await dispose_async_engines()
 
 
 def create_app() -> FastAPI:
@@ -35,6 +45,7 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    app.add_middleware(ReadYourWritesMiddleware)
 
     # ── Routers ─────────────────────────────────────
     app.include_router(health.router, tags=["Health"])
@@ -51,5 +62,6 @@ def create_app() -> FastAPI:
     app.include_router(orchestration.router, tags=["Orchestration"])
     app.include_router(streams.router, tags=["Streams"])
     app.include_router(approvals.router, tags=["Approvals"])
+    app.include_router(multiplex.router, tags=["Streams"])
 
     return app
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark: whole-engine step throughput in embedded SQLite mode.
+
+Submits workflows through the orchestrator and drives each one to
+completion with `drive_run`, as the run dispatcher's workers do, from
+several worker threads at once. High-risk steps are approved through
+the approval service as soon as their run parks. Needs no external
+services: the database is a SQLite file.
+
+Usage:
+    python benchmarks/bench_embedded.py
+    python benchmarks/bench_embedded.py --runs 400 --workers 1 4 8
+    SQLITE_WRITE_GATE=false python benchmarks/bench_embedded.py   # SQLite's busy handler only
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench_embedded.db")
+
+from sqlalchemy import func, select  # noqa: E402
+
+from config import settings  # noqa: E402
+from db import Base, SchedulerSessionLocal, SessionLocal, engine  # noqa: E402
+from models import RunState, User, WorkflowRun, WorkflowStep  # noqa: E402
+from models.workflows import TERMINAL_RUN_STATES  # noqa: E402
+from services.approval import ApprovalService  # noqa: E402
+from services.dispatcher import drive_run  # noqa: E402
+from services.orchestrator import Orchestrator  # noqa: E402
+
+# Five steps, one of them L3 (approval required)
+INTENT = "Apply to 2 backend jobs, schedule gym 3x this week, plan groceries"
+
+
+def submit() -> int:
+    db = SessionLocal()
+    try:
+        return Orchestrator(db).create_workflow(user_id=1, intent=INTENT).id
+    finally:
+        db.close()
+
+
+def drive(run_id: int) -> None:
+    """Drive the run, approving whatever it parks on, until it finishes."""
+    while drive_run(run_id) not in TERMINAL_RUN_STATES:
+        db = SchedulerSessionLocal()
+        try:
+            approvals = ApprovalService(db)
+            for approval in approvals.get_pending_approvals(run_id):
+                approvals.approve_step(approval.id, decided_by=1)
+        finally:
+            db.close()
+
+
+def workflow(_) -> None:
+    drive(submit())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        if db.get(User, 1) is None:
+            db.add(User(id=1, email="bench@example.com", hashed_password="x"))
+            db.commit()
+
+    gate = "on" if settings.SQLITE_WRITE_GATE else "off"
+    print(f"{engine.url.render_as_string()}, write gate {gate}")
+    print(f"{args.runs} runs per row\n")
+    print(f"{'workers':>7} {'runs/s':>8} {'steps/s':>8} {'ms/run':>8} {'completed':>10}")
+
+    for workers in args.workers:
+        with SessionLocal() as db:
+            before = db.scalar(select(func.count()).select_from(WorkflowStep))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(workers) as pool:
+            list(pool.map(workflow, range(args.runs)))
+        elapsed = time.perf_counter() - start
+
+        with SessionLocal() as db:
+            steps = db.scalar(select(func.count()).select_from(WorkflowStep)) - before
+            completed = db.scalar(
+                select(func.count())
+                .select_from(WorkflowRun)
+                .where(WorkflowRun.state == RunState.COMPLETED)
+            )
+
+        print(
+            f"{workers:>7} {args.runs / elapsed:>8.1f} {steps / elapsed:>8.1f} "
+            f"{elapsed / args.runs * 1000:>8.2f} {completed:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark: serialization CPU per delivered timeline event.
+
+Compares the old read path, where every subscriber re-parses the stored
+metadata and re-encodes the whole event, with pre-serialized payloads,
+where each delivery is a byte splice of a payload encoded at write time.
+
+Usage:
+    python benchmarks/bench_sse_serialization.py
+    python benchmarks/bench_sse_serialization.py --events 5000 --subscribers 1 10 100
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.frames import encode_payload, sse_frame  # noqa: E402
+from services.tools import execute_job_search  # noqa: E402
+
+
+def make_events(count: int) -> list[dict]:
+    """Build stored event rows with a realistic tool result as metadata."""
+    result = execute_job_search(None, {})
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "id": i + 1,
+            "event_type": "step_succeeded",
+            "message": "Step succeeded: Search for backend jobs",
+            "created_at": now,
+            "metadata": json.dumps({"result": result}),
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_frame(row: dict) -> bytes:
+    """Old path: json.loads + json.dumps per subscriber per event."""
+    event_data = {
+        "id": row["id"],
+        "event": row["event_type"],
+        "message": row["message"],
+        "timestamp": row["created_at"].isoformat(),
+        "metadata": json.loads(row["metadata"]) if row["metadata"] else {},
+    }
+    return f"data: {json.dumps(event_data)}\n\n".encode()
+
+
+def bench_legacy(rows: list[dict], subscribers: int) -> float:
+    start = time.process_time()
+    for _ in range(subscribers):
+        for row in rows:
+            legacy_frame(row)
+    return time.process_time() - start
+
+
+def bench_preserialized(payloads: list[tuple[int, bytes]], subscribers: int) -> float:
+    start = time.process_time()
+    for _ in range(subscribers):
+        for event_id, payload in payloads:
+            sse_frame(event_id, payload)
+    return time.process_time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[1, 10, 100])
+    args = parser.parse_args()
+
+    rows = make_events(args.events)
+
+    # Write-time cost, paid once per event regardless of subscriber count
+    start = time.process_time()
+    payloads = [
+        (
+            row["id"],
+            encode_payload(
+                row["event_type"],
+                row["message"],
+                row["created_at"].isoformat(),
+                json.loads(row["metadata"]),
+            ),
+        )
+        for row in rows
+    ]
+    write_cost = time.process_time() - start
+
+    print(f"{args.events} events, payload ~{len(payloads[0][1])} bytes")
+    print(f"write-time encode: {write_cost / args.events * 1e6:.2f} µs/event (once)\n")
+    print(f"{'subscribers':>11} {'legacy µs/deliv':>16} {'preser. µs/deliv':>17} {'speedup':>8}")
+
+    for subscribers in args.subscribers:
+        deliveries = args.events * subscribers
+        legacy = bench_legacy(rows, subscribers) / deliveries * 1e6
+        pre = bench_preserialized(payloads, subscribers) / deliveries * 1e6
+        print(f"{subscribers:>11} {legacy:>16.2f} {pre:>17.2f} {legacy / pre:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
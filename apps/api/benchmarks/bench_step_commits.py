@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark: database cost of completing one workflow step.
+
+Compares the previous path (RUNNING commit, ToolCall + SUCCEEDED commit,
+then STEP_READY and STEP_SUCCEEDED committed one by one by the
+scheduler loop) with `Executor.execute_step`, which commits the tool
+call, the transition, the run summary and the event together, with
+and without a claim. STEP_READY now rides on the scheduler's READY
+commit, which both paths pay and which is not measured. Reports
+commits, statements and wall time per step; events use the SYNC
+timeline writer, as each used to commit on its own.
+
+Runs against DATABASE_URL, or a temporary SQLite file when unset.
+
+Usage:
+    python benchmarks/bench_step_commits.py
+    DATABASE_URL=postgresql+psycopg2://... python benchmarks/bench_step_commits.py --steps 2000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench_step_commits.db"
+)
+
+from sqlalchemy import event, insert  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+from db import Base, SessionLocal, engine  # noqa: E402
+from models import (  # noqa: E402
+    EventType, RunState, StepState, ToolCall, ToolCallStatus, User, WorkflowRun, WorkflowStep,
+)
+from services.executor import Executor  # noqa: E402
+from services.run_summary import refresh_run_summary  # noqa: E402
+from services.timeline import DurabilityMode, TimelineWriter  # noqa: E402
+
+STEPS_PER_RUN = 10
+
+
+class Counter:
+    """Counts statements and commits on every engine (the writer has its own pool)."""
+
+    def __init__(self):
+        self.statements = self.commits = 0
+        event.listen(Engine, "before_cursor_execute", self._statement)
+        event.listen(Engine, "commit", self._commit)
+
+    def _statement(self, *args):
+        self.statements += 1
+
+    def _commit(self, *args):
+        self.commits += 1
+
+    def reset(self):
+        self.statements = self.commits = 0
+
+
+def seed(db, steps: int) -> list[int]:
+    """READY steps spread over runs; returns their ids."""
+    run_ids = []
+    for _ in range(0, steps, STEPS_PER_RUN):
+        run = WorkflowRun(user_id=1, intent="bench", state=RunState.EXECUTING)
+        db.add(run)
+        db.flush()
+        run_ids.append(run.id)
+
+    db.execute(
+        insert(WorkflowStep),
+        [
+            {"run_id": run_ids[i // STEPS_PER_RUN], "name": f"step {i}", "tool": "generic",
+             "state": StepState.READY, "attempt": 0, "depends_on": []}
+            for i in range(steps)
+        ],
+    )
+    for run_id in run_ids:
+        refresh_run_summary(db, run_id)
+    db.commit()
+    return [step.id for step in db.query(WorkflowStep).filter(
+        WorkflowStep.run_id.in_(run_ids)).order_by(WorkflowStep.id)]
+
+
+def legacy_step(db, step_id: int, writer: TimelineWriter) -> None:
+    """The pre-consolidation sequence, as it used to run in the scheduler loop."""
+    step = db.query(WorkflowStep).filter(WorkflowStep.id == step_id).first()
+    writer.record(step.run_id, step.id, EventType.STEP_READY, f"Step ready: {step.name}")
+
+    step.state = StepState.RUNNING
+    step.attempt = step.attempt + 1
+    refresh_run_summary(db, step.run_id)
+    db.commit()
+
+    result = Executor._execute_generic(step, {})
+    db.add(ToolCall(run_id=step.run_id, step_id=step.id, connector=step.tool,
+                    action=step.name, args_json={}, result_json=result,
+                    status=ToolCallStatus.SUCCESS))
+    step.state = StepState.SUCCEEDED
+    step.result_ref = json.dumps(result)
+    refresh_run_summary(db, step.run_id)
+    db.commit()
+
+    writer.record(step.run_id, step.id, EventType.STEP_SUCCEEDED,
+                  f"Step succeeded: {step.name}", {"result": result})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--steps", type=int, default=500)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    if db.get(User, 1) is None:
+        db.add(User(id=1, email="bench@example.com", hashed_password="x"))
+        db.commit()
+
+    writer = TimelineWriter(mode=DurabilityMode.SYNC)
+    counter = Counter()
+    variants = [
+        ("previous (4 commits)", lambda step_id: legacy_step(db, step_id, writer)),
+        ("execute_step", lambda step_id: Executor(db).execute_step(step_id)),
+        ("execute_step claim", lambda step_id: Executor(db).execute_step(step_id, claim=True)),
+    ]
+
+    print(f"{args.steps} steps, {engine.dialect.name}\n")
+    print(f"{'path':<22} {'commits':>8} {'stmts':>7} {'ms/step':>8}")
+    for name, run_step in variants:
+        step_ids = seed(db, args.steps)
+        counter.reset()
+        start = time.perf_counter()
+        for step_id in step_ids:
+            run_step(step_id)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{name:<22} {counter.commits / args.steps:>8.1f} "
+            f"{counter.statements / args.steps:>7.1f} {elapsed / args.steps * 1000:>8.3f}"
+        )
+
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
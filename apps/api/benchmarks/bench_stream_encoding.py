@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark: wire size and CPU of JSON SSE vs binary msgpack WebSocket frames.
+
+Replays a typical run timeline (small step events plus tool results)
+through each encoding at several batch sizes and reports bytes on the
+wire and encoder CPU per delivered event. Per-event encoding is cached
+on the hub and paid once; batching and compression are paid per
+subscriber, so they are reported separately.
+
+Usage:
+    python benchmarks/bench_stream_encoding.py
+    python benchmarks/bench_stream_encoding.py --events 5000 --batch 1 10 100
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.frames import (  # noqa: E402
+    MsgpackCodec,
+    SSECodec,
+    encode_payload,
+    msgpack_event,
+    sse_frame,
+)
+from services.tools import execute_job_search  # noqa: E402
+
+RUN_ID = 42
+
+
+def make_payloads(count: int) -> list[tuple[int, bytes]]:
+    """A step's ready/started/succeeded events, repeated; every third has a tool result."""
+    result = execute_job_search(None, {})
+    timestamp = datetime.now(timezone.utc).isoformat()
+    cycle = [
+        ("step_ready", "Step ready: Search for backend jobs", {"step_id": 7}),
+        ("step_started", "Step started: Search for backend jobs", {"step_id": 7}),
+        ("step_succeeded", "Step succeeded: Search for backend jobs", {"result": result}),
+    ]
+    payloads = []
+    for i in range(count):
+        event, message, metadata = cycle[i % len(cycle)]
+        payloads.append((i + 1, encode_payload(event, message, timestamp, metadata)))
+    return payloads
+
+
+def bench(codec, frames: list[bytes], batch: int) -> tuple[float, int]:
+    """Per-subscriber cost: (CPU seconds, bytes) to send `frames` in batches."""
+    size = 0
+    start = time.process_time()
+    for i in range(0, len(frames), batch):
+        size += len(codec.batch(frames[i:i + batch]))
+    return time.process_time() - start, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=3000)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 10, 50])
+    args = parser.parse_args()
+
+    payloads = make_payloads(args.events)
+
+    # Once per event on the hub, shared by every subscriber
+    start = time.process_time()
+    sse = [sse_frame(event_id, payload, RUN_ID) for event_id, payload in payloads]
+    sse_encode = time.process_time() - start
+
+    start = time.process_time()
+    packed = [msgpack_event(event_id, payload, RUN_ID) for event_id, payload in payloads]
+    msgpack_encode = time.process_time() - start
+
+    print(f"{args.events} events")
+    print(f"per-event encode (once): SSE {sse_encode / args.events * 1e6:.2f} µs, "
+          f"msgpack {msgpack_encode / args.events * 1e6:.2f} µs\n")
+
+    variants = [
+        ("SSE (JSON)", SSECodec(), sse),
+        ("WS msgpack", MsgpackCodec(), packed),
+        ("WS msgpack+zlib", MsgpackCodec(compress=True), packed),
+    ]
+
+    print(f"{'encoding':<16} {'batch':>5} {'bytes/event':>12} {'vs SSE':>7} {'µs/event':>9}")
+    for batch in args.batch:
+        baseline = None
+        for name, codec, frames in variants:
+            cpu, size = bench(codec, frames, batch)
+            baseline = baseline or size
+            print(
+                f"{name:<16} {batch:>5} {size / args.events:>12.1f} "
+                f"{size / baseline:>6.0%} {cpu / args.events * 1e6:>9.2f}"
+            )
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Life OS maintenance commands.
+
+Usage:
+    python cli.py db init
+    python cli.py timeline ensure-partitions
+    python cli.py timeline archive --older-than-days 30
+    python cli.py retention purge --older-than-days 90 --max-rows-per-second 2000
+    python cli.py trace show 12
+    python cli.py trace folded 12 > run-12.folded
+"""
+
+import click
+
+from db import SessionLocal
+
+
+@click.group()
+def cli():
+    """Life OS maintenance commands."""
+
+
+@cli.group("db")
+def database():
+    """Database setup."""
+
+
+@database.command("init")
+def init_command():
+    """Create all tables and mark migrations as applied (e.g. a new SQLite file)."""
+    import os
+
+    from alembic import command
+    from alembic.config import Config
+
+    import models  # noqa: F401  (registers every table)
+    from db import Base, engine
+
+    Base.metadata.create_all(engine)
+    alembic_ini = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+    command.stamp(Config(alembic_ini), "head")
+    click.echo(f"Initialized {engine.url.render_as_string()}")
+
+
+@cli.group()
+def timeline():
+    """Timeline partition and archive maintenance."""
+
+
+@timeline.command("ensure-partitions")
+@click.option("--days-ahead", type=int, default=None, help="Days of partitions to create ahead.")
+def ensure_partitions_command(days_ahead):
+    """Create upcoming timeline_events partitions."""
+    from services.timeline_archive import ensure_partitions
+
+    db = SessionLocal()
+    try:
+        created = ensure_partitions(db, days_ahead)
+    finally:
+        db.close()
+
+    click.echo(f"Created {len(created)} partition(s)")
+    for name in created:
+        click.echo(f"  {name}")
+
+
+@timeline.command("archive")
+@click.option(
+    "--older-than-days",
+    type=int,
+    default=None,
+    help="Archive partitions that ended more than this many days ago.",
+)
+def archive_command(older_than_days):
+    """Archive old timeline partitions into compressed segment files."""
+    from services.timeline_archive import archive_partitions
+
+    db = SessionLocal()
+    try:
+        archived = archive_partitions(db, older_than_days)
+    finally:
+        db.close()
+
+    click.echo(f"Archived {len(archived)} partition(s)")
+    for name in archived:
+        click.echo(f"  {name}")
+
+
+@cli.group()
+def retention():
+    """Purging of finished runs."""
+
+
+@retention.command("purge")
+@click.option(
+    "--older-than-days",
+    type=int,
+    default=None,
+    help="Purge runs finished more than this many days ago.",
+)
+@click.option("--batch-runs", type=int, default=None, help="Runs deleted per transaction.")
+@click.option(
+    "--max-rows-per-second",
+    type=int,
+    default=None,
+    help="Throttle target across all tables (0 = unthrottled).",
+)
+@click.option(
+    "--archive/--no-archive",
+    default=None,
+    help="Write purged runs to RETENTION_ARCHIVE_DIR first.",
+)
+@click.option(
+    "--max-batches",
+    type=int,
+    default=None,
+    help="Stop after this many batches; rerun to resume.",
+)
+def purge_command(older_than_days, batch_runs, max_rows_per_second, archive, max_batches):
+    """Delete (or archive and delete) finished runs in throttled batches."""
+    from services.retention import purge_finished_runs
+
+    db = SessionLocal()
+    try:
+        stats = purge_finished_runs(
+            db, older_than_days, batch_runs, max_rows_per_second, archive, max_batches
+        )
+    finally:
+        db.close()
+
+    click.echo(f"Purged {stats.runs} run(s), {stats.rows} row(s) in {stats.batches} batch(es)")
+    if not stats.complete:
+        click.echo("Stopped before the end; run again to resume from the checkpoint")
+
+
+@cli.group()
+def trace():
+    """Per-run latency breakdowns from spans written by TRACING_EXPORTER=file."""
+
+
+def _run_spans(run_id, path):
+    from services.tracing import load_spans, run_spans
+
+    spans = run_spans(load_spans(path), run_id)
+    if not spans:
+        raise click.ClickException(f"No spans for run {run_id}")
+    return spans
+
+
+@trace.command("show")
+@click.argument("run_id", type=int)
+@click.option("--file", "path", default=None, help="Span file (default: TRACING_FILE).")
+def trace_show_command(run_id, path):
+    """Print a run's traces as span trees, then time per span name."""
+    from services.tracing import format_tree, summarize
+
+    spans = _run_spans(run_id, path)
+    for line in format_tree(spans):
+        click.echo(line)
+
+    click.echo("")
+    click.echo(f"{'span':<48} {'count':>6} {'total ms':>10}")
+    for entry in summarize(spans):
+        click.echo(f"{entry['name']:<48} {entry['count']:>6} {entry['total_ms']:>10.2f}")
+
+
+@trace.command("folded")
+@click.argument("run_id", type=int)
+@click.option("--file", "path", default=None, help="Span file (default: TRACING_FILE).")
+def trace_folded_command(run_id, path):
+    """Print a run's self time per stack (µs) for flamegraph.pl or speedscope."""
+    from services.tracing import folded_stacks
+
+    for stack, micros in folded_stacks(_run_spans(run_id, path)).items():
+        click.echo(f"{stack} {micros}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,13 +1,495 @@
-from typing import Generator
-from sqlalchemy import create_engine
+import logging
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import AsyncGenerator, Generator, Iterator, Optional
+from fastapi import Request
+from fastapi.requests import HTTPConnection
+from sqlalchemy import CompoundSelect, Select, create_engine, event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine,
+)
 from sqlalchemy.orm import sessionmaker, Session, DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from config import settings
 
-# Create engine (using psycopg2 as requested/standard)
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,  # Test connections before using them
-)
+logger = logging.getLogger(__name__)
+
+
+# ── Pool instrumentation ────────────────────────────
+
+class PoolMetrics:
+    """Checkout latency and saturation for one engine's connection pool."""
+
+    # Checkout waits kept for percentiles
+    WINDOW = 1000
+
+    def __init__(self, role: str, capacity: int):
+        self.role = role
+        self.capacity = capacity
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_max = 0.0
+        self._waits: deque[float] = deque(maxlen=self.WINDOW)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_max = max(self.wait_max, seconds)
+            self._waits.append(seconds)
+
+    def snapshot(self, pool: QueuePool) -> dict:
+        with self._lock:
+            waits = sorted(self._waits)
+
+        checked_out = pool.checkedout()
+        return {
+            "role": self.role,
+            "size": pool.size(),
+            "checked_out": checked_out,
+            "overflow": max(pool.overflow(), 0),
+            "capacity": self.capacity,
+            "saturation": round(checked_out / self.capacity, 3),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_ms": {
+                "avg": round(sum(waits) / len(waits) * 1000, 3) if waits else 0.0,
+                "p95": round(waits[int(len(waits) * 0.95)] * 1000, 3) if waits else 0.0,
+                "max": round(self.wait_max * 1000, 3),
+            },
+        }
+
+
+class _InstrumentedPoolMixin:
+    """Times every checkout, including waits for a free connection."""
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.observe(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.observe(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep counting into the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+# ── Query counting ──────────────────────────────
+
+@dataclass
+class QueryCounter:
+    """Statements executed and time spent in the database within one scope."""
+
+    statements: int = 0
+    seconds: float = 0.0
+    parent: Optional["QueryCounter"] = None
+
+
+_query_counter: ContextVar[Optional[QueryCounter]] = ContextVar("query_counter", default=None)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryCounter]:
+    """
+    Count every statement run in this context, on any engine, until exit.
+
+    The counter follows the context into the request threadpool and
+    async sessions, but not into other threads (dispatcher workers, the
+    timeline writer). Scopes nest: a statement counts towards every
+    enclosing counter.
+    """
+    counter = QueryCounter(parent=_query_counter.get())
+    token = _query_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _query_counter.reset(token)
+
+
+def log_queries(scope: str, counter: QueryCounter, **fields) -> None:
+    """
+    Log a scope's statement count and DB time as key=value pairs.
+
+    DEBUG normally; WARNING from `QUERY_LOG_MIN_STATEMENTS` statements
+    up, where a scope is most likely running one query per row (N+1).
+    The same fields are attached as `extra["db_queries"]` for JSON
+    log formatters.
+    """
+    slow = counter.statements >= settings.QUERY_LOG_MIN_STATEMENTS
+    level = logging.WARNING if slow else logging.DEBUG
+    if not logger.isEnabledFor(level):
+        return
+
+    record = {"scope": scope, **fields, "statements": counter.statements,
+              "db_ms": round(counter.seconds * 1000, 2)}
+    logger.log(
+        level,
+        "db_queries %s",
+        " ".join(f"{key}={value}" for key, value in record.items()),
+        extra={"db_queries": record},
+    )
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _query_counter.get() is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    counter = _query_counter.get()
+    started = getattr(context, "_query_started", None)
+    if counter is None or started is None:
+        return
+
+    elapsed = time.perf_counter() - started
+    while counter is not None:
+        counter.statements += 1
+        counter.seconds += elapsed
+        counter = counter.parent
+
+
+# Engines by role, for pool_stats()
+engines: dict[str, Engine] = {}
+# Async engines, disposed on shutdown
+async_engines: list[AsyncEngine] = []
+
+
+def is_sqlite_file(url: str) -> bool:
+    """True for a SQLite database on disk (embedded mode), False for in-memory."""
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+
+
+def _pool_options(url: str, pool_size: int, poolclass: type) -> dict:
+    if make_url(url).get_backend_name() == "sqlite" and not is_sqlite_file(url):
+        return {}  # In-memory SQLite keeps one connection per thread; nothing to size
+
+    return {
+        "poolclass": poolclass,
+        "pool_size": pool_size,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+
+
+def _register(role: str, sync_engine: Engine, pool_size: int) -> None:
+    if isinstance(sync_engine.pool, _InstrumentedPoolMixin):
+        sync_engine.pool.metrics = PoolMetrics(role, pool_size + settings.DB_MAX_OVERFLOW)
+    # Cost outside a count_queries() scope: one context variable lookup per statement
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    engines[role] = sync_engine
+
+
+def make_engine(role: str, pool_size: int) -> Engine:
+    """Sync engine with its own pool for one workload."""
+    engine = create_engine(
+        settings.DATABASE_URL,
+        pool_pre_ping=True,  # Test connections before using them
+        **_pool_options(settings.DATABASE_URL, pool_size, InstrumentedQueuePool),
+    )
+    if is_sqlite_file(settings.DATABASE_URL):
+        configure_sqlite(engine, read_only=False)
+    _register(role, engine, pool_size)
+    return engine
+
+
+def make_async_engine(role: str, pool_size: int, url: Optional[str] = None) -> AsyncEngine:
+    """Async engine with its own pool for one workload (primary unless `url` is given)."""
+    url = url or async_database_url()
+    engine = create_async_engine(
+        url,
+        pool_pre_ping=True,
+        **_pool_options(url, pool_size, InstrumentedAsyncQueuePool),
+    )
+    if is_sqlite_file(url):
+        # Async engines only read; writes go through the sync engines' write gate
+        configure_sqlite(engine.sync_engine, read_only=True)
+    _register(role, engine.sync_engine, pool_size)
+    async_engines.append(engine)
+    return engine
+
+
+async def dispose_async_engines() -> None:
+    """Close every async engine's connections (on shutdown)."""
+    for engine in async_engines:
+        await engine.dispose()
+
+
+def pool_stats() -> list[dict]:
+    """Current pool usage and checkout latency for every engine."""
+    stats = []
+    for role, engine in engines.items():
+        pool = engine.pool
+        if isinstance(pool, _InstrumentedPoolMixin):
+            stats.append(pool.metrics.snapshot(pool))
+        else:
+            stats.append({"role": role, "pool": type(pool).__name__})
+    return stats
+
+
+# Async drivers for each sync dialect DATABASE_URL may use
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(sync_url: str) -> str:
+    """The same database URL with its driver swapped for an async one."""
+    url = make_url(sync_url)
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()]).render_as_string(
+        hide_password=False
+    )
+
+
+def async_database_url() -> str:
+    """ASYNC_DATABASE_URL, or DATABASE_URL with an async driver."""
+    return settings.ASYNC_DATABASE_URL or to_async_url(settings.DATABASE_URL)
+
+
+# ── Embedded SQLite ─────────────────────────────────
+# DATABASE_URL=sqlite:///path/to/life_os.db runs the whole engine on one
+# file: WAL lets readers proceed alongside the single writer, and the
+# write gate queues this process's writers instead of letting them spin
+# on SQLite's lock.
+
+
+def sqlite_pragmas(read_only: bool) -> list[str]:
+    """Per-connection settings for an embedded SQLite database."""
+    pragmas = [
+        f"PRAGMA busy_timeout = {settings.SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA synchronous = {settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA cache_size = -{settings.SQLITE_CACHE_SIZE_MB * 1024}",  # Negative: KiB
+        f"PRAGMA mmap_size = {settings.SQLITE_MMAP_SIZE_MB * 1024 * 1024}",
+        "PRAGMA temp_store = MEMORY",
+        "PRAGMA foreign_keys = ON",  # Off by default; Postgres always enforces them
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only = ON")
+    else:
+        # Persistent, so setting it from the writer covers every connection
+        pragmas.insert(0, "PRAGMA journal_mode = WAL")
+    return pragmas
+
+
+class WriteGate:
+    """
+    Single-writer queue for an embedded SQLite database.
+
+    SQLite allows one write transaction at a time, and a writer that
+    finds the lock taken polls it with growing sleeps (up to 100 ms).
+    Instead, a transaction's first write statement waits here for its
+    turn, and the gate reopens when the connection goes back to the pool
+    after its commit or rollback. Writers in other processes (the CLI)
+    are still arbitrated by SQLite's busy timeout.
+    """
+
+    _WRITE_RE = re.compile(r"\s*(INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER)\b", re.IGNORECASE)
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+
+    def install(self, engine: Engine) -> None:
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "checkin", self._on_checkin)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if "write_gate" in conn.info or not self._WRITE_RE.match(statement):
+            return
+        if self._lock.acquire(timeout=self.timeout):
+            conn.info["write_gate"] = True
+        else:
+            # Most likely the same thread already writes through another
+            # session; let SQLite's busy timeout report it
+            logger.warning("Write gate not acquired after %.1fs", self.timeout)
+
+    def _on_checkin(self, dbapi_connection, record):
+        if record is not None and record.info.pop("write_gate", None):
+            self._lock.release()
+
+
+# One gate per process, shared by every sync engine on the file
+write_gate = WriteGate(settings.SQLITE_BUSY_TIMEOUT_MS / 1000)
+
+
+def configure_sqlite(engine: Engine, read_only: bool) -> None:
+    """Apply embedded-mode pragmas; writers also go through the write gate."""
+    pragmas = sqlite_pragmas(read_only)
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    if not read_only and settings.SQLITE_WRITE_GATE:
+        write_gate.install(engine)
+
+
+# ── Read replica routing ────────────────────────────
+
+# Set on responses to writes; while present, the client's reads use the primary
+READ_YOUR_WRITES_COOKIE = "lifeos_primary"
+
+
+class RoutingSession(Session):
+    """
+    Sends SELECTs to the replica and everything else to the primary.
+
+    Reads stay on the primary while flushing, and for the whole session
+    when it is created with `info={"primary": True}` (read-your-writes).
+    Without a replica every statement goes to the primary.
+    """
+
+    def __init__(self, *, primary: Engine, replica: Optional[Engine], **kw):
+        super().__init__(**kw)
+        self.primary = primary
+        self.replica = replica
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if (
+            self.replica is None
+            or self._flushing
+            or self.info.get("primary")
+            or not isinstance(clause, (Select, CompoundSelect))
+        ):
+            return self.primary
+        return self.replica
+
+
+class ReadYourWritesMiddleware:
+    """
+    After a successful write, pin the client's reads to the primary.
+
+    Sets a cookie lasting READ_YOUR_WRITES_SECONDS on every successful
+    non-GET response, so a client never reads from a replica that has not
+    yet replayed its own write. Does nothing without a replica.
+    """
+
+    SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] in self.SAFE_METHODS
+            or not settings.REPLICA_DATABASE_URL
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        cookie = (
+            f"{READ_YOUR_WRITES_COOKIE}=1; Max-Age={settings.READ_YOUR_WRITES_SECONDS}; "
+            "Path=/; HttpOnly; SameSite=Lax"
+        ).encode()
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                headers = [*message.get("headers", []), (b"set-cookie", cookie)]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+class QueryCountMiddleware:
+    """
+    Count each request's statements and DB time.
+
+    Every request is logged with `log_queries`, so one that runs a query
+    per row stands out as a WARNING. In DEBUG mode the counts so far are
+    also returned as `X-DB-Statements` and `X-DB-Time-Ms` headers; for a
+    streaming response they cover the work done before the first byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        with count_queries() as counter:
+
+            async def send_with_counts(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    if settings.DEBUG:
+                        headers = [
+                            *message.get("headers", []),
+                            (b"x-db-statements", str(counter.statements).encode()),
+                            (b"x-db-time-ms", f"{counter.seconds * 1000:.2f}".encode()),
+                        ]
+                        message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_counts)
+
+        route = getattr(scope.get("route"), "path", scope["path"])
+        log_queries("request", counter, method=scope["method"], route=route, status=status)
+
+
+def wants_primary(connection: HTTPConnection) -> bool:
+    """True while the client is inside its read-your-writes window."""
+    return READ_YOUR_WRITES_COOKIE in connection.cookies
+
+
+# ── Engines ─────────────────────────────────────────
+# Each workload gets its own pool, so long-held scheduler or streaming
+# connections cannot starve request handlers.
+
+# Request handlers (using psycopg2 as requested/standard)
+engine = make_engine("api", settings.DB_POOL_SIZE)
+
+# Scheduler loops, timeline writer and partition maintenance
+scheduler_engine = make_engine("scheduler", settings.DB_SCHEDULER_POOL_SIZE)
+
+# Async engine for `async def` handlers: queries await instead of blocking the loop
+async_engine = make_async_engine("api_async", settings.DB_POOL_SIZE)
+
+# Timeline hub polling, stream catch-up and NDJSON exports
+streaming_engine = make_async_engine("streaming", settings.DB_STREAMING_POOL_SIZE)
+
+# Replica engines for read endpoints and streaming, when a replica is configured
+replica_engine = replica_streaming_engine = None
+if settings.REPLICA_DATABASE_URL:
+    replica_url = to_async_url(settings.REPLICA_DATABASE_URL)
+    replica_engine = make_async_engine("replica", settings.DB_POOL_SIZE, replica_url)
+    replica_streaming_engine = make_async_engine(
+        "replica_streaming", settings.DB_STREAMING_POOL_SIZE, replica_url
+    )
 
 # Standard session factory
 SessionLocal = sessionmaker(
@@ -16,6 +498,33 @@ SessionLocal = sessionmaker(
     bind=engine,
 )
 
+SchedulerSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=scheduler_engine,
+)
+
+# Read-only request handlers: the replica, or the primary for read-your-writes
+ReadSessionLocal = async_sessionmaker(
+    async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+    sync_session_class=RoutingSession,
+    primary=async_engine.sync_engine,
+    replica=replica_engine.sync_engine if replica_engine else None,
+)
+
+# The hub polls the same replica that catch-up reads, so catch-up never
+# lags behind events the hub has already delivered
+StreamingSessionLocal = async_sessionmaker(
+    streaming_engine,
+    autoflush=False,
+    expire_on_commit=False,
+    sync_session_class=RoutingSession,
+    primary=streaming_engine.sync_engine,
+    replica=replica_streaming_engine.sync_engine if replica_streaming_engine else None,
+)
+
 # Base class for SQLAlchemy 2.0
 class Base(DeclarativeBase):
     pass
@@ -27,3 +536,9 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+# Read-only dependency for FastAPI: replica unless the client just wrote
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    async with ReadSessionLocal(info={"primary": wants_primary(request)}) as db:
+        yield db
@@ -60,9 +60,24 @@ def get_timeline(workflow_id: int) -> dict:
     return response.json()
 
 
-def get_approvals(workflow_id: int) -> dict:
-    """Get all pending approvals."""
-    response = requests.get(f"{BASE_URL}/api/approvals/workflow/{workflow_id}")
+def get_pending_count() -> int:
+    """Number of approvals waiting for this user (cached server-side, cheap to poll)."""
+    response = requests.get(
+        f"{BASE_URL}/api/approvals/inbox/count", params={"approver_id": USER_ID}
+    )
+
+    if response.status_code != 200:
+        print(f"❌ Error fetching approval count: {response.text}")
+        return 0
+
+    return response.json()["pending"]
+
+
+def get_inbox() -> dict:
+    """Get this user's pending approvals across all workflows."""
+    response = requests.get(
+        f"{BASE_URL}/api/approvals/inbox", params={"approver_id": USER_ID}
+    )
 
     if response.status_code != 200:
         print(f"❌ Error fetching approvals: {response.text}")
@@ -171,12 +186,12 @@ def demo_interactive(intent: str):
     print("\n🔍 Checking for approval gates...\n")
 
     while check_count < max_checks:
-        approvals_data = get_approvals(workflow_id)
-        approvals = approvals_data.get("approvals", [])
+        # Poll the cheap count; list the inbox only once something is pending
+        approvals = get_inbox().get("approvals", []) if get_pending_count() else []
 
-        # Find pending approval
+        # Find this workflow's pending approval
         for approval in approvals:
-            if approval["status"] == "required":
+            if approval["run_id"] == workflow_id:
                 print(
                     f"🛑 Found pending approval:\n"
                     f"   Step ID: {approval['step_id']}\n"
@@ -1,12 +1,45 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from config import settings
-from routers import health, users, workflows
+from db import QueryCountMiddleware, ReadYourWritesMiddleware, dispose_async_engines
+from routers import health, metrics, users, workflows, orchestration, streams, approvals, multiplex
+from services.approval_timers import approval_timers
+from services.dispatcher import run_dispatcher
+from services.metrics import MetricsMiddleware
+from services.retention import run_retention_maintenance
+from services.timeline import timeline_writer
+from services.timeline_archive import run_partition_maintenance
+from services.timeline_hub import timeline_hub
+from services.tracing import TracingMiddleware, tracer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background services; flush buffered timeline events and spans on shutdown."""
+    timeline_writer.start()
+    run_dispatcher.start()
+    approval_timers.start()
+    maintenance = asyncio.create_task(run_partition_maintenance())
+    retention = asyncio.create_task(run_retention_maintenance())
+    yield
+    maintenance.cancel()
+    retention.cancel()
+    await asyncio.to_thread(approval_timers.stop)
+    await asyncio.to_thread(run_dispatcher.stop)
+    await timeline_hub.stop()
+    timeline_writer.close()
+    tracer.close()
+    await dispose_async_engines()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.APP_VERSION,
     description="Life OS — AI-powered workflow orchestration API",
+    lifespan=lifespan,
 )
 
 # Set up CORS
@@ -18,10 +51,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Keep a client's reads on the primary right after it writes
+app.add_middleware(ReadYourWritesMiddleware)
+
+# Count each request's statements (X-DB-* headers in DEBUG mode)
+app.add_middleware(QueryCountMiddleware)
+
+# Root span per request when TRACING_EXPORTER is set
+app.add_middleware(TracingMiddleware)
+
+# Outermost: time requests including the other middleware
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(health.router)
+app.include_router(metrics.router)
 app.include_router(users.router, prefix="/api/v1")
 app.include_router(workflows.router, prefix="/api/v1")
+app.include_router(orchestration.router)
+app.include_router(streams.router)
+app.include_router(approvals.router)
+app.include_router(multiplex.router)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,122 @@
+"""Partition timeline_events by created_at and add the archive index
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if "timeline_archives" not in inspector.get_table_names():
+        op.create_table(
+            "timeline_archives",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("run_id", sa.BigInteger(), nullable=False),
+            sa.Column("segment", sa.String(length=255), nullable=False),
+            sa.Column("offset", sa.BigInteger(), nullable=False),
+            sa.Column("length", sa.Integer(), nullable=False),
+            sa.Column("first_event_id", sa.BigInteger(), nullable=False),
+            sa.Column("last_event_id", sa.BigInteger(), nullable=False),
+            sa.Column("event_count", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        )
+        op.create_index("ix_timeline_archives_run_id", "timeline_archives", ["run_id"])
+        op.create_index("ix_timeline_archives_segment", "timeline_archives", ["segment"])
+
+    if "payload" not in {c["name"] for c in inspector.get_columns("timeline_events")}:
+        op.add_column("timeline_events", sa.Column("payload", sa.LargeBinary(), nullable=True))
+
+    # Declarative range partitioning is Postgres-only
+    if bind.dialect.name != "postgresql":
+        return
+
+    # Existing rows become one partition ending at the start of tomorrow;
+    # new partitions are created from there by ensure_partitions().
+    today = datetime.now(timezone.utc).date()
+    cutover = datetime(today.year, today.month, today.day) + timedelta(days=1)
+
+    op.execute("ALTER TABLE timeline_events RENAME TO timeline_events_legacy")
+    op.execute(
+        "ALTER TABLE timeline_events_legacy "
+        "RENAME CONSTRAINT timeline_events_pkey TO timeline_events_legacy_pkey"
+    )
+    op.execute("ALTER INDEX ix_timeline_events_run_id RENAME TO ix_timeline_events_legacy_run_id")
+
+    # The partition key must be part of the primary key; id stays unique
+    # on its own because it comes from a single sequence.
+    op.execute(
+        "CREATE TABLE timeline_events "
+        "(LIKE timeline_events_legacy INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        "PARTITION BY RANGE (created_at)"
+    )
+    op.execute("ALTER TABLE timeline_events ADD PRIMARY KEY (id, created_at)")
+    op.execute("ALTER SEQUENCE timeline_events_id_seq OWNED BY timeline_events.id")
+    op.create_index("ix_timeline_events_run_id", "timeline_events", ["run_id"])
+    op.create_foreign_key(
+        None, "timeline_events", "workflow_runs", ["run_id"], ["id"], ondelete="CASCADE"
+    )
+    op.create_foreign_key(
+        None, "timeline_events", "workflow_steps", ["step_id"], ["id"], ondelete="SET NULL"
+    )
+    op.create_foreign_key(
+        None, "timeline_events", "approvals", ["approval_id"], ["id"], ondelete="SET NULL"
+    )
+
+    # Validate the bound up front so ATTACH does not rescan the table
+    op.execute(
+        "ALTER TABLE timeline_events_legacy ADD CONSTRAINT timeline_events_legacy_bound "
+        f"CHECK (created_at < '{cutover.isoformat(sep=' ')}')"
+    )
+    op.execute(
+        "ALTER TABLE timeline_events ATTACH PARTITION timeline_events_legacy "
+        f"FOR VALUES FROM (MINVALUE) TO ('{cutover.isoformat(sep=' ')}')"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+
+    if bind.dialect.name == "postgresql":
+        # Collapse the partitions back into a plain table
+        op.execute("ALTER TABLE timeline_events RENAME TO timeline_events_partitioned")
+        op.execute(
+            "CREATE TABLE timeline_events "
+            "(LIKE timeline_events_partitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        op.execute("INSERT INTO timeline_events SELECT * FROM timeline_events_partitioned")
+        op.execute("ALTER SEQUENCE timeline_events_id_seq OWNED BY timeline_events.id")
+        op.execute("DROP TABLE timeline_events_partitioned CASCADE")
+        op.execute("ALTER TABLE timeline_events ADD PRIMARY KEY (id)")
+        op.create_index("ix_timeline_events_run_id", "timeline_events", ["run_id"])
+        op.create_foreign_key(
+            None, "timeline_events", "workflow_runs", ["run_id"], ["id"], ondelete="CASCADE"
+        )
+        op.create_foreign_key(
+            None, "timeline_events", "workflow_steps", ["step_id"], ["id"], ondelete="SET NULL"
+        )
+        op.create_foreign_key(
+            None, "timeline_events", "approvals", ["approval_id"], ["id"], ondelete="SET NULL"
+        )
+
+    op.drop_column("timeline_events", "payload")
+    op.drop_index("ix_timeline_archives_segment", table_name="timeline_archives")
+    op.drop_index("ix_timeline_archives_run_id", table_name="timeline_archives")
+    op.drop_table("timeline_archives")
@@ -0,0 +1,117 @@
+"""Composite and partial indexes for the hot query shapes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The enum is stored by name
+REQUIRED = sa.text("status = 'REQUIRED'")
+
+# (name, table, columns, partial predicate)
+INDEXES = [
+    ("ix_workflow_steps_run_id_state", "workflow_steps", ["run_id", "state"], None),
+    ("ix_approvals_run_id_status", "approvals", ["run_id", "status"], None),
+    ("ix_approvals_required", "approvals", ["run_id"], REQUIRED),
+    ("ix_timeline_events_run_id_id", "timeline_events", ["run_id", "id"], None),
+]
+
+# Single-column indexes made redundant by the composites above
+REPLACED = [
+    ("ix_workflow_steps_run_id", "workflow_steps"),
+    ("ix_approvals_run_id", "approvals"),
+    ("ix_timeline_events_run_id", "timeline_events"),
+]
+
+
+def _is_partitioned(bind, table: str) -> bool:
+    return bind.execute(
+        sa.text("SELECT relkind = 'p' FROM pg_class WHERE relname = :name"),
+        {"name": table},
+    ).scalar() or False
+
+
+def _partitions(bind, table: str) -> list[str]:
+    return list(
+        bind.execute(
+            sa.text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE p.relname = :name"
+            ),
+            {"name": table},
+        ).scalars()
+    )
+
+
+def _create_partitioned_index(bind, name: str, table: str, columns: list[str]) -> None:
+    """
+    CREATE INDEX CONCURRENTLY is not supported on a partitioned table.
+
+    Create the parent index ON ONLY (invalid until every partition has
+    one), build each partition's index concurrently and attach it. Later
+    partitions inherit the index when they are created.
+    """
+    cols = ", ".join(columns)
+    op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY {table} ({cols})")
+    for partition in _partitions(bind, table):
+        child = f"{partition}_{'_'.join(columns)}_idx"
+        op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {child} ON {partition} ({cols})")
+        op.execute(f"ALTER INDEX {name} ATTACH PARTITION {child}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+
+    if bind.dialect.name != "postgresql":
+        for name, table, columns, where in INDEXES:
+            op.create_index(name, table, columns, sqlite_where=where, if_not_exists=True)
+        for name, table in REPLACED:
+            op.drop_index(name, table_name=table, if_exists=True)
+        return
+
+    # Build without blocking writes; CONCURRENTLY cannot run in a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            if _is_partitioned(bind, table):
+                _create_partitioned_index(bind, name, table, columns)
+                continue
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_where=where,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+        for name, table in REPLACED:
+            # Partitioned indexes cannot be dropped concurrently
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=not _is_partitioned(bind, table),
+                if_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table in REPLACED:
+        op.create_index(name, table, ["run_id"], if_not_exists=True)
+    for name, table, _, _ in INDEXES:
+        op.drop_index(name, table_name=table, if_exists=True)
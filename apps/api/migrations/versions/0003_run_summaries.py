@@ -0,0 +1,112 @@
+"""Run summaries projection for dashboard listings
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Step states, stored by name, and their count columns
+STEP_STATES = ["PENDING", "READY", "RUNNING", "BLOCKED", "SUCCEEDED", "FAILED", "SKIPPED"]
+TERMINAL = "'COMPLETED', 'FAILED', 'CANCELED'"
+
+RUN_STATE = sa.Enum(
+    "QUEUED", "PLANNING", "WAITING_APPROVAL", "EXECUTING", "COMPLETED", "FAILED", "CANCELED",
+    name="runstate",
+    create_type=False,  # Created with workflow_runs
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "run_summaries",
+        sa.Column(
+            "run_id",
+            sa.Integer(),
+            sa.ForeignKey("workflow_runs.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column(
+            "user_id",
+            sa.Integer(),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("intent", sa.Text(), nullable=False),
+        sa.Column("state", RUN_STATE, nullable=False),
+        sa.Column("steps_total", sa.Integer(), nullable=False, server_default="0"),
+        *[
+            sa.Column(f"steps_{state.lower()}", sa.Integer(), nullable=False, server_default="0")
+            for state in STEP_STATES
+        ],
+        sa.Column(
+            "blocking_approval_id",
+            sa.Integer(),
+            sa.ForeignKey("approvals.id", ondelete="SET NULL"),
+            nullable=True,
+        ),
+        sa.Column("blocking_reason", sa.Text(), nullable=True),
+        sa.Column("started_at", sa.DateTime(), nullable=False),
+        sa.Column("last_event_at", sa.DateTime(), nullable=False),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.Column("duration_seconds", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+    op.create_index(
+        "ix_run_summaries_user_activity",
+        "run_summaries",
+        ["user_id", "last_event_at", "run_id"],
+    )
+
+    # Backfill existing runs; new ones are maintained by the services
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        duration = "EXTRACT(EPOCH FROM r.updated_at - r.created_at)"
+    else:
+        duration = "ROUND((julianday(r.updated_at) - julianday(r.created_at)) * 86400, 3)"
+
+    counts = ",\n".join(
+        f"COUNT(s.id) FILTER (WHERE s.state = '{state}')" for state in STEP_STATES
+    )
+    op.execute(
+        f"""
+        INSERT INTO run_summaries (
+            run_id, user_id, intent, state, steps_total,
+            {", ".join(f"steps_{state.lower()}" for state in STEP_STATES)},
+            blocking_approval_id, blocking_reason,
+            started_at, last_event_at, finished_at, duration_seconds
+        )
+        SELECT
+            r.id, r.user_id, r.intent, r.state, COUNT(s.id),
+            {counts},
+            a.id, a.reason,
+            r.created_at, r.updated_at,
+            CASE WHEN r.state IN ({TERMINAL}) THEN r.updated_at END,
+            {duration}
+        FROM workflow_runs r
+        LEFT JOIN workflow_steps s ON s.run_id = r.id
+        LEFT JOIN approvals a ON a.id = (
+            SELECT MIN(p.id) FROM approvals p
+            WHERE p.run_id = r.id AND p.status = 'REQUIRED'
+        )
+        GROUP BY r.id, r.user_id, r.intent, r.state, r.created_at, r.updated_at, a.id, a.reason
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_run_summaries_user_activity", table_name="run_summaries")
+    op.drop_table("run_summaries")
@@ -0,0 +1,36 @@
+"""Retention checkpoints for the finished-runs purge
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "retention_checkpoints",
+        sa.Column("job", sa.String(length=64), primary_key=True),
+        sa.Column("last_run_id", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("runs_deleted", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("rows_deleted", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("pass_started_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("retention_checkpoints")
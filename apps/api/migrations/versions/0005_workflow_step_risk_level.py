@@ -0,0 +1,35 @@
+"""Add workflow_steps.risk_level
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The orchestrator has always set a per-step risk level; the column was missing
+    inspector = sa.inspect(op.get_bind())
+    if "risk_level" not in {c["name"] for c in inspector.get_columns("workflow_steps")}:
+        op.add_column(
+            "workflow_steps",
+            sa.Column("risk_level", sa.String(length=10), nullable=True, server_default="L0"),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("workflow_steps") as batch_op:
+        batch_op.drop_column("risk_level")
@@ -0,0 +1,73 @@
+"""Approver inbox: approvals.approver_id and a partial index of pending approvals
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, Sequence[str], None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The enum is stored by name
+REQUIRED = sa.text("status = 'REQUIRED'")
+
+INDEX = "ix_approvals_inbox"
+COLUMNS = ["approver_id", "id"]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.add_column(
+            "approvals",
+            sa.Column(
+                "approver_id",
+                sa.Integer(),
+                sa.ForeignKey("users.id", ondelete="SET NULL"),
+                nullable=True,
+            ),
+        )
+    else:
+        # SQLite cannot ALTER in a constraint, but can add a referencing column
+        op.execute(
+            "ALTER TABLE approvals ADD COLUMN approver_id INTEGER "
+            "REFERENCES users (id) ON DELETE SET NULL"
+        )
+
+    # Existing approvals go to their run's owner, as new ones do
+    op.execute(
+        "UPDATE approvals SET approver_id = "
+        "(SELECT user_id FROM workflow_runs WHERE workflow_runs.id = approvals.run_id)"
+    )
+
+    if bind.dialect.name != "postgresql":
+        op.create_index(INDEX, "approvals", COLUMNS, sqlite_where=REQUIRED, if_not_exists=True)
+        return
+
+    # Build without blocking writes; CONCURRENTLY cannot run in a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            INDEX,
+            "approvals",
+            COLUMNS,
+            postgresql_where=REQUIRED,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(INDEX, table_name="approvals", if_exists=True)
+    with op.batch_alter_table("approvals") as batch_op:
+        batch_op.drop_column("approver_id")
@@ -0,0 +1,80 @@
+"""Auto-approval policies and approvals.policy_id
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, Sequence[str], None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX = "ix_approvals_policy_id_decided_at"
+COLUMNS = ["policy_id", "decided_at"]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "approval_policies",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "user_id",
+            sa.Integer(),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("tool", sa.String(length=255), nullable=True),
+        sa.Column("max_risk_level", sa.String(length=10), nullable=False, server_default="L3"),
+        sa.Column("conditions", sa.JSON(), nullable=False),
+        sa.Column("daily_quota", sa.Integer(), nullable=True),
+        sa.Column("enabled", sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+    op.create_index("ix_approval_policies_user_id", "approval_policies", ["user_id"])
+
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.add_column(
+            "approvals",
+            sa.Column(
+                "policy_id",
+                sa.Integer(),
+                sa.ForeignKey("approval_policies.id", ondelete="SET NULL"),
+                nullable=True,
+            ),
+        )
+    else:
+        # SQLite cannot ALTER in a constraint, but can add a referencing column
+        op.execute(
+            "ALTER TABLE approvals ADD COLUMN policy_id INTEGER "
+            "REFERENCES approval_policies (id) ON DELETE SET NULL"
+        )
+
+    if bind.dialect.name != "postgresql":
+        op.create_index(INDEX, "approvals", COLUMNS, if_not_exists=True)
+        return
+
+    # Build without blocking writes; CONCURRENTLY cannot run in a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            INDEX, "approvals", COLUMNS, postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(INDEX, table_name="approvals", if_exists=True)
+    with op.batch_alter_table("approvals") as batch_op:
+        batch_op.drop_column("policy_id")
+    op.drop_index("ix_approval_policies_user_id", table_name="approval_policies")
+    op.drop_table("approval_policies")
@@ -0,0 +1,74 @@
+"""Approval deadlines: expires_at, expiry_action, escalate_to and a partial index of deadlines
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, Sequence[str], None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The enum is stored by name
+PENDING_DEADLINES = sa.text("status = 'REQUIRED' AND expires_at IS NOT NULL")
+
+INDEX = "ix_approvals_expiry"
+COLUMNS = ["expires_at"]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("approvals", sa.Column("expires_at", sa.DateTime(), nullable=True))
+    op.add_column("approvals", sa.Column("expiry_action", sa.String(length=16), nullable=True))
+
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.add_column(
+            "approvals",
+            sa.Column(
+                "escalate_to",
+                sa.Integer(),
+                sa.ForeignKey("users.id", ondelete="SET NULL"),
+                nullable=True,
+            ),
+        )
+    else:
+        # SQLite cannot ALTER in a constraint, but can add a referencing column
+        op.execute(
+            "ALTER TABLE approvals ADD COLUMN escalate_to INTEGER "
+            "REFERENCES users (id) ON DELETE SET NULL"
+        )
+
+    if bind.dialect.name != "postgresql":
+        op.create_index(
+            INDEX, "approvals", COLUMNS, sqlite_where=PENDING_DEADLINES, if_not_exists=True
+        )
+        return
+
+    # Build without blocking writes; CONCURRENTLY cannot run in a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            INDEX,
+            "approvals",
+            COLUMNS,
+            postgresql_where=PENDING_DEADLINES,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(INDEX, table_name="approvals", if_exists=True)
+    with op.batch_alter_table("approvals") as batch_op:
+        batch_op.drop_column("escalate_to")
+        batch_op.drop_column("expiry_action")
+        batch_op.drop_column("expires_at")
@@ -0,0 +1,54 @@
+"""Default partition for timeline_events
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0010"
+down_revision: Union[str, Sequence[str], None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PARENT = "timeline_events"
+DEFAULT = "timeline_events_default"
+
+
+def _is_partitioned(bind) -> bool:
+    return bind.execute(
+        sa.text("SELECT relkind = 'p' FROM pg_class WHERE relname = :name"),
+        {"name": PARENT},
+    ).scalar() or False
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql" or not _is_partitioned(bind):
+        return
+
+    # Catches rows whose range partition was not created in time, which
+    # would otherwise fail the insert (and the transition staging it).
+    # Partitioned indexes and foreign keys are created on it automatically.
+    op.execute(f"CREATE TABLE IF NOT EXISTS {DEFAULT} PARTITION OF {PARENT} DEFAULT")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql" or not _is_partitioned(bind):
+        return
+
+    # Its rows have no other partition to go to
+    if bind.execute(sa.text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT})")).scalar():
+        raise RuntimeError(
+            f"{DEFAULT} holds events; run `cli.py timeline ensure-partitions` to move them first"
+        )
+    op.execute(f"DROP TABLE {DEFAULT}")
@@ -3,7 +3,12 @@ from .users import User, UserRole
 from .profiles import Profile
 from .workflows import WorkflowRun, WorkflowStep, RunState, StepState
 from .approvals import Approval, ApprovalStatus
+from .approval_policy import ApprovalPolicy
 from .tool_calls import ToolCall, ToolCallStatus
+from .timeline_event import TimelineEvent, EventType
+from .timeline_archive import TimelineArchive
+from .run_summary import RunSummary
+from .retention_checkpoint import RetentionCheckpoint
 
 __all__ = [
     "Base",
@@ -16,6 +21,12 @@ __all__ = [
     "StepState",
     "Approval",
     "ApprovalStatus",
+    "ApprovalPolicy",
     "ToolCall",
     "ToolCallStatus",
+    "TimelineEvent",
+    "EventType",
+    "TimelineArchive",
+    "RunSummary",
+    "RetentionCheckpoint",
 ]
@@ -0,0 +1,41 @@
+"""Auto-approval rules a user grants for their own high-risk steps."""
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import JSON, Boolean, DateTime, ForeignKey, Integer, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db import Base
+
+
+class ApprovalPolicy(Base):
+    """
+    One auto-approval rule: steps of `user_id`'s runs that match it skip
+    the human approval gate.
+
+    A step matches when its tool is `tool` (any tool when NULL), its risk
+    level is at most `max_risk_level`, every condition holds and the
+    rule has not used up `daily_quota` auto-approvals today (UTC).
+    Conditions are `{"field": ..., "op": ..., "value": ...}` objects
+    over the step's facts; see `services.policy`.
+    """
+
+    __tablename__ = "approval_policies"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+
+    tool: Mapped[Optional[str]] = mapped_column(String(255))  # NULL = any tool
+    max_risk_level: Mapped[str] = mapped_column(String(10), default="L3", nullable=False)
+    conditions: Mapped[list] = mapped_column(JSON, default=list, nullable=False)
+    daily_quota: Mapped[Optional[int]] = mapped_column(Integer)  # NULL = unlimited
+    enabled: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=func.now(), onupdate=func.now())
+
+    def __repr__(self) -> str:
+        return f"<ApprovalPolicy(id={self.id}, user_id={self.user_id}, tool={self.tool})>"
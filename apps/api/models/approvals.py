@@ -1,7 +1,7 @@
 import enum
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import String, ForeignKey, DateTime, Enum, Integer, Text, func
+from sqlalchemy import String, ForeignKey, DateTime, Enum, Index, Integer, Text, func, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from db import Base
 
@@ -12,23 +12,66 @@ class ApprovalStatus(str, enum.Enum):
 
 class Approval(Base):
     __tablename__ = "approvals"
+    __table_args__ = (
+        Index("ix_approvals_run_id_status", "run_id", "status"),
+        # Pending approvals only; the enum is stored by name
+        Index(
+            "ix_approvals_required",
+            "run_id",
+            postgresql_where=text("status = 'REQUIRED'"),
+            sqlite_where=text("status = 'REQUIRED'"),
+        ),
+        # Daily quota usage of an auto-approval policy
+        Index("ix_approvals_policy_id_decided_at", "policy_id", "decided_at"),
+        # Approver inbox: an approver's pending approvals, oldest first
+        Index(
+            "ix_approvals_inbox",
+            "approver_id",
+            "id",
+            postgresql_where=text("status = 'REQUIRED'"),
+            sqlite_where=text("status = 'REQUIRED'"),
+        ),
+        # Approval timers: pending approvals by deadline
+        Index(
+            "ix_approvals_expiry",
+            "expires_at",
+            postgresql_where=text("status = 'REQUIRED' AND expires_at IS NOT NULL"),
+            sqlite_where=text("status = 'REQUIRED' AND expires_at IS NOT NULL"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    run_id: Mapped[int] = mapped_column(ForeignKey("workflow_runs.id", ondelete="CASCADE"), nullable=False, index=True)
+    run_id: Mapped[int] = mapped_column(ForeignKey("workflow_runs.id", ondelete="CASCADE"), nullable=False)
     step_id: Mapped[Optional[int]] = mapped_column(ForeignKey("workflow_steps.id", ondelete="CASCADE"), nullable=True)
     
     reason: Mapped[str] = mapped_column(Text, nullable=False)
     status: Mapped[ApprovalStatus] = mapped_column(Enum(ApprovalStatus), default=ApprovalStatus.REQUIRED, nullable=False)
     
+    # Who is asked to decide; the run's owner unless reassigned
+    approver_id: Mapped[Optional[int]] = mapped_column(ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
     decided_by: Mapped[Optional[int]] = mapped_column(ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
     decided_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    # Set when a policy approved the step instead of a person
+    policy_id: Mapped[Optional[int]] = mapped_column(ForeignKey("approval_policies.id", ondelete="SET NULL"), nullable=True)
+
+    # Deadline (naive UTC) and what happens when it passes undecided:
+    # "reject", "escalate" (to escalate_to) or "cancel_run"
+    expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    expiry_action: Mapped[Optional[str]] = mapped_column(String(16), nullable=True)
+    escalate_to: Mapped[Optional[int]] = mapped_column(ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
     
     created_at: Mapped[datetime] = mapped_column(DateTime, default=func.now())
 
+    # Optimistic concurrency: every ORM UPDATE is "... WHERE version = ?"
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
+
     # Relationships
     run: Mapped["WorkflowRun"] = relationship("WorkflowRun", back_populates="approvals")
     step: Mapped[Optional["WorkflowStep"]] = relationship("WorkflowStep", back_populates="approvals")
-    decided_by_user: Mapped[Optional["User"]] = relationship("User", back_populates="decided_approvals")
+    decided_by_user: Mapped[Optional["User"]] = relationship(
+        "User", back_populates="decided_approvals", foreign_keys=[decided_by]
+    )
 
     def __repr__(self) -> str:
         return f"<Approval(id={self.id}, run_id={self.run_id}, status={self.status})>"
@@ -0,0 +1,34 @@
+"""Resume point of the retention purge."""
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import BigInteger, DateTime, Integer, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db import Base
+
+
+class RetentionCheckpoint(Base):
+    """
+    Progress of one retention job through `workflow_runs`, in id order.
+
+    Updated in the same transaction as each deleted batch, so an
+    interrupted pass resumes after the last committed batch. Reset to 0
+    when a pass reaches the end of the table.
+    """
+
+    __tablename__ = "retention_checkpoints"
+
+    job: Mapped[str] = mapped_column(String(64), primary_key=True)
+    last_run_id: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+
+    # Totals for the current pass
+    runs_deleted: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    rows_deleted: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    pass_started_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=func.now(), onupdate=func.now())
+
+    def __repr__(self) -> str:
+        return f"<RetentionCheckpoint(job={self.job}, last_run_id={self.last_run_id})>"
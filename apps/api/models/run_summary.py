@@ -0,0 +1,65 @@
+"""Per-run progress projection for dashboards."""
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DateTime, Enum, Float, ForeignKey, Index, Integer, Text, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db import Base
+from models.workflows import RunState
+
+
+class RunSummary(Base):
+    """
+    One row per run: step counts, the approval it waits on and timings.
+
+    Adjusted by `services.run_summary.apply_transition` in the same
+    transaction as every step and approval transition, so listing a
+    user's runs with progress is a single indexed read.
+    """
+
+    __tablename__ = "run_summaries"
+    __table_args__ = (
+        # "My runs", most recently active first, keyset-paged
+        Index("ix_run_summaries_user_activity", "user_id", "last_event_at", "run_id"),
+    )
+
+    run_id: Mapped[int] = mapped_column(
+        ForeignKey("workflow_runs.id", ondelete="CASCADE"), primary_key=True
+    )
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    intent: Mapped[str] = mapped_column(Text, nullable=False)
+    state: Mapped[RunState] = mapped_column(Enum(RunState), nullable=False)
+
+    # Step counts by state
+    steps_total: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    steps_pending: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    steps_ready: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    steps_running: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    steps_blocked: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    steps_succeeded: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    steps_failed: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    steps_skipped: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    # Oldest approval the run is waiting on, if any
+    blocking_approval_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("approvals.id", ondelete="SET NULL"), nullable=True
+    )
+    blocking_reason: Mapped[Optional[str]] = mapped_column(Text)
+
+    started_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    last_event_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    # Up to the last transition, or to finished_at once the run is final
+    duration_seconds: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=func.now(), onupdate=func.now())
+
+    def __repr__(self) -> str:
+        return (
+            f"<RunSummary(run_id={self.run_id}, state={self.state}, "
+            f"succeeded={self.steps_succeeded}/{self.steps_total})>"
+        )
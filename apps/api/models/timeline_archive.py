@@ -0,0 +1,40 @@
+"""Offset index into archived timeline segment files."""
+
+from datetime import datetime
+
+from sqlalchemy import String, BigInteger, Integer, DateTime, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db import Base
+
+
+class TimelineArchive(Base):
+    """
+    Location of one run's events inside a compressed segment file.
+
+    Each row points at a single zlib block holding the run's events from
+    one archived partition, as newline-separated JSON lines in id order.
+    A run whose events spanned several partitions has one row per block.
+    """
+
+    __tablename__ = "timeline_archives"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    # No foreign key: the archive may outlive the run it belongs to
+    run_id: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
+
+    segment: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
+    offset: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    length: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    first_event_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    last_event_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    event_count: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=func.now())
+
+    def __repr__(self) -> str:
+        return (
+            f"<TimelineArchive(run_id={self.run_id}, segment={self.segment}, "
+            f"events={self.first_event_id}..{self.last_event_id})>"
+        )
@@ -4,7 +4,7 @@ import enum
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, ForeignKey, Text, DateTime, Enum, func
+from sqlalchemy import ForeignKey, Text, DateTime, Enum, Index, LargeBinary, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from db import Base
@@ -30,10 +30,14 @@ class TimelineEvent(Base):
     """Event in workflow execution timeline."""
 
     __tablename__ = "timeline_events"
+    __table_args__ = (
+        # Timeline pages and stream catch-up: a run's events after a cursor
+        Index("ix_timeline_events_run_id_id", "run_id", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     run_id: Mapped[int] = mapped_column(ForeignKey(
-        "workflow_runs.id", ondelete="CASCADE"), nullable=False, index=True)
+        "workflow_runs.id", ondelete="CASCADE"), nullable=False)
     step_id: Mapped[Optional[int]] = mapped_column(ForeignKey(
         "workflow_steps.id", ondelete="SET NULL"), nullable=True)
     approval_id: Mapped[Optional[int]] = mapped_column(
@@ -42,8 +46,13 @@ class TimelineEvent(Base):
     event_type: Mapped[EventType] = mapped_column(
         Enum(EventType), nullable=False)
     message: Mapped[str] = mapped_column(Text, nullable=False)
-    metadata: Mapped[Optional[str]] = mapped_column(
-        Text, nullable=True)  # JSON metadata
+    # `metadata` is reserved on declarative classes, so the attribute is
+    # named differently from the column
+    event_metadata: Mapped[Optional[str]] = mapped_column(
+        "metadata", Text, nullable=True)  # JSON metadata
+    # Event body serialized once at write time (see services/frames.py)
+    payload: Mapped[Optional[bytes]] = mapped_column(
+        LargeBinary, nullable=True)
 
     created_at: Mapped[datetime] = mapped_column(
         DateTime, default=func.now(), nullable=False)
@@ -51,13 +60,24 @@ class TimelineEvent(Base):
     def __repr__(self) -> str:
         return f"<TimelineEvent(id={self.id}, run_id={self.run_id}, event_type={self.event_type})>"
 
-    def to_sse(self) -> str:
-        """Format event as Server-Sent Event."""
+    def frame_payload(self) -> bytes:
+        """Pre-serialized event body; built on the fly for legacy rows."""
+        if self.payload is not None:
+            return self.payload
+
         import json
 
-        return f"data: {json.dumps({
-            'event': self.event_type.value,
-            'message': self.message,
-            'timestamp': self.created_at.isoformat(),
-            'metadata': json.loads(self.metadata) if self.metadata else {},
-        })}\n\n"
+        from services.frames import encode_payload
+
+        return encode_payload(
+            self.event_type.value,
+            self.message,
+            self.created_at.isoformat(),
+            json.loads(self.event_metadata) if self.event_metadata else None,
+        )
+
+    def to_sse(self) -> bytes:
+        """Format event as a Server-Sent Event frame."""
+        from services.frames import sse_frame
+
+        return sse_frame(self.id, self.frame_payload())
@@ -25,7 +25,9 @@ class User(Base):
     # Relationships
     profile: Mapped["Profile"] = relationship("Profile", back_populates="user", cascade="all, delete-orphan", uselist=False)
     workflow_runs: Mapped[List["WorkflowRun"]] = relationship("WorkflowRun", back_populates="user")
-    decided_approvals: Mapped[List["Approval"]] = relationship("Approval", back_populates="decided_by_user")
+    decided_approvals: Mapped[List["Approval"]] = relationship(
+        "Approval", back_populates="decided_by_user", foreign_keys="Approval.decided_by"
+    )
 
     def __repr__(self) -> str:
         return f"<User(email={self.email}, role={self.role})>"
@@ -1,7 +1,7 @@
 import enum
 from datetime import datetime
 from typing import Optional, List
-from sqlalchemy import String, ForeignKey, JSON, DateTime, Enum, Integer, Text, func
+from sqlalchemy import String, ForeignKey, JSON, DateTime, Enum, Index, Integer, Text, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from db import Base
 
@@ -14,6 +14,9 @@ class RunState(str, enum.Enum):
     FAILED = "failed"
     CANCELED = "canceled"
 
+# Run states that never change again
+TERMINAL_RUN_STATES = (RunState.COMPLETED, RunState.FAILED, RunState.CANCELED)
+
 class StepState(str, enum.Enum):
     PENDING = "pending"
     READY = "ready"
@@ -36,6 +39,10 @@ class WorkflowRun(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=func.now(), onupdate=func.now())
 
+    # Optimistic concurrency: every ORM UPDATE is "... WHERE version = ?"
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
+
     # Relationships
     user: Mapped["User"] = relationship("User", back_populates="workflow_runs")
     steps: Mapped[List["WorkflowStep"]] = relationship("WorkflowStep", back_populates="run", cascade="all, delete-orphan")
@@ -47,13 +54,18 @@ class WorkflowRun(Base):
 
 class WorkflowStep(Base):
     __tablename__ = "workflow_steps"
+    __table_args__ = (
+        # Scheduler: a run's steps in a given state
+        Index("ix_workflow_steps_run_id_state", "run_id", "state"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    run_id: Mapped[int] = mapped_column(ForeignKey("workflow_runs.id", ondelete="CASCADE"), nullable=False, index=True)
+    run_id: Mapped[int] = mapped_column(ForeignKey("workflow_runs.id", ondelete="CASCADE"), nullable=False)
     
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     depends_on: Mapped[Optional[list]] = mapped_column(JSON, default=list) # List of step IDs
     tool: Mapped[Optional[str]] = mapped_column(String(255))
+    risk_level: Mapped[str] = mapped_column(String(10), default="L0")  # L0, L1, L2, L3
     
     state: Mapped[StepState] = mapped_column(Enum(StepState), default=StepState.PENDING, nullable=False)
     attempt: Mapped[int] = mapped_column(Integer, default=0)
@@ -64,6 +76,10 @@ class WorkflowStep(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=func.now(), onupdate=func.now())
 
+    # Optimistic concurrency: every ORM UPDATE is "... WHERE version = ?"
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
+
     # Relationships
     run: Mapped["WorkflowRun"] = relationship("WorkflowRun", back_populates="steps")
     approvals: Mapped[List["Approval"]] = relationship("Approval", back_populates="step")
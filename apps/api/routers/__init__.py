@@ -1,3 +1,3 @@
-from . import health, users, workflows
+from . import health, users, workflows, orchestration, streams, approvals, multiplex
 
-__all__ = ["health", "users", "workflows"]
+__all__ = ["health", "users", "workflows", "orchestration", "streams", "approvals", "multiplex"]
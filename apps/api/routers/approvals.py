@@ -1,16 +1,31 @@
 """Approval decision endpoints."""
 
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, Field
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from db import SessionLocal
-from models.approvals import Approval
-from models.timeline_event import TimelineEvent, EventType
+from db import SessionLocal, get_read_db
+from models.approval_policy import ApprovalPolicy
+from models.approvals import Approval, ApprovalStatus
+from models.workflows import WorkflowRun, WorkflowStep, TERMINAL_RUN_STATES
 from services.approval import ApprovalService
+from services.approval_inbox import pending_count
+from services.http_cache import cache_control, etag_matches, make_etag, not_modified, response_cache
+from services.policy import PolicyService
 
 router = APIRouter(prefix="/api/approvals", tags=["approvals"])
 
+# Most decisions accepted by one bulk request
+MAX_BULK_DECISIONS = 500
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
 
 def get_db():
     """Dependency to get database session."""
@@ -29,13 +44,221 @@ class ApprovalDecision(BaseModel):
     reason: str = None  # Optional reason for rejection
 
 
+class ApprovalDeadline(BaseModel):
+    """Approval deadline payload."""
+
+    timeout_seconds: int = Field(ge=0)  # From now; 0 removes the deadline
+    action: Optional[str] = None  # "reject", "escalate" or "cancel_run"; default from settings
+    escalate_to: Optional[int] = None  # User ID an "escalate" action reassigns to
+
+
+class BulkDecisionItem(BaseModel):
+    """One decision in a bulk request."""
+
+    approval_id: int
+    decision: str  # "approve" or "reject"
+    reason: Optional[str] = None  # Optional reason for rejection
+
+
+class BulkApprovalDecision(BaseModel):
+    """Bulk approval decision payload."""
+
+    decided_by: int  # User ID making the decisions
+    decisions: list[BulkDecisionItem] = Field(min_length=1, max_length=MAX_BULK_DECISIONS)
+
+
+@router.post("/decisions")
+def make_bulk_approval_decisions(
+    payload: BulkApprovalDecision,
+    db: Session = Depends(get_db),
+) -> dict:
+    """
+    Approve and/or reject many approvals in one request.
+
+    curl -X POST http://localhost:8000/api/approvals/decisions \
+      -H 'Content-Type: application/json' \
+      -d '{"decided_by": 1, "decisions": [{"approval_id": 5, "decision": "approve"},
+           {"approval_id": 6, "decision": "reject", "reason": "Not this one"}]}'
+
+    All valid decisions, their step transitions and timeline events
+    commit in one transaction; invalid items are reported per item and
+    do not affect the rest. Each run with an applied decision is queued
+    for resumption once, however many of its approvals were decided.
+    """
+    result = ApprovalService(db).decide_many(
+        [item.model_dump() for item in payload.decisions], payload.decided_by
+    )
+
+    return {
+        "applied": sum(item["success"] for item in result["results"]),
+        "results": result["results"],
+    }
+
+
+@router.get("/inbox")
+async def get_approval_inbox(
+    approver_id: int,
+    cursor: Optional[int] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db),
+) -> dict:
+    """
+    List an approver's pending approvals across all runs, oldest first.
+
+    Served by the partial `ix_approvals_inbox` index, which holds only
+    REQUIRED approvals. Pages are keyset-based: pass the returned
+    `next_cursor` as `cursor`. The first page also carries the pending
+    count.
+    """
+    query = (
+        select(Approval, WorkflowRun.intent, WorkflowStep.name)
+        .join(WorkflowRun, WorkflowRun.id == Approval.run_id)
+        .outerjoin(WorkflowStep, WorkflowStep.id == Approval.step_id)
+        .where(Approval.approver_id == approver_id, Approval.status == ApprovalStatus.REQUIRED)
+    )
+    if cursor:
+        query = query.where(Approval.id > cursor)
+
+    # Ids grow with creation time. Fetch one extra row to learn whether another page exists
+    rows = (await db.execute(query.order_by(Approval.id).limit(limit + 1))).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    last = rows[-1].Approval if has_more else None
+    return {
+        "approver_id": approver_id,
+        "pending": None if cursor is not None else await pending_count(db, approver_id),
+        "approvals": [
+            {
+                "id": approval.id,
+                "run_id": approval.run_id,
+                "step_id": approval.step_id,
+                "intent": intent,
+                "step_name": step_name,
+                "reason": approval.reason,
+                "expires_at": approval.expires_at.isoformat() if approval.expires_at else None,
+                "created_at": approval.created_at.isoformat(),
+            }
+            for approval, intent, step_name in rows
+        ],
+        "next_cursor": last.id if last else None,
+    }
+
+
+@router.get("/inbox/count")
+async def get_approval_inbox_count(
+    approver_id: int,
+    db: AsyncSession = Depends(get_read_db),
+) -> dict:
+    """
+    Number of pending approvals for an approver; cheap enough to poll.
+
+    Cached per process for `APPROVAL_COUNT_CACHE_SECONDS` and dropped
+    when this process creates or decides one of the approver's
+    approvals. To be pushed changes instead, subscribe to
+    `/api/streams/runs?user_id=` and refetch on `approval_*` events.
+    """
+    return {"approver_id": approver_id, "pending": await pending_count(db, approver_id)}
+
+
+class PolicyCreate(BaseModel):
+    """Auto-approval policy payload."""
+
+    user_id: int
+    tool: Optional[str] = None  # None = any tool
+    max_risk_level: str = "L3"
+    conditions: list[dict] = Field(default_factory=list)  # [{"field", "op", "value"}]
+    daily_quota: Optional[int] = None  # None = unlimited
+
+
+class PolicyUpdate(BaseModel):
+    """
+    Fields to change on a policy; omitted fields are kept.
+
+    `tool` and `daily_quota` can be set to null (any tool, unlimited);
+    the other fields cannot.
+    """
+
+    tool: Optional[str] = None
+    max_risk_level: Optional[str] = None
+    conditions: Optional[list[dict]] = None
+    daily_quota: Optional[int] = None
+    enabled: Optional[bool] = None
+
+
+def _policy_dict(policy: ApprovalPolicy) -> dict:
+    return {
+        "id": policy.id,
+        "user_id": policy.user_id,
+        "tool": policy.tool,
+        "max_risk_level": policy.max_risk_level,
+        "conditions": policy.conditions,
+        "daily_quota": policy.daily_quota,
+        "enabled": policy.enabled,
+    }
+
+
+@router.get("/policies")
+def list_approval_policies(user_id: int, db: Session = Depends(get_db)) -> dict:
+    """List a user's auto-approval policies."""
+    policies = PolicyService(db).list_policies(user_id)
+    return {"user_id": user_id, "policies": [_policy_dict(p) for p in policies]}
+
+
+@router.post("/policies")
+def create_approval_policy(payload: PolicyCreate, db: Session = Depends(get_db)) -> dict:
+    """
+    Pre-authorize high-risk steps of a user's runs.
+
+    curl -X POST http://localhost:8000/api/approvals/policies \
+      -H 'Content-Type: application/json' \
+      -d '{"user_id": 1, "tool": "job_submit", "daily_quota": 20,
+           "conditions": [{"field": "intent", "op": "contains", "value": "backend"}]}'
+
+    Matching steps are approved by the scheduler instead of blocking.
+    Takes effect on this worker immediately and on others within
+    `POLICY_CACHE_SECONDS`.
+    """
+    try:
+        policy = PolicyService(db).create_policy(**payload.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _policy_dict(policy)
+
+
+@router.patch("/policies/{policy_id}")
+def update_approval_policy(
+    policy_id: int,
+    payload: PolicyUpdate,
+    db: Session = Depends(get_db),
+) -> dict:
+    """Change or disable an auto-approval policy."""
+    try:
+        policy = PolicyService(db).update_policy(
+            policy_id, **payload.model_dump(exclude_unset=True)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not policy:
+        raise HTTPException(status_code=404, detail="Policy not found")
+    return _policy_dict(policy)
+
+
+@router.delete("/policies/{policy_id}")
+def delete_approval_policy(policy_id: int, db: Session = Depends(get_db)) -> dict:
+    """Delete an auto-approval policy; its past approvals keep their record."""
+    if not PolicyService(db).delete_policy(policy_id):
+        raise HTTPException(status_code=404, detail="Policy not found")
+    return {"success": True}
+
+
 @router.get("/{approval_id}")
 async def get_approval(
     approval_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ) -> dict:
     """Get approval details."""
-    approval = db.query(Approval).filter(Approval.id == approval_id).first()
+    approval = await db.get(Approval, approval_id)
     if not approval:
         raise HTTPException(status_code=404, detail="Approval not found")
 
@@ -45,14 +268,18 @@ async def get_approval(
         "step_id": approval.step_id,
         "status": approval.status.value,
         "reason": approval.reason,
+        "approver_id": approval.approver_id,
         "decided_by": approval.decided_by,
+        "policy_id": approval.policy_id,
+        "expires_at": approval.expires_at.isoformat() if approval.expires_at else None,
+        "expiry_action": approval.expiry_action,
         "decided_at": approval.decided_at.isoformat() if approval.decided_at else None,
         "created_at": approval.created_at.isoformat(),
     }
 
 
 @router.post("/{approval_id}/decision")
-async def make_approval_decision(
+def make_approval_decision(
     approval_id: int,
     payload: ApprovalDecision,
     db: Session = Depends(get_db),
@@ -62,47 +289,23 @@ async def make_approval_decision(
 
     This endpoint:
     1. Updates the approval status
-    2. Unblocks or skips the step
-    3. Triggers scheduler to resume
+    2. Unblocks or skips the step and records the decision's event, in
+       the same commit
+    3. Queues the parked run for resumption on the run dispatcher
+
+    A plain `def`: the synchronous write path runs in the threadpool
+    instead of blocking the event loop.
     """
     approval_service = ApprovalService(db)
 
     if payload.decision.lower() == "approve":
         result = approval_service.approve_step(approval_id, payload.decided_by)
 
-        if result["success"]:
-            # Record approval event
-            approval = db.query(Approval).filter(
-                Approval.id == approval_id).first()
-            event = TimelineEvent(
-                run_id=approval.run_id,
-                step_id=approval.step_id,
-                approval_id=approval.id,
-                event_type=EventType.APPROVAL_APPROVED,
-                message=f"Approval granted: {approval.reason}",
-            )
-            db.add(event)
-            db.commit()
-
     elif payload.decision.lower() == "reject":
         result = approval_service.reject_step(
             approval_id, payload.decided_by, payload.reason
         )
 
-        if result["success"]:
-            # Record rejection event
-            approval = db.query(Approval).filter(
-                Approval.id == approval_id).first()
-            event = TimelineEvent(
-                run_id=approval.run_id,
-                step_id=approval.step_id,
-                approval_id=approval.id,
-                event_type=EventType.APPROVAL_REJECTED,
-                message=f"Approval rejected: {payload.reason or 'No reason provided'}",
-            )
-            db.add(event)
-            db.commit()
-
     else:
         raise HTTPException(
             status_code=400,
@@ -112,20 +315,77 @@ async def make_approval_decision(
     return result
 
 
+@router.put("/{approval_id}/deadline")
+def set_approval_deadline(
+    approval_id: int,
+    payload: ApprovalDeadline,
+    db: Session = Depends(get_db),
+) -> dict:
+    """
+    Set or remove a pending approval's deadline.
+
+    curl -X PUT http://localhost:8000/api/approvals/5/deadline \
+      -H 'Content-Type: application/json' \
+      -d '{"timeout_seconds": 3600, "action": "escalate", "escalate_to": 2}'
+
+    If the approval is still undecided when the deadline passes, the
+    approval timers reject it, escalate it or cancel its run.
+    """
+    try:
+        result = ApprovalService(db).set_deadline(approval_id, **payload.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    expires_at = result["expires_at"]
+    result["expires_at"] = expires_at.isoformat() if expires_at else None
+    return result
+
+
 @router.get("/workflow/{workflow_id}")
 async def get_workflow_approvals(
     workflow_id: int,
-    db: Session = Depends(get_db),
-) -> dict:
-    """Get all approvals for a workflow."""
-    approvals = (
-        db.query(Approval)
-        .filter(Approval.run_id == workflow_id)
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+) -> Response:
+    """
+    Get all approvals for a workflow.
+
+    The ETag is the number of the run's approvals and the sum of their
+    versions, which grows with every new approval and every change to
+    one, read with the run's state in one statement. A poll sending it
+    back in `If-None-Match` gets an empty 304 while nothing changed.
+    """
+    row = (
+        await db.execute(
+            select(
+                WorkflowRun.state,
+                func.count(Approval.id),
+                func.coalesce(func.sum(Approval.version), 0),
+            )
+            .outerjoin(Approval, Approval.run_id == WorkflowRun.id)
+            .where(WorkflowRun.id == workflow_id)
+            .group_by(WorkflowRun.id, WorkflowRun.state)
+        )
+    ).first()
+    state, count, versions = row or (None, 0, 0)
+
+    etag = make_etag("a", workflow_id, count, versions)
+    headers = {"ETag": etag, "Cache-Control": cache_control(state in TERMINAL_RUN_STATES)}
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, headers["Cache-Control"])
+
+    cache_key = ("approvals", workflow_id, etag)
+    body = response_cache.get(cache_key)
+    if body is not None:
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    approvals = await db.scalars(
+        select(Approval)
+        .where(Approval.run_id == workflow_id)
         .order_by(Approval.created_at.desc())
-        .all()
     )
 
-    return {
+    response = JSONResponse({
         "workflow_id": workflow_id,
         "approvals": [
             {
@@ -133,10 +393,16 @@ async def get_workflow_approvals(
                 "step_id": a.step_id,
                 "status": a.status.value,
                 "reason": a.reason,
+                "approver_id": a.approver_id,
                 "decided_by": a.decided_by,
+                "policy_id": a.policy_id,
+                "expires_at": a.expires_at.isoformat() if a.expires_at else None,
+                "expiry_action": a.expiry_action,
                 "decided_at": a.decided_at.isoformat() if a.decided_at else None,
                 "created_at": a.created_at.isoformat(),
             }
             for a in approvals
         ],
-    }
+    }, headers=headers)
+    response_cache.put(cache_key, response.body)
+    return response
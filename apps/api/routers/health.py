@@ -1,5 +1,6 @@
 from fastapi import APIRouter
 from config import settings
+from db import pool_stats
 
 router = APIRouter(tags=["health"])
 
@@ -10,3 +11,14 @@ async def health_check():
         "app": settings.PROJECT_NAME,
         "version": settings.APP_VERSION
     }
+
+@router.get("/health/db")
+async def db_health_check():
+    """Connection pool usage and checkout latency per engine."""
+    pools = pool_stats()
+    saturated = [p["role"] for p in pools if p.get("saturation", 0) >= 1]
+    return {
+        "status": "saturated" if saturated else "ok",
+        "saturated": saturated,
+        "pools": pools,
+    }
@@ -0,0 +1,110 @@
+"""Prometheus metrics endpoint."""
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from db import pool_stats
+from services.approval_timers import approval_timers
+from services.dispatcher import run_dispatcher
+from services.http_cache import response_cache
+from services.timeline_hub import timeline_hub
+
+router = APIRouter(tags=["metrics"])
+
+
+class RuntimeCollector:
+    """
+    Reads queue depths, stream subscriptions and pool usage at scrape time.
+
+    These already live in the services' own `stats()`, so nothing is
+    updated on the request or scheduling paths to export them.
+    """
+
+    def collect(self):
+        dispatcher = run_dispatcher.stats()
+        yield GaugeMetricFamily(
+            "lifeos_dispatcher_queued_runs",
+            "Runs queued for a dispatcher worker",
+            dispatcher["queued"],
+        )
+        yield GaugeMetricFamily(
+            "lifeos_dispatcher_active_runs", "Runs being driven", dispatcher["active"]
+        )
+        yield GaugeMetricFamily(
+            "lifeos_dispatcher_workers", "Dispatcher worker threads", dispatcher["workers"]
+        )
+        yield CounterMetricFamily(
+            "lifeos_dispatcher_drives", "Completed drive_run calls", dispatcher["drives"]
+        )
+
+        timers = approval_timers.stats()
+        yield GaugeMetricFamily(
+            "lifeos_approval_timers_armed",
+            "Approval deadlines armed in this process",
+            timers["armed"],
+        )
+        expired = CounterMetricFamily(
+            "lifeos_approvals_expired", "Approvals released by their deadline", labels=["action"]
+        )
+        expired.add_metric(["reject"], timers["rejected"])
+        expired.add_metric(["escalate"], timers["escalated"])
+        expired.add_metric(["cancel_run"], timers["canceled_runs"])
+        yield expired
+
+        hub = timeline_hub.stats()
+        yield GaugeMetricFamily(
+            "lifeos_stream_subscriptions", "Timeline hub subscriptions", hub["subscriptions"]
+        )
+        yield GaugeMetricFamily(
+            "lifeos_stream_queued_events",
+            "Events queued across subscriptions",
+            hub["queued_events"],
+        )
+        overflows = CounterMetricFamily(
+            "lifeos_stream_overflows", "Subscriber queue overflows by policy", labels=["policy"]
+        )
+        for policy, count in hub["overflows"].items():
+            overflows.add_metric([policy], count)
+        yield overflows
+
+        cache = response_cache.stats()
+        yield GaugeMetricFamily(
+            "lifeos_response_cache_bytes", "Cached response bytes", cache["bytes"]
+        )
+        cache_lookups = CounterMetricFamily(
+            "lifeos_response_cache_lookups", "Response cache lookups", labels=["result"]
+        )
+        cache_lookups.add_metric(["hit"], cache["hits"])
+        cache_lookups.add_metric(["miss"], cache["misses"])
+        yield cache_lookups
+
+        pools = [p for p in pool_stats() if "checked_out" in p]
+        for name, key, doc in (
+            ("lifeos_db_pool_size", "size", "Connections held open by the pool"),
+            ("lifeos_db_pool_checked_out", "checked_out", "Connections in use"),
+            ("lifeos_db_pool_overflow", "overflow", "Connections above the pool size"),
+            ("lifeos_db_pool_capacity", "capacity", "Pool size plus max overflow"),
+        ):
+            gauge = GaugeMetricFamily(name, doc, labels=["role"])
+            for pool in pools:
+                gauge.add_metric([pool["role"]], pool[key])
+            yield gauge
+        for name, key, doc in (
+            ("lifeos_db_pool_checkouts", "checkouts", "Connection checkouts"),
+            ("lifeos_db_pool_timeouts", "timeouts", "Checkouts that timed out waiting"),
+        ):
+            counter = CounterMetricFamily(name, doc, labels=["role"])
+            for pool in pools:
+                counter.add_metric([pool["role"]], pool[key])
+            yield counter
+
+
+REGISTRY.register(RuntimeCollector())
+
+
+@router.get("/metrics")
+def metrics() -> Response:
+    """Prometheus text exposition of this process's metrics."""
+    return Response(content=generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,139 @@
+"""Multiplexed Server-Sent Events: many runs over one connection."""
+
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Header, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from sqlalchemy import or_, select
+
+from db import StreamingSessionLocal, wants_primary
+from models.workflows import WorkflowRun
+from models.timeline_event import TimelineEvent
+from services.frames import json_line, sse_message
+from services.timeline_hub import (
+    CATCH_UP_PAGE_SIZE,
+    OverflowPolicy,
+    stream_frames,
+    timeline_hub,
+)
+
+router = APIRouter(prefix="/api/streams", tags=["streams"])
+
+
+class SubscriptionChange(BaseModel):
+    """Runs to add to or remove from a live subscription."""
+
+    add: list[int] = Field(default_factory=list)
+    remove: list[int] = Field(default_factory=list)
+
+
+async def _catch_up_page(
+    run_ids: list[int],
+    user_id: Optional[int],
+    after: int,
+    primary: bool = False,
+) -> list[tuple[int, bytes]]:
+    """Subscribed runs' events with id > after, one page at a time."""
+    scope = []
+    if run_ids:
+        scope.append(TimelineEvent.run_id.in_(run_ids))
+    if user_id is not None:
+        scope.append(
+            TimelineEvent.run_id.in_(
+                select(WorkflowRun.id).where(WorkflowRun.user_id == user_id)
+            )
+        )
+
+    async with StreamingSessionLocal(info={"primary": primary}) as db:
+        events = await db.scalars(
+            select(TimelineEvent)
+            .where(or_(*scope), TimelineEvent.id > after)
+            .order_by(TimelineEvent.id)
+            .limit(CATCH_UP_PAGE_SIZE)
+        )
+        return [(e.id, json_line(e.id, e.frame_payload(), e.run_id)) for e in events]
+
+
+@router.get("/runs")
+async def stream_runs(
+    request: Request,
+    run_ids: list[int] = Query(default_factory=list, alias="run_id"),
+    user_id: Optional[int] = None,
+    last_event_id: int = Header(0, alias="Last-Event-ID"),
+    overflow: Optional[OverflowPolicy] = Query(
+        None, description="What to do if this client falls behind"
+    ),
+):
+    """
+    Stream timeline events for many runs over one SSE connection.
+
+    Subscribe to explicit runs, to every run of a user, or both:
+    curl -N "http://localhost:8000/api/streams/runs?run_id=1&run_id=2"
+    curl -N "http://localhost:8000/api/streams/runs?user_id=1"
+
+    Every event carries its `run_id`. The first frame is a `subscribed`
+    event with the `subscription_id` used to change the run set via
+    `POST /api/streams/{subscription_id}/runs`. Pass `Last-Event-ID` on
+    reconnect to replay what was missed.
+
+    A slow client is handled per `overflow` (default
+    `STREAM_OVERFLOW_POLICY`) instead of buffering without bound.
+    """
+    if not run_ids and user_id is None:
+        raise HTTPException(status_code=400, detail="Provide run_id and/or user_id")
+
+    async def event_generator():
+        sub = timeline_hub.subscribe(run_ids=run_ids, user_id=user_id, policy=overflow)
+        primary = wants_primary(request)
+
+        def catch_up(after: int):
+            return _catch_up_page(sorted(sub.run_ids), user_id, after, primary)
+
+        try:
+            yield sse_message({
+                "event": "subscribed",
+                "subscription_id": sub.id,
+                "run_ids": sorted(sub.run_ids),
+                "user_id": user_id,
+                "overflow": sub.policy.value,
+            })
+
+            # Replay only on reconnect; fresh dashboards load state elsewhere
+            async for frame in stream_frames(
+                sub, last_event_id, catch_up, replay=bool(last_event_id)
+            ):
+                yield frame
+
+        finally:
+            timeline_hub.unsubscribe(sub)
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+
+@router.post("/{subscription_id}/runs")
+async def change_subscription(subscription_id: str, payload: SubscriptionChange) -> dict:
+    """
+    Add or remove runs on a live multiplexed stream.
+
+    Subscriptions live in the worker process holding the connection, so
+    this request must reach the same worker (sticky routing).
+    """
+    sub = timeline_hub.subscriptions.get(subscription_id)
+    if not sub:
+        raise HTTPException(status_code=404, detail="Subscription not found")
+
+    timeline_hub.add_runs(sub, payload.add)
+    timeline_hub.remove_runs(sub, payload.remove)
+
+    return {
+        "subscription_id": sub.id,
+        "run_ids": sorted(sub.run_ids),
+        "user_id": sub.user_id,
+    }
+
+
+@router.get("/stats")
+async def stream_stats() -> dict:
+    """Subscription, queue and overflow counts for this worker's timeline hub."""
+    return timeline_hub.stats()
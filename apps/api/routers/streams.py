@@ -1,32 +1,127 @@
 """Server-Sent Events streaming for workflow timelines."""
 
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from typing import AsyncIterator, Optional
+
+from fastapi import (
+    APIRouter, HTTPException, Depends, Header, Query, Request, WebSocket, WebSocketDisconnect,
+)
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import func, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
 import json
-import asyncio
 import time
 
-from db import SessionLocal
-from models.workflows import WorkflowRun
-from models.timeline_event import TimelineEvent
+from config import settings
+from db import StreamingSessionLocal, get_read_db, wants_primary
+from models.workflows import WorkflowRun, RunState, TERMINAL_RUN_STATES
+from models.timeline_event import EventType, TimelineEvent
+from services.frames import MsgpackCodec, SSECodec
+from services.http_cache import cache_control, etag_matches, make_etag, not_modified, response_cache
+from services.timeline_archive import aiter_timeline
+from services.timeline_hub import (
+    CATCH_UP_PAGE_SIZE,
+    OverflowPolicy,
+    stream_frames,
+    timeline_hub,
+)
+from services.tracing import tracer
 
 router = APIRouter(prefix="/api/workflows", tags=["streams"])
 
+# Timeline pagination bounds
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+# Rows fetched per round trip from the server-side cursor in NDJSON mode
+NDJSON_YIELD_PER = 500
+
+
+async def _catch_up_page(
+    workflow_id: int,
+    after: int,
+    primary: bool = False,
+) -> list[tuple[int, bytes]]:
+    """One page of history, read with a short-lived session."""
+    async with StreamingSessionLocal(info={"primary": primary}) as db:
+        return [
+            item
+            async for item in aiter_timeline(
+                db, workflow_id, after, CATCH_UP_PAGE_SIZE, tag_run=True
+            )
+        ]
+
+
+async def _run_state(workflow_id: int, primary: bool = False) -> Optional[RunState]:
+    async with StreamingSessionLocal(info={"primary": primary}) as db:
+        return await db.scalar(select(WorkflowRun.state).where(WorkflowRun.id == workflow_id))
+
+
+async def _timeline_frames(
+    workflow_id: int,
+    last_event_id: int,
+    overflow: Optional[OverflowPolicy],
+    codec: SSECodec,
+    primary: bool = False,
+) -> AsyncIterator[bytes]:
+    """
+    A run's timeline until it finishes, encoded by `codec`.
+
+    Shared by the SSE and WebSocket endpoints so both see the same events
+    from the same hub subscription. With `primary`, history is read from
+    the primary instead of the replica (read-your-writes).
+    """
+    # Delivery spans of this stream belong to the run
+    tracer.annotate(run_id=workflow_id)
+
+    # Subscribe before catching up so nothing falls in between
+    sub = timeline_hub.subscribe(run_ids=[workflow_id], policy=overflow)
+    state = None
+
+    async def finished(event) -> bool:
+        nonlocal state
+        if event is not None and event.event_type != EventType.WORKFLOW_COMPLETED:
+            return False
+        state = await _run_state(workflow_id, primary)
+        return state in TERMINAL_RUN_STATES
 
-def get_db():
-    """Dependency to get database session."""
-    db = SessionLocal()
     try:
-        yield db
+        async for frame in stream_frames(
+            sub,
+            last_event_id,
+            lambda after: _catch_up_page(workflow_id, after, primary),
+            codec,
+            until=finished,
+        ):
+            yield frame
+
+        if state not in TERMINAL_RUN_STATES:
+            return  # Disconnected on overflow
+
+        # Send completion event
+        yield codec.batch([codec.message({
+            "event": "workflow_complete",
+            "message": f"Workflow {state.value}",
+            "timestamp": str(time.time()),
+        })])
+
+    except Exception as e:
+        yield codec.batch([codec.message({
+            "event": "error",
+            "message": f"Error: {str(e)}",
+        })])
+
     finally:
-        db.close()
+        timeline_hub.unsubscribe(sub)
 
 
 @router.get("/{workflow_id}/stream")
 async def stream_workflow_timeline(
+    request: Request,
     workflow_id: int,
-    db: Session = Depends(get_db),
+    last_event_id: int = Header(0, alias="Last-Event-ID"),
+    overflow: Optional[OverflowPolicy] = Query(
+        None, description="What to do if this client falls behind"
+    ),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Stream workflow timeline events via Server-Sent Events.
@@ -37,101 +132,177 @@ async def stream_workflow_timeline(
     Or in JavaScript:
     const es = new EventSource('/api/workflows/1/stream');
     es.addEventListener('step_ready', (e) => console.log(e.data));
+
+    History after `Last-Event-ID` is replayed first, then live events
+    arrive from the shared timeline hub; the connection holds no DB
+    session and runs no poll loop of its own.
+
+    A client that reads slower than events arrive never buffers more than
+    `STREAM_QUEUE_MAX_EVENTS`; see `overflow` for what happens instead.
+    Idle streams get a `: keepalive` comment every
+    `STREAM_HEARTBEAT_SECONDS`.
     """
 
     # Verify workflow exists
-    run = db.query(WorkflowRun).filter(WorkflowRun.id == workflow_id).first()
+    run = await db.scalar(select(WorkflowRun.id).where(WorkflowRun.id == workflow_id))
     if not run:
         raise HTTPException(status_code=404, detail="Workflow not found")
 
-    async def event_generator():
-        """Generate timeline events as SSE stream."""
-        last_event_id = 0
-        polling_interval = 0.5  # Poll every 500ms
-
-        while True:
-            try:
-                # Query new events since last poll
-                events = (
-                    db.query(TimelineEvent)
-                    .filter(
-                        TimelineEvent.run_id == workflow_id,
-                        TimelineEvent.id > last_event_id,
-                    )
-                    .order_by(TimelineEvent.id)
-                    .all()
-                )
-
-                # Stream each new event
-                for event in events:
-                    event_data = {
-                        "id": event.id,
-                        "event": event.event_type.value,
-                        "message": event.message,
-                        "timestamp": event.created_at.isoformat(),
-                        "metadata": (
-                            json.loads(event.metadata)
-                            if event.metadata
-                            else {}
-                        ),
-                    }
-                    yield f"data: {json.dumps(event_data)}\n\n"
-                    last_event_id = event.id
-
-                # Check if workflow is complete
-                db.refresh(run)
-                from models.workflows import RunState
-
-                if run.state in [RunState.COMPLETED, RunState.FAILED, RunState.CANCELED]:
-                    # Send completion event
-                    yield f"data: {json.dumps({
-                        'event': 'workflow_complete',
-                        'message': f'Workflow {run.state.value}',
-                        'timestamp': str(time.time()),
-                    })}\n\n"
-                    break
-
-                # Wait before next poll
-                await asyncio.sleep(polling_interval)
-
-            except Exception as e:
-                yield f"data: {json.dumps({
-                    'event': 'error',
-                    'message': f'Error: {str(e)}',
-                })}\n\n"
-                break
-
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+    return StreamingResponse(
+        _timeline_frames(
+            workflow_id, last_event_id, overflow, SSECodec(), wants_primary(request)
+        ),
+        media_type="text/event-stream",
+    )
+
+
+@router.websocket("/{workflow_id}/ws")
+async def websocket_workflow_timeline(
+    websocket: WebSocket,
+    workflow_id: int,
+    last_event_id: int = 0,
+    compress: bool = False,
+    overflow: Optional[OverflowPolicy] = None,
+):
+    """
+    Stream workflow timeline events as binary msgpack WebSocket messages.
+
+    Same events as `/stream`, for clients where text SSE costs too much
+    bandwidth. Each message is a flag byte (0 = raw, 1 = zlib) followed
+    by a msgpack array of one or more events; see WORKFLOW_ENGINE.md.
+    Pass `last_event_id` to resume and `compress=true` to deflate larger
+    messages.
+    """
+    primary = wants_primary(websocket)
+    if await _run_state(workflow_id, primary) is None:
+        await websocket.close(code=4404, reason="Workflow not found")
+        return
+
+    await websocket.accept()
+    codec = MsgpackCodec(compress, settings.STREAM_COMPRESS_MIN_BYTES)
+
+    try:
+        async for frame in _timeline_frames(
+            workflow_id, last_event_id, overflow, codec, primary
+        ):
+            await websocket.send_bytes(frame)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+
+async def _ndjson_lines(
+    workflow_id: int,
+    after: int,
+    limit: Optional[int],
+    primary: bool = False,
+) -> AsyncIterator[bytes]:
+    """
+    Yield a run's timeline as NDJSON, one event per line.
+
+    Uses its own session: the request-scoped one is closed before a
+    streaming body is sent. Live rows are pulled from a server-side
+    cursor `NDJSON_YIELD_PER` at a time and archived ones one block at a
+    time, so memory stays flat however long the timeline is.
+    """
+    async with StreamingSessionLocal(info={"primary": primary}) as db:
+        async for _, line in aiter_timeline(
+            db, workflow_id, after, limit, yield_per=NDJSON_YIELD_PER
+        ):
+            yield line + b"\n"
 
 
 @router.get("/{workflow_id}/timeline")
 async def get_workflow_timeline(
     workflow_id: int,
-    db: Session = Depends(get_db),
-) -> dict:
-    """Get complete timeline for a workflow (non-streaming)."""
-    run = db.query(WorkflowRun).filter(WorkflowRun.id == workflow_id).first()
-    if not run:
+    after: int = Query(0, ge=0, description="Return events with id > after"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+) -> Response:
+    """
+    Get one page of a workflow timeline (non-streaming).
+
+    Pages are keyset-based: pass the returned `next_cursor` as `after`
+    to fetch the next page. `next_cursor` is null on the last page.
+
+    The body is assembled from the events' pre-serialized payloads
+    rather than encoded per request. Archived events are included
+    transparently.
+
+    The ETag is the run's last event id, its number of live events and
+    its version, read together with its state in one statement over
+    the `(run_id, id)` index. The count catches an event committing
+    after one with a higher id, which the last id alone would miss.
+    A poll sending it back in `If-None-Match` gets an empty 304 while
+    nothing changed, without any event being loaded.
+    """
+    live = (
+        select(
+            func.max(TimelineEvent.id).label("last_id"),
+            func.count(TimelineEvent.id).label("count"),
+        )
+        .where(TimelineEvent.run_id == workflow_id)
+        .subquery()
+    )
+    row = (
+        await db.execute(
+            select(WorkflowRun.state, WorkflowRun.version, live.c.last_id, live.c.count)
+            .join(live, true())
+            .where(WorkflowRun.id == workflow_id)
+        )
+    ).first()
+    if row is None:
         raise HTTPException(status_code=404, detail="Workflow not found")
 
-    events = (
-        db.query(TimelineEvent)
-        .filter(TimelineEvent.run_id == workflow_id)
-        .order_by(TimelineEvent.id)
-        .all()
+    state, version, last_id, count = row
+    etag = make_etag("t", workflow_id, last_id or 0, count, version)
+    headers = {"ETag": etag, "Cache-Control": cache_control(state in TERMINAL_RUN_STATES)}
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, headers["Cache-Control"])
+
+    cache_key = ("timeline", workflow_id, etag, after, limit)
+    body = response_cache.get(cache_key)
+    if body is not None:
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    # Fetch one extra row to learn whether another page exists
+    events = [item async for item in aiter_timeline(db, workflow_id, after, limit + 1)]
+    has_more = len(events) > limit
+    events = events[:limit]
+
+    next_cursor = json.dumps(events[-1][0] if has_more else None)
+    body = b'{"workflow_id":%d,"status":%s,"events":[%s],"next_cursor":%s}' % (
+        workflow_id,
+        json.dumps(state.value).encode(),
+        b",".join(line for _, line in events),
+        next_cursor.encode(),
     )
+    response_cache.put(cache_key, body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/{workflow_id}/timeline.ndjson")
+async def stream_workflow_timeline_ndjson(
+    request: Request,
+    workflow_id: int,
+    after: int = Query(0, ge=0, description="Return events with id > after"),
+    limit: Optional[int] = Query(None, ge=1),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Stream a workflow timeline as newline-delimited JSON.
+
+    Unlike `/timeline` this is not paginated: the whole timeline (or
+    `limit` events after `after`) is streamed in one response.
 
-    return {
-        "workflow_id": workflow_id,
-        "status": run.state.value,
-        "events": [
-            {
-                "id": e.id,
-                "event": e.event_type.value,
-                "message": e.message,
-                "timestamp": e.created_at.isoformat(),
-                "metadata": json.loads(e.metadata) if e.metadata else {},
-            }
-            for e in events
-        ],
-    }
+    curl -N http://localhost:8000/api/workflows/1/timeline.ndjson
+    """
+    run = await db.scalar(select(WorkflowRun.id).where(WorkflowRun.id == workflow_id))
+    if not run:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+
+    return StreamingResponse(
+        _ndjson_lines(workflow_id, after, limit, wants_primary(request)),
+        media_type="application/x-ndjson",
+    )
@@ -1,13 +1,91 @@
-from fastapi import APIRouter, Depends
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from db import get_db
+
+from db import get_db, get_read_db
+from models.run_summary import RunSummary
 
 router = APIRouter(prefix="/workflows", tags=["workflows"])
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def _summary_dict(summary: RunSummary) -> dict:
+    return {
+        "run_id": summary.run_id,
+        "intent": summary.intent,
+        "state": summary.state.value,
+        "steps": {
+            "total": summary.steps_total,
+            "pending": summary.steps_pending,
+            "ready": summary.steps_ready,
+            "running": summary.steps_running,
+            "blocked": summary.steps_blocked,
+            "succeeded": summary.steps_succeeded,
+            "failed": summary.steps_failed,
+            "skipped": summary.steps_skipped,
+        },
+        "blocking_approval": (
+            {"id": summary.blocking_approval_id, "reason": summary.blocking_reason}
+            if summary.blocking_approval_id
+            else None
+        ),
+        "started_at": summary.started_at.isoformat(),
+        "last_event_at": summary.last_event_at.isoformat(),
+        "finished_at": summary.finished_at.isoformat() if summary.finished_at else None,
+        "duration_seconds": summary.duration_seconds,
+    }
+
+
+def _parse_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        timestamp, run_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(timestamp), int(run_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get("/runs")
-async def list_runs(db: Session = Depends(get_db)):
-    # Placeholder for workflow runs listing
-    return {"message": "Workflow runs listing scaffold"}
+async def list_runs(
+    user_id: int,
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db),
+) -> dict:
+    """
+    List a user's runs with progress, most recently active first.
+
+    Reads the `run_summaries` projection, so a dashboard costs one
+    indexed query instead of a timeline fetch per run. Pages are
+    keyset-based: pass the returned `next_cursor` as `cursor`.
+    """
+    query = select(RunSummary).where(RunSummary.user_id == user_id)
+    if cursor:
+        query = query.where(
+            tuple_(RunSummary.last_event_at, RunSummary.run_id) < _parse_cursor(cursor)
+        )
+
+    # Fetch one extra row to learn whether another page exists
+    summaries = list(
+        await db.scalars(
+            query.order_by(RunSummary.last_event_at.desc(), RunSummary.run_id.desc())
+            .limit(limit + 1)
+        )
+    )
+    has_more = len(summaries) > limit
+    summaries = summaries[:limit]
+
+    last = summaries[-1] if has_more else None
+    return {
+        "user_id": user_id,
+        "runs": [_summary_dict(summary) for summary in summaries],
+        "next_cursor": f"{last.last_event_at.isoformat()}_{last.run_id}" if last else None,
+    }
 
 @router.post("/runs")
 async def create_run(db: Session = Depends(get_db)):
@@ -1,11 +1,21 @@
 """Approval service — approval workflow and state management."""
 
+from collections import defaultdict
 from datetime import datetime, timezone
 from typing import Optional
 
+from sqlalchemy import select
+
 from db import SessionLocal
 from models.workflows import WorkflowRun, WorkflowStep, StepState
 from models.approvals import Approval, ApprovalStatus
+from models.timeline_event import EventType
+from services.approval_inbox import pending_counts
+from services.approval_timers import approval_timers, deadline_columns
+from services.concurrency import TransitionConflict, with_retries
+from services.dispatcher import run_dispatcher
+from services.run_summary import apply_transition
+from services.timeline import timeline_writer
 
 
 class ApprovalService:
@@ -33,34 +43,49 @@ class ApprovalService:
         """
         Approve a blocked step.
 
+        The approval, the step transition and the APPROVAL_APPROVED event
+        commit together before the run is woken, so the event precedes
+        everything the resumed run records.
+
         Returns dict with:
         - success: bool
         - message: str
         """
-        approval = self.db.query(Approval).filter(
-            Approval.id == approval_id).first()
-        if not approval:
-            return {"success": False, "message": "Approval not found"}
 
-        if approval.status != ApprovalStatus.REQUIRED:
-            return {"success": False, "message": "Approval is not in REQUIRED state"}
+        def transition() -> dict:
+            approval, step, error = self._load_required(approval_id)
+            if error:
+                return {"success": False, "message": error}
 
-        step = self.db.query(WorkflowStep).filter(
-            WorkflowStep.id == approval.step_id).first()
-        if not step:
-            return {"success": False, "message": "Step not found"}
+            # Update approval
+            approval.status = ApprovalStatus.APPROVED
+            approval.decided_by = decided_by
+            approval.decided_at = datetime.now(timezone.utc)
 
-        # Update approval
-        approval.status = ApprovalStatus.APPROVED
-        approval.decided_by = decided_by
-        approval.decided_at = datetime.now(timezone.utc)
+            # Unblock step - transition to ready
+            previous_state, step.state = step.state, StepState.READY
 
-        # Unblock step - transition to ready
-        step.state = StepState.READY
+            approver_id, run_id = approval.approver_id, approval.run_id
+            # Flushes the transitions; a conflict surfaces here, before the event is written
+            apply_transition(
+                self.db, run_id, [(previous_state, step.state)], decided=[approval.id]
+            )
+            timeline_writer.stage(
+                self.db,
+                run_id,
+                step.id,
+                EventType.APPROVAL_APPROVED,
+                f"Approval granted: {approval.reason}",
+                approval_id=approval.id,
+            )
+            self.db.commit()
+            pending_counts.invalidate(approver_id)
+            approval_timers.disarm(approval_id)
+            run_dispatcher.wake(run_id)
 
-        self.db.commit()
+            return {"success": True, "message": f"Step '{step.name}' approved and ready to execute"}
 
-        return {"success": True, "message": f"Step '{step.name}' approved and ready to execute"}
+        return self._decide(transition)
 
     def reject_step(
         self,
@@ -71,36 +96,250 @@ class ApprovalService:
         """
         Reject a blocked step.
 
+        The approval, the step transition and the APPROVAL_REJECTED event
+        commit together before the run is woken.
+
+        Returns dict with:
+        - success: bool
+        - message: str
+        """
+
+        def transition() -> dict:
+            approval, step, error = self._load_required(approval_id)
+            if error:
+                return {"success": False, "message": error}
+
+            # Update approval
+            approval.status = ApprovalStatus.REJECTED
+            approval.decided_by = decided_by
+            approval.decided_at = datetime.now(timezone.utc)
+            if reason:
+                approval.reason = reason
+
+            # Skip the step
+            previous_state, step.state = step.state, StepState.SKIPPED
+
+            approver_id, run_id = approval.approver_id, approval.run_id
+            # Flushes the transitions; a conflict surfaces here, before the event is written
+            apply_transition(
+                self.db, run_id, [(previous_state, step.state)], decided=[approval.id]
+            )
+            timeline_writer.stage(
+                self.db,
+                run_id,
+                step.id,
+                EventType.APPROVAL_REJECTED,
+                f"Approval rejected: {reason or 'No reason provided'}",
+                approval_id=approval.id,
+            )
+            self.db.commit()
+            pending_counts.invalidate(approver_id)
+            approval_timers.disarm(approval_id)
+            run_dispatcher.wake(run_id)
+
+            return {
+                "success": True,
+                "message": f"Step '{step.name}' rejected and marked as skipped",
+            }
+
+        return self._decide(transition)
+
+    def decide_many(self, decisions: list[dict], decided_by: Optional[int] = None) -> dict:
+        """
+        Apply many approve/reject decisions in one transaction.
+
+        Each decision is a dict with `approval_id`, `decision` ("approve"
+        or "reject") and an optional `reason`. The approvals and their
+        steps are loaded and validated with one query; every valid
+        decision's approval and step transitions, its APPROVAL_APPROVED/
+        APPROVAL_REJECTED event and the affected run summaries then
+        commit together, and each affected run is woken once. Invalid
+        items are reported without failing the rest. On a version
+        conflict the whole batch is re-read and re-validated, so
+        approvals decided elsewhere meanwhile come back as not REQUIRED.
+
+        Returns dict with:
+        - results: list of {approval_id, run_id, success, message}, in input order
+        - run_ids: runs with at least one applied decision
+        """
+
+        def transition() -> dict:
+            ids = {item["approval_id"] for item in decisions}
+            rows = self.db.execute(
+                select(Approval, WorkflowStep)
+                .outerjoin(WorkflowStep, WorkflowStep.id == Approval.step_id)
+                .where(Approval.id.in_(ids))
+            ).all()
+            loaded = {approval.id: (approval, step) for approval, step in rows}
+
+            now = datetime.now(timezone.utc)
+            results, events, run_ids, seen, approver_ids = [], [], set(), set(), set()
+            changes = defaultdict(lambda: {"moves": [], "decided": []})
+            for item in decisions:
+                approval_id = item["approval_id"]
+                decision = (item.get("decision") or "").lower()
+                approval, step = loaded.get(approval_id, (None, None))
+                result = {
+                    "approval_id": approval_id,
+                    "run_id": approval.run_id if approval else None,
+                    "success": False,
+                }
+                results.append(result)
+
+                if approval_id in seen:
+                    result["message"] = "Duplicate decision for this approval"
+                    continue
+                seen.add(approval_id)
+
+                if decision not in ("approve", "reject"):
+                    result["message"] = "Decision must be 'approve' or 'reject'"
+                elif not approval:
+                    result["message"] = "Approval not found"
+                elif approval.status != ApprovalStatus.REQUIRED:
+                    result["message"] = "Approval is not in REQUIRED state"
+                elif not step:
+                    result["message"] = "Step not found"
+                else:
+                    approval.decided_by = decided_by
+                    approval.decided_at = now
+                    previous_state = step.state
+                    if decision == "approve":
+                        approval.status = ApprovalStatus.APPROVED
+                        step.state = StepState.READY
+                        event_type = EventType.APPROVAL_APPROVED
+                        message = f"Approval granted: {approval.reason}"
+                        result["message"] = f"Step '{step.name}' approved and ready to execute"
+                    else:
+                        reason = item.get("reason")
+                        if reason:
+                            approval.reason = reason
+                        approval.status = ApprovalStatus.REJECTED
+                        step.state = StepState.SKIPPED
+                        event_type = EventType.APPROVAL_REJECTED
+                        message = f"Approval rejected: {reason or 'No reason provided'}"
+                        result["message"] = f"Step '{step.name}' rejected and marked as skipped"
+
+                    result["success"] = True
+                    run_ids.add(approval.run_id)
+                    changes[approval.run_id]["moves"].append((previous_state, step.state))
+                    changes[approval.run_id]["decided"].append(approval.id)
+                    approver_ids.add(approval.approver_id)
+                    events.append(
+                        timeline_writer.build_row(
+                            approval.run_id, step.id, event_type, message,
+                            approval_id=approval.id,
+                        )
+                    )
+
+            if run_ids:
+                # Flushes the transitions; a conflict surfaces here, before any event is written
+                for run_id in sorted(run_ids):
+                    apply_transition(self.db, run_id, **changes[run_id])
+                timeline_writer.stage_rows(self.db, events)
+                self.db.commit()
+                pending_counts.invalidate(*approver_ids)
+                approval_timers.disarm(*(r["approval_id"] for r in results if r["success"]))
+                for run_id in sorted(run_ids):
+                    run_dispatcher.wake(run_id)
+
+            return {"results": results, "run_ids": sorted(run_ids)}
+
+        try:
+            return with_retries(self.db, transition)
+        except TransitionConflict:
+            return {
+                "results": [
+                    {
+                        "approval_id": item["approval_id"],
+                        "run_id": None,
+                        "success": False,
+                        "message": "Approval was changed concurrently, try again",
+                    }
+                    for item in decisions
+                ],
+                "run_ids": [],
+            }
+
+    def set_deadline(
+        self,
+        approval_id: int,
+        timeout_seconds: int,
+        action: Optional[str] = None,
+        escalate_to: Optional[int] = None,
+    ) -> dict:
+        """
+        Give a pending approval a deadline, replacing its current one.
+
+        `timeout_seconds` counts from now; 0 removes the deadline. The
+        action defaults to `APPROVAL_EXPIRY_ACTION`, and "escalate" needs
+        `escalate_to` (or `APPROVAL_ESCALATE_TO`). Raises ValueError for
+        an invalid action or target.
+
         Returns dict with:
         - success: bool
         - message: str
+        - expires_at: the new deadline, or None
         """
+        columns = deadline_columns(timeout_seconds, action, escalate_to)
+        if columns["expiry_action"] == "escalate" and columns["escalate_to"] is None:
+            raise ValueError("An 'escalate' action needs a user to escalate to")
+
+        def failed(message: str) -> dict:
+            return {"success": False, "message": message, "expires_at": None}
+
+        def transition() -> dict:
+            approval = self.db.get(Approval, approval_id, populate_existing=True)
+            if not approval:
+                return failed("Approval not found")
+            if approval.status != ApprovalStatus.REQUIRED:
+                return failed("Approval is not in REQUIRED state")
+
+            for name, value in columns.items():
+                setattr(approval, name, value)
+            self.db.commit()
+            approval_timers.arm(approval.id, approval.expires_at)
+
+            return {
+                "success": True,
+                "message": "Deadline updated",
+                "expires_at": approval.expires_at,
+            }
+
+        try:
+            return with_retries(self.db, transition)
+        except TransitionConflict:
+            return failed("Approval was changed concurrently, try again")
+
+    def _load_required(self, approval_id: int):
+        """Load a REQUIRED approval and its step; returns (approval, step, error)."""
         approval = self.db.query(Approval).filter(
             Approval.id == approval_id).first()
         if not approval:
-            return {"success": False, "message": "Approval not found"}
+            return None, None, "Approval not found"
 
         if approval.status != ApprovalStatus.REQUIRED:
-            return {"success": False, "message": "Approval is not in REQUIRED state"}
+            return approval, None, "Approval is not in REQUIRED state"
 
         step = self.db.query(WorkflowStep).filter(
             WorkflowStep.id == approval.step_id).first()
         if not step:
-            return {"success": False, "message": "Step not found"}
+            return approval, None, "Step not found"
 
-        # Update approval
-        approval.status = ApprovalStatus.REJECTED
-        approval.decided_by = decided_by
-        approval.decided_at = datetime.now(timezone.utc)
-        if reason:
-            approval.reason = reason
+        return approval, step, None
 
-        # Skip the step
-        step.state = StepState.SKIPPED
-
-        self.db.commit()
+    def _decide(self, transition) -> dict:
+        """
+        Apply a decision under optimistic concurrency.
 
-        return {"success": True, "message": f"Step '{step.name}' rejected and marked as skipped"}
+        The approval and step UPDATEs are version-checked; if another
+        decision or worker changed either row first, the transition is
+        re-run from a fresh read, where it sees the approval is no longer
+        REQUIRED instead of overwriting the other outcome.
+        """
+        try:
+            return with_retries(self.db, transition)
+        except TransitionConflict:
+            return {"success": False, "message": "Approval was changed concurrently, try again"}
 
     def close(self):
         """Close database session."""
@@ -0,0 +1,71 @@
+"""Approval inbox — an approver's pending approvals across runs, with a cached count."""
+
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from models.approvals import Approval, ApprovalStatus
+
+
+class PendingCountCache:
+    """
+    Per-approver count of REQUIRED approvals, cached in this process.
+
+    Entries are dropped as soon as this process creates or decides one of
+    the approver's approvals, and expire after `ttl` seconds so changes
+    made by other workers show up within that bound. Polling the count
+    therefore costs a dict lookup, plus one index-only COUNT per approver
+    per `ttl`.
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl if ttl is not None else settings.APPROVAL_COUNT_CACHE_SECONDS
+        self._counts: dict[int, tuple[int, float]] = {}  # approver -> (count, expires at)
+        self._lock = threading.Lock()
+        # Bumped on every invalidation, so a count read before one is not cached after it
+        self.generation = 0
+
+    def get(self, approver_id: int) -> Optional[int]:
+        entry = self._counts.get(approver_id)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0]
+
+    def put(self, approver_id: int, count: int, generation: int) -> None:
+        """Cache a count read when `generation` was current."""
+        with self._lock:
+            if generation == self.generation:
+                self._counts[approver_id] = (count, time.monotonic() + self.ttl)
+
+    def invalidate(self, *approver_ids: Optional[int]) -> None:
+        """Drop cached counts; call after committing a change to these approvers' approvals."""
+        with self._lock:
+            self.generation += 1
+            for approver_id in approver_ids:
+                self._counts.pop(approver_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+
+# Process-wide cache shared by the inbox endpoints and the write paths
+pending_counts = PendingCountCache()
+
+
+async def pending_count(db: AsyncSession, approver_id: int) -> int:
+    """The approver's number of REQUIRED approvals, from the cache when fresh."""
+    count = pending_counts.get(approver_id)
+    if count is None:
+        generation = pending_counts.generation
+        count = await db.scalar(
+            select(func.count())
+            .select_from(Approval)
+            .where(Approval.approver_id == approver_id, Approval.status == ApprovalStatus.REQUIRED)
+        )
+        pending_counts.put(approver_id, count, generation)
+    return count
@@ -0,0 +1,422 @@
+"""Approval timers — reject, escalate or cancel when an approval's deadline passes."""
+
+import heapq
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from config import settings
+from db import SchedulerSessionLocal
+from models.approvals import Approval, ApprovalStatus
+from models.timeline_event import EventType
+from models.workflows import WorkflowRun, WorkflowStep, RunState, StepState, TERMINAL_RUN_STATES
+from services.approval_inbox import pending_counts
+from services.concurrency import TransitionConflict, with_retries
+from services.run_summary import apply_transition
+from services.timeline import timeline_writer
+
+logger = logging.getLogger(__name__)
+
+EXPIRY_ACTIONS = ("reject", "escalate", "cancel_run")
+
+# Step states a canceled run will never move on from
+UNFINISHED_STEP_STATES = (StepState.PENDING, StepState.READY, StepState.BLOCKED)
+
+
+def _utcnow() -> datetime:
+    # expires_at is stored as a naive UTC timestamp
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def deadline_columns(
+    timeout_seconds: Optional[int] = None,
+    action: Optional[str] = None,
+    escalate_to: Optional[int] = None,
+) -> dict:
+    """
+    Deadline column values for an approval, defaulting to the APPROVAL_* settings.
+
+    All None when the timeout is 0, so the approval never expires. An
+    "escalate" action without a user to escalate to rejects on expiry.
+    Raises ValueError for an unknown action.
+    """
+    if timeout_seconds is None:
+        timeout_seconds = settings.APPROVAL_TIMEOUT_SECONDS
+    if timeout_seconds <= 0:
+        return {"expires_at": None, "expiry_action": None, "escalate_to": None}
+
+    action = action or settings.APPROVAL_EXPIRY_ACTION
+    if action not in EXPIRY_ACTIONS:
+        raise ValueError(f"Unknown expiry action {action!r}; expected one of {EXPIRY_ACTIONS}")
+
+    return {
+        "expires_at": _utcnow() + timedelta(seconds=timeout_seconds),
+        "expiry_action": action,
+        "escalate_to": (
+            (escalate_to or settings.APPROVAL_ESCALATE_TO) if action == "escalate" else None
+        ),
+    }
+
+
+def expire_approvals(db: Session, approval_ids: list[int]) -> dict:
+    """
+    Apply the expiry action of every due approval in `approval_ids`, in one transaction.
+
+    The approvals are re-read with their steps in one query and only
+    those still REQUIRED and past their deadline are touched, so ids of
+    approvals decided, rescheduled or expired by another process
+    meanwhile are skipped. Per action:
+
+    - "reject": the approval is REJECTED and its step SKIPPED, as if the
+      approver had rejected it; the run is woken to carry on.
+    - "escalate": the approval is reassigned to `escalate_to`, with a new
+      deadline of `APPROVAL_ESCALATION_TIMEOUT_SECONDS` that rejects.
+    - "cancel_run": the run is CANCELED, its other pending approvals
+      rejected and its unfinished steps skipped.
+
+    Timeline events, run summaries and state changes commit together;
+    the transition is version-checked and re-run from a fresh read on
+    conflict.
+
+    Returns dict with:
+    - rejected / escalated / canceled_runs: counts
+    - rearm: [(approval_id, expires_at)] for escalated approvals
+    """
+
+    def transition() -> dict:
+        now = _utcnow()
+        rows = db.execute(
+            select(Approval, WorkflowStep)
+            .outerjoin(WorkflowStep, WorkflowStep.id == Approval.step_id)
+            .where(
+                Approval.id.in_(approval_ids),
+                Approval.status == ApprovalStatus.REQUIRED,
+                Approval.expires_at <= now,
+            )
+        ).all()
+
+        result = {"rejected": 0, "escalated": 0, "canceled_runs": 0, "rearm": []}
+        events, run_ids, wake_ids, cancel_ids, approver_ids = [], set(), set(), set(), set()
+        changes = defaultdict(lambda: {"moves": [], "decided": []})
+        for approval, step in rows:
+            run_ids.add(approval.run_id)
+            approver_ids.add(approval.approver_id)
+            action = approval.expiry_action or "reject"
+
+            if action == "cancel_run":
+                cancel_ids.add(approval.run_id)
+            elif action == "escalate" and approval.escalate_to not in (None, approval.approver_id):
+                approval.approver_id = approval.escalate_to
+                approver_ids.add(approval.escalate_to)
+                approval.escalate_to = None
+                approval.expiry_action = "reject"
+                approval.expires_at = None
+                escalation_timeout = settings.APPROVAL_ESCALATION_TIMEOUT_SECONDS
+                if escalation_timeout > 0:
+                    approval.expires_at = now + timedelta(seconds=escalation_timeout)
+                    result["rearm"].append((approval.id, approval.expires_at))
+                events.append(
+                    timeline_writer.build_row(
+                        approval.run_id, approval.step_id, EventType.APPROVAL_REQUIRED,
+                        f"Approval escalated to user {approval.approver_id}: {approval.reason}",
+                        {
+                            "expired": True,
+                            "action": "escalate",
+                            "approver_id": approval.approver_id,
+                        },
+                        approval_id=approval.id,
+                    )
+                )
+                result["escalated"] += 1
+            else:
+                # Reject, also when there is no one (else) to escalate to
+                approval.status = ApprovalStatus.REJECTED
+                approval.decided_at = now
+                changes[approval.run_id]["decided"].append(approval.id)
+                if step:
+                    changes[approval.run_id]["moves"].append((step.state, StepState.SKIPPED))
+                    step.state = StepState.SKIPPED
+                wake_ids.add(approval.run_id)
+                events.append(
+                    timeline_writer.build_row(
+                        approval.run_id, approval.step_id, EventType.APPROVAL_REJECTED,
+                        f"Approval expired: {approval.reason}",
+                        {"expired": True, "action": "reject"},
+                        approval_id=approval.id,
+                    )
+                )
+                result["rejected"] += 1
+
+        if cancel_ids:
+            result["canceled_runs"] = _cancel_runs(
+                db, cancel_ids, now, events, approver_ids, changes
+            )
+            wake_ids -= cancel_ids
+
+        if run_ids:
+            # Flushes the transitions; a conflict surfaces here, before any event is written
+            for run_id in sorted(run_ids):
+                apply_transition(db, run_id, **changes[run_id])
+            timeline_writer.stage_rows(db, events)
+            db.commit()
+            pending_counts.invalidate(*approver_ids)
+
+            # Imported here: the dispatcher imports the scheduler, which arms timers
+            from services.dispatcher import run_dispatcher
+
+            for run_id in sorted(wake_ids):
+                run_dispatcher.wake(run_id)
+
+        return result
+
+    return with_retries(db, transition)
+
+
+def _cancel_runs(
+    db: Session,
+    run_ids: set[int],
+    now: datetime,
+    events: list,
+    approver_ids: set,
+    changes: dict,
+) -> int:
+    """
+    Cancel runs whose approval expired; returns how many were canceled.
+
+    What changed is added to `changes`, the `apply_transition` arguments
+    of each run.
+    """
+    runs = db.scalars(
+        select(WorkflowRun).where(
+            WorkflowRun.id.in_(run_ids), WorkflowRun.state.not_in(TERMINAL_RUN_STATES)
+        )
+    ).all()
+    canceled = {run.id for run in runs}
+
+    # Withdrawn on runs that already finished too, so they do not expire again
+    pending = db.scalars(
+        select(Approval).where(
+            Approval.run_id.in_(run_ids), Approval.status == ApprovalStatus.REQUIRED
+        )
+    ).all()
+    for approval in pending:
+        approval.status = ApprovalStatus.REJECTED
+        approval.decided_at = now
+        approver_ids.add(approval.approver_id)
+        changes[approval.run_id]["decided"].append(approval.id)
+        events.append(
+            timeline_writer.build_row(
+                approval.run_id, approval.step_id, EventType.APPROVAL_REJECTED,
+                f"Approval withdrawn, run canceled: {approval.reason}",
+                {"expired": True, "action": "cancel_run"},
+                approval_id=approval.id,
+            )
+        )
+
+    if not canceled:
+        return 0
+
+    steps = db.scalars(
+        select(WorkflowStep).where(
+            WorkflowStep.run_id.in_(canceled), WorkflowStep.state.in_(UNFINISHED_STEP_STATES)
+        )
+    ).all()
+    for step in steps:
+        changes[step.run_id]["moves"].append((step.state, StepState.SKIPPED))
+        step.state = StepState.SKIPPED
+
+    for run in runs:
+        run.state = RunState.CANCELED
+        changes[run.id]["state"] = RunState.CANCELED
+        events.append(
+            timeline_writer.build_row(
+                run.id, None, EventType.WORKFLOW_COMPLETED,
+                f"Workflow {RunState.CANCELED.value}: approval expired",
+                {"expired": True, "action": "cancel_run"},
+            )
+        )
+
+    return len(canceled)
+
+
+class ApprovalTimers:
+    """
+    One timer thread for every approval deadline in this process.
+
+    Deadlines are kept in a min-heap. The thread sleeps until the
+    earliest one is due, or until an earlier one is armed, then pops
+    everything due and releases it with `expire_approvals`,
+    `APPROVAL_EXPIRY_BATCH` approvals per transaction. Nothing scans
+    the approvals table on a schedule: deadlines armed in this process
+    are pushed as they are committed, and every
+    `APPROVAL_TIMER_RESYNC_SECONDS` the thread loads the pending
+    deadlines due before the next resync, set by other processes or
+    missed while nothing was running, from the partial
+    `ix_approvals_expiry` index.
+
+    Decided approvals are disarmed (`disarm`) and re-armed ones get a
+    new entry, but neither is removed from the heap: stale entries are
+    skipped when popped. The release re-checks every row anyway, so
+    approvals decided in another process, or armed by several, expire
+    at most once.
+    """
+
+    def __init__(self, batch: Optional[int] = None, resync_seconds: Optional[int] = None):
+        self.batch = batch or settings.APPROVAL_EXPIRY_BATCH
+        self.resync_seconds = resync_seconds or settings.APPROVAL_TIMER_RESYNC_SECONDS
+        self._heap: list[tuple[datetime, int]] = []
+        self._deadlines: dict[int, datetime] = {}  # approval id -> armed deadline
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.released = {"rejected": 0, "escalated": 0, "canceled_runs": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        """Start the timer thread; it loads pending deadlines first."""
+        if self._thread:
+            return
+
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="approval-timers", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the timer thread after the release in progress; armed timers are dropped."""
+        thread, self._thread = self._thread, None
+        if not thread:
+            return
+
+        with self._cond:
+            self._stopping = True
+            self._heap.clear()
+            self._deadlines.clear()
+            self._cond.notify()
+        thread.join()
+
+    def arm(self, approval_id: int, expires_at: Optional[datetime]) -> None:
+        """
+        Arm, re-arm or (with None) disarm an approval's timer.
+
+        Call after committing its deadline. Ignored while the timers are
+        not running: the next start or resync loads it.
+        """
+        if not self._thread:
+            return
+
+        with self._cond:
+            if expires_at is None:
+                self._deadlines.pop(approval_id, None)
+                return
+            if self._deadlines.get(approval_id) == expires_at:
+                return
+
+            self._deadlines[approval_id] = expires_at
+            heapq.heappush(self._heap, (expires_at, approval_id))
+            if self._heap[0] == (expires_at, approval_id):
+                # New earliest deadline: shorten the current sleep
+                self._cond.notify()
+
+    def disarm(self, *approval_ids: int) -> None:
+        """Drop the timers of approvals that were decided; call after the commit."""
+        if not self._thread:
+            return
+
+        with self._cond:
+            for approval_id in approval_ids:
+                self._deadlines.pop(approval_id, None)
+
+    def load(self, horizon: datetime) -> int:
+        """Arm the timers of pending approvals due before `horizon`."""
+        db = SchedulerSessionLocal()
+        try:
+            rows = db.execute(
+                select(Approval.id, Approval.expires_at).where(
+                    Approval.status == ApprovalStatus.REQUIRED,
+                    Approval.expires_at.is_not(None),
+                    Approval.expires_at <= horizon,
+                )
+            ).all()
+        except Exception:
+            logger.exception("Loading approval deadlines failed")
+            return 0
+        finally:
+            db.close()
+
+        for approval_id, expires_at in rows:
+            self.arm(approval_id, expires_at)
+        return len(rows)
+
+    def release(self, approval_ids: list[int]) -> None:
+        """Expire a batch of due approvals and arm the timers of escalated ones."""
+        db = SchedulerSessionLocal()
+        try:
+            result = expire_approvals(db, approval_ids)
+        except TransitionConflict:
+            # Still pending and overdue, so the next resync picks them up again
+            logger.warning("Expiring %d approvals kept conflicting", len(approval_ids))
+            return
+        except Exception:
+            logger.exception("Expiring %d approvals failed", len(approval_ids))
+            return
+        finally:
+            db.close()
+
+        for approval_id, expires_at in result.pop("rearm"):
+            self.arm(approval_id, expires_at)
+        for name, count in result.items():
+            self.released[name] += count
+        if any(result.values()):
+            logger.info("Expired approvals: %s", result)
+
+    def _due(self, resync_at: float) -> Optional[list[int]]:
+        """Wait for due timers; [] when it is time to resync, None when stopping."""
+        with self._cond:
+            while not self._stopping:
+                now = _utcnow()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    expires_at, approval_id = heapq.heappop(self._heap)
+                    if self._deadlines.get(approval_id) == expires_at:
+                        del self._deadlines[approval_id]
+                        due.append(approval_id)
+                if due:
+                    return due
+
+                timeout = resync_at - time.monotonic()
+                if self._heap:
+                    timeout = min(timeout, (self._heap[0][0] - now).total_seconds())
+                if timeout <= 0:
+                    return []
+                self._cond.wait(timeout)
+            return None
+
+    def _run(self) -> None:
+        resync_at = 0.0
+        while True:
+            if time.monotonic() >= resync_at:
+                self.load(_utcnow() + timedelta(seconds=self.resync_seconds))
+                resync_at = time.monotonic() + self.resync_seconds
+
+            due = self._due(resync_at)
+            if due is None:
+                return
+            for i in range(0, len(due), self.batch):
+                self.release(due[i:i + self.batch])
+
+    def stats(self) -> dict:
+        """Armed timers and what expired in this process."""
+        return {"armed": len(self._deadlines), **self.released}
+
+
+# Process-wide timers shared by the scheduler and the approval endpoints
+approval_timers = ApprovalTimers()
@@ -0,0 +1,55 @@
+"""Optimistic concurrency — retrying transitions that lose a version race."""
+
+import logging
+import random
+import time
+from typing import Callable, Optional, TypeVar
+
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+
+from config import settings
+from services.metrics import TRANSITION_CONFLICTS, TRANSITION_RETRIES
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class TransitionConflict(Exception):
+    """A transition kept losing to concurrent writers and was given up."""
+
+
+def with_retries(
+    db: Session,
+    transition: Callable[[], T],
+    attempts: Optional[int] = None,
+) -> T:
+    """
+    Run a read-validate-write transition, retrying on version conflicts.
+
+    `WorkflowRun`, `WorkflowStep` and `Approval` carry a version column,
+    so every ORM UPDATE of them is `... WHERE id = ? AND version = ?`
+    and raises StaleDataError when another writer got there first. The
+    transaction is then rolled back and `transition` runs again from a
+    fresh read: it must re-load its rows and re-check its preconditions
+    (e.g. "approval is still REQUIRED") before writing, so a retry never
+    overwrites the other writer's outcome. Raises TransitionConflict
+    after `attempts` tries.
+    """
+    attempts = attempts or settings.TRANSITION_MAX_ATTEMPTS
+
+    for attempt in range(1, attempts + 1):
+        try:
+            return transition()
+        except StaleDataError:
+            db.rollback()
+            if attempt == attempts:
+                TRANSITION_CONFLICTS.inc()
+                raise TransitionConflict(f"Gave up after {attempts} conflicting attempts")
+            logger.debug("Version conflict, retrying (attempt %d of %d)", attempt, attempts)
+            TRANSITION_RETRIES.inc()
+            # Jittered backoff so colliding workers do not retry in lockstep
+            time.sleep(random.uniform(0, settings.TRANSITION_RETRY_BACKOFF_MS / 1000 * attempt))
+
+    raise AssertionError("unreachable")
@@ -0,0 +1,217 @@
+"""Run dispatcher — drives runs on a fixed worker pool; parked runs hold nothing."""
+
+import logging
+import queue
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import exists, or_, select
+
+from config import settings
+from db import SchedulerSessionLocal
+from models.approvals import Approval, ApprovalStatus
+from models.workflows import WorkflowRun, WorkflowStep, RunState, StepState, TERMINAL_RUN_STATES
+from services.executor import Executor
+from services.scheduler import Scheduler
+from services.tracing import Span, tracer
+
+logger = logging.getLogger(__name__)
+
+
+def drive_run(run_id: int, max_rounds: Optional[int] = None) -> Optional[RunState]:
+    """
+    Schedule and execute a run until it can make no more progress.
+
+    Each round moves PENDING steps to READY or BLOCKED and executes every
+    READY step, approved ones included, claiming each first so another
+    driver of the same run cannot execute it twice. Returns the run's
+    state when it finishes, parks in WAITING_APPROVAL or stalls, without
+    sleeping between rounds. The session is closed on return, so a
+    parked run holds no connection.
+    """
+    max_rounds = max_rounds or settings.DISPATCHER_MAX_ROUNDS
+    db = SchedulerSessionLocal()
+    scheduler, executor = Scheduler(db), Executor(db)
+
+    try:
+        for _ in range(max_rounds):
+            run = db.get(WorkflowRun, run_id)
+            if not run or run.state in TERMINAL_RUN_STATES:
+                break
+
+            result = scheduler.schedule_round(run_id)
+            ready_ids = list(
+                db.scalars(
+                    select(WorkflowStep.id).where(
+                        WorkflowStep.run_id == run_id, WorkflowStep.state == StepState.READY
+                    )
+                )
+            )
+            for step_id in ready_ids:
+                executor.execute_step(step_id, claim=True)
+
+            if ready_ids:
+                scheduler.update_run_state(run_id)
+            elif not result["blocked_steps"]:
+                # Nothing ran or blocked: finished, parked on approvals, or stalled
+                break
+        else:
+            logger.warning(
+                "Run %s still progressing after %d rounds; re-queued", run_id, max_rounds
+            )
+            run_dispatcher.wake(run_id)
+
+        run = db.get(WorkflowRun, run_id)
+        return run.state if run else None
+    finally:
+        db.close()
+
+
+class RunDispatcher:
+    """
+    Runs on a fixed pool of worker threads, woken by events.
+
+    `wake(run_id)` queues a run; a worker drives it with `drive_run`
+    until it finishes or parks waiting for approval, then moves on. A
+    parked run is just its persisted WAITING_APPROVAL state: no thread,
+    session or timer is held for it, however many are waiting. Deciding
+    an approval wakes its run again. A run is queued at most once and
+    driven by one worker at a time; a wake that arrives while it is
+    being driven queues it again afterwards, so no decision is missed.
+
+    On start, runs left mid-flight by a previous process, and parked runs
+    whose approvals were all decided while nothing was running, are
+    queued again.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or settings.DISPATCHER_WORKERS
+        self._queue: "queue.Queue[Optional[int]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._queued: set[int] = set()
+        self._active: set[int] = set()
+        self._rewake: set[int] = set()
+        # run id -> (waker's span, wake time), carried to the worker's drive span
+        self._parents: dict[int, tuple[Span, float]] = {}
+        self._threads: list[threading.Thread] = []
+        self.drives = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._threads)
+
+    def start(self, recover: bool = True) -> None:
+        """Start the worker threads and, optionally, re-queue unfinished runs."""
+        if self._threads:
+            return
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"run-dispatcher-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        if recover:
+            threading.Thread(
+                target=self.recover, name="run-dispatcher-recover", daemon=True
+            ).start()
+
+    def stop(self) -> None:
+        """Stop the workers after the runs they are driving; queued runs are dropped."""
+        threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join()
+
+    def wake(self, run_id: int) -> None:
+        """
+        Queue a run to be driven; call after committing what unblocks it.
+
+        Ignored while the dispatcher is not running: the recovery scan
+        picks the run up on the next start. The caller's span (e.g. the
+        submit or decision request) becomes the parent of the drive it
+        leads to; the first waker wins while the run is queued.
+        """
+        if not self._threads:
+            return
+
+        parent = tracer.current()
+        with self._lock:
+            if parent is not None:
+                self._parents.setdefault(run_id, (parent, time.perf_counter()))
+            if run_id in self._active:
+                self._rewake.add(run_id)
+                return
+            if run_id in self._queued:
+                return
+            self._queued.add(run_id)
+        self._queue.put(run_id)
+
+    def recover(self) -> int:
+        """Queue every unfinished run that is not parked on a pending approval."""
+        pending_approval = exists().where(
+            Approval.run_id == WorkflowRun.id, Approval.status == ApprovalStatus.REQUIRED
+        )
+        db = SchedulerSessionLocal()
+        try:
+            run_ids = list(
+                db.scalars(
+                    select(WorkflowRun.id).where(
+                        WorkflowRun.state.not_in(TERMINAL_RUN_STATES),
+                        or_(WorkflowRun.state != RunState.WAITING_APPROVAL, ~pending_approval),
+                    )
+                )
+            )
+        except Exception:
+            logger.exception("Run recovery scan failed")
+            return 0
+        finally:
+            db.close()
+
+        for run_id in run_ids:
+            self.wake(run_id)
+        if run_ids:
+            logger.info("Re-queued %d unfinished runs", len(run_ids))
+        return len(run_ids)
+
+    def _run(self) -> None:
+        while True:
+            run_id = self._queue.get()
+            if run_id is None:
+                return
+
+            with self._lock:
+                self._queued.discard(run_id)
+                self._active.add(run_id)
+                parent, woken = self._parents.pop(run_id, (None, None))
+
+            try:
+                with tracer.span("dispatcher.drive_run", run_id=run_id, parent=parent):
+                    if woken is not None:
+                        tracer.annotate(queued_ms=round((time.perf_counter() - woken) * 1000, 2))
+                    state = drive_run(run_id)
+                    tracer.annotate(state=state.value if state else None)
+            except Exception:
+                logger.exception("Driving run %s failed", run_id)
+            finally:
+                with self._lock:
+                    self._active.discard(run_id)
+                    rewake = run_id in self._rewake
+                    self._rewake.discard(run_id)
+                    self.drives += 1
+                if rewake:
+                    self.wake(run_id)
+
+    def stats(self) -> dict:
+        """Queue depth and worker activity for this process."""
+        return {
+            "workers": len(self._threads),
+            "queued": self._queue.qsize(),
+            "active": len(self._active),
+            "drives": self.drives,
+        }
+
+
+# Process-wide dispatcher shared by the submit and approval paths
+run_dispatcher = RunDispatcher()
@@ -1,11 +1,20 @@
 """Executor — step execution and tool invocation."""
 
 import json
+import time
 from typing import Optional, Any
 
+from sqlalchemy import update
+
 from db import SessionLocal
 from models.workflows import WorkflowStep, StepState
+from models.timeline_event import EventType
 from models.tool_calls import ToolCall, ToolCallStatus
+from services.concurrency import TransitionConflict, with_retries
+from services.metrics import STEP_DURATION, STEP_RETRIES
+from services.run_summary import apply_transition
+from services.timeline import timeline_writer
+from services.tracing import tracer
 from services.tools import (
     execute_job_search,
     execute_cv_tailor,
@@ -14,13 +23,38 @@ from services.tools import (
     execute_grocery_plan,
 )
 
+# execute_step error when another worker moved the step on first
+CONFLICT = "Step was changed concurrently"
+
 
 class Executor:
-    """Executes workflow steps and tool calls."""
+    """
+    Executes workflow steps and tool calls.
+
+    A step completes in one transaction: the tool call, the step
+    transition, the run summary and the timeline event commit together.
+    With `claim=True` the step is first moved from READY to RUNNING by a
+    conditional UPDATE, so concurrent workers never run it twice; that
+    costs a second commit. Without a claim the RUNNING state is never
+    written and a step costs a single commit.
+
+    Completion is version-checked (optimistic concurrency): if another
+    worker moved the step on since it was read, the outcome is not
+    written over theirs and execute_step reports a conflict.
+    """
 
     def __init__(self, db=None):
         self.db = db or SessionLocal()
 
+    @staticmethod
+    def _execute_generic(step: WorkflowStep, args: dict) -> dict:
+        """Generic/fallback tool executor."""
+        return {
+            "status": "completed",
+            "message": f"Executed: {step.name}",
+            "step_id": step.id,
+        }
+
     # Tool registry mapping tool name to executor function
     TOOL_EXECUTORS = {
         "job_search": execute_job_search,
@@ -28,10 +62,43 @@ class Executor:
         "job_submit": execute_job_submit,
         "calendar_create": execute_calendar_create,
         "grocery_plan": execute_grocery_plan,
-        "generic": self._execute_generic,
+        "generic": _execute_generic,
     }
 
-    def execute_step(self, step_id: int, args: Optional[dict] = None) -> dict:
+    def claim_step(self, step: WorkflowStep) -> bool:
+        """
+        Atomically move a READY step to RUNNING and commit.
+
+        Returns False, without changing anything, if the step is no
+        longer READY (e.g. another worker claimed it first).
+        """
+        run_id, step_id, name = step.run_id, step.id, step.name
+        claimed = self.db.execute(
+            update(WorkflowStep)
+            .where(WorkflowStep.id == step_id, WorkflowStep.state == StepState.READY)
+            .values(
+                state=StepState.RUNNING,
+                attempt=WorkflowStep.attempt + 1,
+                version=WorkflowStep.version + 1,
+            ),
+            execution_options={"synchronize_session": False},
+        ).rowcount == 1
+
+        if claimed:
+            timeline_writer.stage(
+                self.db, run_id, step_id, EventType.STEP_RUNNING, f"Step running: {name}"
+            )
+            apply_transition(self.db, run_id, [(StepState.READY, StepState.RUNNING)])
+        self.db.commit()
+        return claimed
+
+    @tracer.traced("executor.execute_step")
+    def execute_step(
+        self,
+        step_id: int,
+        args: Optional[dict] = None,
+        claim: bool = False,
+    ) -> dict:
         """
         Execute a single workflow step.
 
@@ -39,75 +106,121 @@ class Executor:
         - success: bool
         - result: Any
         - error: Optional[str]
+
+        Traced with the tool call as a `connector.<tool>` child span.
         """
+        start = time.perf_counter()
         step = self.db.query(WorkflowStep).filter(
             WorkflowStep.id == step_id).first()
         if not step:
             return {"success": False, "result": None, "error": "Step not found"}
+        tracer.annotate(run_id=step.run_id, step_id=step_id, tool=step.tool or "generic")
 
-        try:
-            # Mark as running
-            step.state = StepState.RUNNING
-            step.attempt = step.attempt + 1
-            self.db.commit()
-
-            # Get tool executor
-            executor_func = self.TOOL_EXECUTORS.get(
-                step.tool, self._execute_generic)
-
-            # Execute tool
-            result = executor_func(step, args or {})
-
-            # Create tool call record
-            tool_call = ToolCall(
-                run_id=step.run_id,
-                step_id=step.id,
-                connector=step.tool,
-                action=step.name,
-                args_json=args or {},
-                result_json=result,
-                status=ToolCallStatus.SUCCESS,
-            )
-            self.db.add(tool_call)
+        if claim and not self.claim_step(step):
+            return {"success": False, "result": None, "error": "Step is not ready"}
 
-            # Mark step as succeeded
-            step.state = StepState.SUCCEEDED
-            step.result_ref = json.dumps(result)
-            self.db.commit()
+        # The state completion expects to find, checked on every attempt
+        expected_state = StepState.RUNNING if claim else step.state
 
-            return {"success": True, "result": result, "error": None}
+        # Get tool executor
+        executor_func = self.TOOL_EXECUTORS.get(step.tool, self._execute_generic)
+        tool = step.tool or "generic"
 
+        try:
+            with tracer.span(f"connector.{tool}"):
+                result = executor_func(step, args or {})
         except Exception as e:
-            # Log tool call failure
-            tool_call = ToolCall(
-                run_id=step.run_id,
-                step_id=step.id,
-                connector=step.tool,
-                action=step.name,
-                args_json=args or {},
-                result_json={"error": str(e)},
-                status=ToolCallStatus.FAILED,
+            if not self._complete(step, args, claim, expected_state, error=e):
+                self._finished(tool, "conflict", start)
+                return {"success": False, "result": None, "error": CONFLICT}
+            self._finished(tool, "failed", start)
+            if step.state == StepState.PENDING:
+                STEP_RETRIES.labels(tool).inc()
+            return {"success": False, "result": None, "error": str(e)}
+
+        if not self._complete(step, args, claim, expected_state, result=result):
+            self._finished(tool, "conflict", start)
+            return {"success": False, "result": None, "error": CONFLICT}
+        self._finished(tool, "succeeded", start)
+        return {"success": True, "result": result, "error": None}
+
+    @staticmethod
+    def _finished(tool: str, outcome: str, start: float) -> None:
+        """Export a step's duration by outcome and tag its span with the outcome."""
+        STEP_DURATION.labels(tool, outcome).observe(time.perf_counter() - start)
+        tracer.annotate(outcome=outcome)
+
+    def _complete(
+        self,
+        step: WorkflowStep,
+        args: Optional[dict],
+        claimed: bool,
+        expected_state: StepState,
+        result: Any = None,
+        error: Optional[Exception] = None,
+    ) -> bool:
+        """
+        Record the tool call, the step transition and its event in one commit.
+
+        Returns False, writing nothing, if the step has left
+        `expected_state` (e.g. another worker completed it first).
+        """
+
+        def transition() -> bool:
+            # Reloaded after a conflict: the retry sees the winner's state
+            if step.state != expected_state:
+                return False
+
+            if not claimed:
+                step.attempt = step.attempt + 1
+
+            self.db.add(
+                ToolCall(
+                    run_id=step.run_id,
+                    step_id=step.id,
+                    connector=step.tool,
+                    action=step.name,
+                    args_json=args or {},
+                    result_json=result if error is None else {"error": str(error)},
+                    status=ToolCallStatus.SUCCESS if error is None else ToolCallStatus.FAILED,
+                )
             )
-            self.db.add(tool_call)
 
-            # Check retry count
-            if step.attempt >= 3:
-                step.state = StepState.FAILED
-                step.error_message = f"Max retries exceeded: {str(e)}"
+            if error is None:
+                step.state = StepState.SUCCEEDED
+                step.result_ref = json.dumps(result)
+                timeline_writer.stage(
+                    self.db,
+                    step.run_id,
+                    step.id,
+                    EventType.STEP_SUCCEEDED,
+                    f"Step succeeded: {step.name}",
+                    {"result": result},
+                )
             else:
-                step.state = StepState.PENDING  # Reset to pending for retry
-
+                # Check retry count
+                if step.attempt >= 3:
+                    step.state = StepState.FAILED
+                    step.error_message = f"Max retries exceeded: {str(error)}"
+                else:
+                    step.state = StepState.PENDING  # Reset to pending for retry
+
+                timeline_writer.stage(
+                    self.db,
+                    step.run_id,
+                    step.id,
+                    EventType.STEP_FAILED,
+                    f"Step failed: {step.name} - {error}",
+                )
+
+            apply_transition(self.db, step.run_id, [(expected_state, step.state)])
             self.db.commit()
+            return True
 
-            return {"success": False, "result": None, "error": str(e)}
-
-    def _execute_generic(self, step: WorkflowStep, args: dict) -> dict:
-        """Generic/fallback tool executor."""
-        return {
-            "status": "completed",
-            "message": f"Executed: {step.name}",
-            "step_id": step.id,
-        }
+        try:
+            return with_retries(self.db, transition)
+        except TransitionConflict:
+            return False
 
     def close(self):
         """Close database session."""
@@ -0,0 +1,141 @@
+"""Wire frames for timeline events — serialized once at write time."""
+
+import json
+import zlib
+from typing import Optional
+
+import msgpack
+
+
+def encode_payload(
+    event_type: str,
+    message: str,
+    timestamp: str,
+    metadata: Optional[dict] = None,
+) -> bytes:
+    """
+    Serialize an event body to compact JSON bytes.
+
+    This is the only JSON encoding an event goes through. The event id is
+    not known until the row is inserted, so it is spliced in by
+    `sse_frame` / `json_line` with plain byte concatenation.
+    """
+    return json.dumps(
+        {
+            "event": event_type,
+            "message": message,
+            "timestamp": timestamp,
+            "metadata": metadata or {},
+        },
+        separators=(",", ":"),
+    ).encode()
+
+
+def json_line(event_id: int, payload: bytes, run_id: Optional[int] = None) -> bytes:
+    """Event as a JSON object with its id (and run id), without a trailing newline."""
+    # payload always starts with "{" followed by at least one key
+    if run_id is None:
+        return b'{"id":%d,%s' % (event_id, payload[1:])
+    return b'{"id":%d,"run_id":%d,%s' % (event_id, run_id, payload[1:])
+
+
+def sse_frame(event_id: int, payload: bytes, run_id: Optional[int] = None) -> bytes:
+    """Event as a ready-to-send Server-Sent Events frame."""
+    return sse_event(event_id, json_line(event_id, payload, run_id))
+
+
+def sse_event(event_id: int, line: bytes) -> bytes:
+    """Wrap an already-built JSON line as an SSE frame."""
+    return b"id: %d\ndata: %s\n\n" % (event_id, line)
+
+
+def sse_message(data: dict) -> bytes:
+    """Control message (not a timeline event) as an SSE frame."""
+    return b"data: %s\n\n" % json.dumps(data, separators=(",", ":")).encode()
+
+
+# ── Binary (msgpack) frames ─────────────────────────
+
+# First byte of every binary WebSocket message
+FRAME_RAW = 0x00
+FRAME_ZLIB = 0x01
+
+
+def msgpack_event(event_id: int, payload: bytes, run_id: Optional[int] = None) -> bytes:
+    """Event as a msgpack map with the same keys as its JSON form."""
+    return msgpack_line(json_line(event_id, payload, run_id))
+
+
+def msgpack_line(line: bytes) -> bytes:
+    """Re-encode an event's JSON line (e.g. from an archive) as msgpack."""
+    return msgpack.packb(json.loads(line))
+
+
+def msgpack_array(items: list[bytes]) -> bytes:
+    """Join already-encoded msgpack values into one msgpack array."""
+    count = len(items)
+    if count < 16:
+        header = bytes([0x90 | count])
+    elif count < 1 << 16:
+        header = b"\xdc" + count.to_bytes(2, "big")
+    else:
+        header = b"\xdd" + count.to_bytes(4, "big")
+    return header + b"".join(items)
+
+
+class SSECodec:
+    """Encodes hub output as Server-Sent Events text frames."""
+
+    transport = "sse"
+
+    def event(self, event) -> bytes:
+        return event.sse
+
+    def line(self, event_id: int, line: bytes) -> bytes:
+        return sse_event(event_id, line)
+
+    def message(self, data: dict) -> bytes:
+        return sse_message(data)
+
+    def heartbeat(self) -> bytes:
+        # Comment frame: keeps proxies and idle connections from timing out
+        return b": keepalive\n\n"
+
+    def batch(self, frames: list[bytes]) -> bytes:
+        return b"".join(frames)
+
+
+class MsgpackCodec(SSECodec):
+    """
+    Encodes hub output as binary WebSocket messages.
+
+    Each message is one flag byte (`FRAME_RAW` or `FRAME_ZLIB`) followed
+    by a msgpack array of maps: events carry an `id`, control messages
+    only an `event`. With `compress`, messages of at least `min_compress`
+    bytes are zlib-deflated; smaller ones are sent raw, since deflate
+    barely shrinks them.
+    """
+
+    transport = "websocket"
+
+    def __init__(self, compress: bool = False, min_compress: int = 256):
+        self.compress = compress
+        self.min_compress = min_compress
+
+    def event(self, event) -> bytes:
+        return event.msgpack
+
+    def line(self, event_id: int, line: bytes) -> bytes:
+        return msgpack_line(line)
+
+    def message(self, data: dict) -> bytes:
+        return msgpack.packb(data)
+
+    def heartbeat(self) -> bytes:
+        return self.message({"event": "heartbeat"})
+
+    def batch(self, frames: list[bytes]) -> bytes:
+        body = msgpack_array(frames)
+        if self.compress and len(body) >= self.min_compress:
+            return bytes([FRAME_ZLIB]) + zlib.compress(body)
+        return bytes([FRAME_RAW]) + body
@@ -0,0 +1,115 @@
+"""HTTP caching — ETags, conditional GETs and an in-process response cache."""
+
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from fastapi.responses import Response
+
+from config import settings
+
+
+def make_etag(*parts) -> str:
+    """
+    A weak ETag from the values that change whenever the response does.
+
+    Weak because equal tags promise the same content, not the same
+    bytes: a page may be re-assembled from archived events.
+    """
+    return 'W/"%s"' % "-".join(str(part) for part in parts)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if an If-None-Match header lists `etag` (weak comparison) or is `*`."""
+    if not if_none_match:
+        return False
+
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    if "*" in tags:
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.removeprefix("W/") == opaque for tag in tags)
+
+
+def cache_control(finished: bool) -> str:
+    """
+    Cache-Control for a run's reads.
+
+    Responses are per client (`private`). A live run's must be
+    revalidated on every poll, which is a 304 while nothing changed; a
+    finished run's cannot change, so clients may reuse them for
+    `HTTP_CACHE_FINISHED_MAX_AGE` seconds without asking.
+    """
+    if finished and settings.HTTP_CACHE_FINISHED_MAX_AGE > 0:
+        return f"private, max-age={settings.HTTP_CACHE_FINISHED_MAX_AGE}"
+    return "private, no-cache"
+
+
+def not_modified(etag: str, cache_control_value: str) -> Response:
+    """An empty 304 carrying the validators the client should keep."""
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control_value})
+
+
+class ResponseCache:
+    """
+    Response bodies of this process, keyed by (endpoint, run, etag, ...).
+
+    The ETag is part of the key, so an entry is never stale: a changed
+    run gets a new tag and misses, and its old entries age out. Bodies
+    are evicted least recently used once they total more than
+    `max_bytes`; 0 disables the cache. Serves clients that poll without
+    If-None-Match, or that share a run with others, without reloading
+    or re-encoding rows.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes if max_bytes is not None else settings.RESPONSE_CACHE_MAX_BYTES
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        if self.max_bytes <= 0:
+            return None
+
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key: Hashable, body: bytes) -> None:
+        if self.max_bytes <= 0 or len(body) > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Process-wide cache shared by the timeline and approval read endpoints
+response_cache = ResponseCache()
@@ -0,0 +1,121 @@
+"""Prometheus metrics — request, scheduler, executor and stream instrumentation."""
+
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Request latencies run from sub-millisecond polls to multi-second writes
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    "lifeos_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS = Counter(
+    "lifeos_http_requests",
+    "HTTP requests by route template and status",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "lifeos_http_requests_in_flight",
+    "HTTP requests being handled, streaming responses included",
+    ["method"],
+)
+
+SCHEDULER_ROUND = Histogram(
+    "lifeos_scheduler_round_duration_seconds",
+    "Duration of one Scheduler.schedule_round",
+    buckets=LATENCY_BUCKETS,
+)
+SCHEDULER_ROUND_STATEMENTS = Histogram(
+    "lifeos_scheduler_round_statements",
+    "SQL statements executed by one Scheduler.schedule_round",
+    buckets=(5, 10, 20, 50, 100, 200, 500),
+)
+STEP_DURATION = Histogram(
+    "lifeos_step_execution_duration_seconds",
+    "Executor.execute_step duration, claim and completion included, by tool and outcome",
+    ["tool", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+STEP_RETRIES = Counter(
+    "lifeos_step_retries",
+    "Failed steps reset to PENDING for another attempt",
+    ["tool"],
+)
+TIMELINE_EVENTS_DROPPED = Counter(
+    "lifeos_timeline_events_dropped",
+    "Buffered timeline events never written: rejected by the database or over the buffer cap",
+    ["reason"],
+)
+TRANSITION_RETRIES = Counter(
+    "lifeos_transition_retries",
+    "Version-checked transitions re-run after losing a race",
+)
+TRANSITION_CONFLICTS = Counter(
+    "lifeos_transition_conflicts",
+    "Version-checked transitions given up after TRANSITION_MAX_ATTEMPTS",
+)
+
+STREAMS_OPEN = Gauge(
+    "lifeos_streams_open",
+    "Open timeline streams by transport",
+    ["transport"],
+)
+
+
+class MetricsMiddleware:
+    """
+    Times every HTTP request and counts it by route template and status.
+
+    Labelled by the matched route's path (`/api/workflows/{workflow_id}/timeline`),
+    never the raw URL, so the series stay bounded; unmatched requests are
+    `unmatched`. A plain ASGI middleware; the labelled series are looked
+    up once and kept, so a request costs a timer, a gauge step, a
+    histogram observation and a counter increment.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._in_flight: dict = {}
+        self._series: dict = {}
+
+    def _observe(self, method: str, path: str, status: int, seconds: float) -> None:
+        series = self._series.get((method, path, status))
+        if series is None:
+            series = self._series[(method, path, status)] = (
+                REQUEST_LATENCY.labels(method, path),
+                REQUESTS.labels(method, path, str(status)),
+            )
+        latency, count = series
+        latency.observe(seconds)
+        count.inc()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = self._in_flight.get(method)
+        if in_flight is None:
+            in_flight = self._in_flight[method] = REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            # Set on the scope by the router once a route matched
+            route = getattr(scope.get("route"), "path", "unmatched")
+            self._observe(method, route, status, time.perf_counter() - start)
@@ -7,7 +7,11 @@ from typing import Optional
 from pydantic import BaseModel
 
 from db import SessionLocal
+from models.timeline_event import EventType
 from models.workflows import WorkflowRun, WorkflowStep, RunState, StepState
+from services.run_summary import start_run_summary
+from services.timeline import timeline_writer
+from services.tracing import tracer
 
 
 class PlanStep(BaseModel):
@@ -31,6 +35,7 @@ class Orchestrator:
     def __init__(self, db=None):
         self.db = db or SessionLocal()
 
+    @tracer.traced("orchestrator.parse_intent")
     def parse_intent(self, intent: str) -> ExecutionPlan:
         """
         Parse user intent into structured execution plan.
@@ -101,12 +106,17 @@ class Orchestrator:
                 )
             )
 
+        tracer.annotate(steps=len(steps))
         return ExecutionPlan(steps=steps)
 
+    @tracer.traced("orchestrator.create_workflow")
     def create_workflow(self, user_id: int, intent: str) -> WorkflowRun:
         """
         Create a new workflow with generated execution plan.
 
+        The run, its steps and its WORKFLOW_STARTED event commit together,
+        so the event is the run's first whatever drives it afterwards.
+
         Returns the created WorkflowRun.
         """
         # Parse intent into plan
@@ -122,6 +132,7 @@ class Orchestrator:
 
         self.db.add(run)
         self.db.flush()  # Get run.id
+        tracer.annotate(run_id=run.id)
 
         # Create steps from plan
         step_models = []
@@ -145,6 +156,10 @@ class Orchestrator:
             self.db.flush()
             step_models.append(step)
 
+        start_run_summary(self.db, run, len(step_models))
+        timeline_writer.stage(
+            self.db, run.id, None, EventType.WORKFLOW_STARTED, f"Workflow started: {intent}"
+        )
         self.db.commit()
         self.db.refresh(run)
 
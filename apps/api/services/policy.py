@@ -0,0 +1,311 @@
+"""Policy engine — auto-approves high-risk steps a user has pre-authorized."""
+
+import operator
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, time as dt_time, timezone
+from typing import Callable, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from config import settings
+from db import SessionLocal
+from models.approval_policy import ApprovalPolicy
+from models.approvals import Approval
+
+# Risk levels that need a decision; below these a step is always ready
+APPROVAL_RISK_LEVELS = ("L2", "L3")
+
+RISK_ORDER = {"L0": 0, "L1": 1, "L2": 2, "L3": 3}
+
+# Step facts a condition can test
+FACT_FIELDS = ("tool", "name", "risk_level", "intent")
+
+# Policy fields an update cannot clear; a null tool or daily_quota means "any" / "unlimited"
+REQUIRED_FIELDS = ("max_risk_level", "conditions", "enabled")
+
+
+def _matches(value, pattern: re.Pattern) -> bool:
+    return value is not None and pattern.search(str(value)) is not None
+
+
+# op -> (compile the expected value, test(actual, compiled))
+OPERATORS: dict[str, tuple[Callable, Callable]] = {
+    "eq": (lambda v: v, operator.eq),
+    "ne": (lambda v: v, operator.ne),
+    "in": (frozenset, lambda actual, allowed: actual in allowed),
+    "not_in": (frozenset, lambda actual, denied: actual not in denied),
+    "contains": (str, lambda actual, part: actual is not None and part in str(actual)),
+    "matches": (re.compile, _matches),
+}
+
+
+def _utcnow() -> datetime:
+    # decided_at is stored as a naive UTC timestamp
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def compile_condition(condition: dict) -> Callable[[dict], bool]:
+    """
+    Turn a `{"field", "op", "value"}` condition into a predicate over facts.
+
+    Value conversions (sets, regexes) happen here, once, so evaluating
+    the predicate is a dict lookup and a comparison. Raises ValueError
+    for an unknown field or operator or an invalid value.
+    """
+    try:
+        fact, op, value = condition["field"], condition["op"], condition["value"]
+    except (KeyError, TypeError):
+        raise ValueError("A condition needs 'field', 'op' and 'value'")
+    if fact not in FACT_FIELDS:
+        raise ValueError(f"Unknown condition field {fact!r}; expected one of {FACT_FIELDS}")
+    if op not in OPERATORS:
+        raise ValueError(f"Unknown condition op {op!r}; expected one of {tuple(OPERATORS)}")
+
+    prepare, test = OPERATORS[op]
+    try:
+        expected = prepare(value)
+    except (TypeError, re.error) as e:
+        raise ValueError(f"Invalid value for {op!r}: {e}")
+
+    return lambda facts: test(facts.get(fact), expected)
+
+
+def validate_policy(max_risk_level: str, conditions: list, daily_quota: Optional[int]) -> None:
+    """Raise ValueError if the policy cannot be compiled."""
+    if max_risk_level not in RISK_ORDER:
+        raise ValueError(f"Unknown risk level {max_risk_level!r}")
+    if daily_quota is not None and daily_quota < 0:
+        raise ValueError("daily_quota cannot be negative")
+    for condition in conditions:
+        compile_condition(condition)
+
+
+@dataclass
+class CompiledRule:
+    """A policy with its conditions compiled to predicates."""
+
+    policy_id: int
+    max_risk: int
+    predicates: tuple
+    daily_quota: Optional[int]
+    used_today: int = 0
+
+    def matches(self, risk: int, facts: dict) -> bool:
+        if risk > self.max_risk:
+            return False
+        if self.daily_quota is not None and self.used_today >= self.daily_quota:
+            return False
+        return all(predicate(facts) for predicate in self.predicates)
+
+
+@dataclass
+class CompiledPolicies:
+    """A user's enabled policies, indexed by tool for one UTC day."""
+
+    day: datetime
+    expires_at: float
+    by_tool: dict = field(default_factory=dict)  # tool -> [CompiledRule]
+    any_tool: list = field(default_factory=list)
+    rules: dict = field(default_factory=dict)  # policy id -> CompiledRule
+
+
+class PolicyEngine:
+    """
+    Decides whether a high-risk step can skip the human approval gate.
+
+    A user's enabled policies are compiled once into rules indexed by
+    tool, with condition values pre-converted, and cached in process.
+    Deciding is then a dict lookup plus a few comparisons per candidate
+    rule, with no database access. Cache entries are invalidated when
+    this process changes the user's policies, and expire after
+    `POLICY_CACHE_SECONDS` so other workers' changes and quota use are
+    picked up. Daily quota use is counted from the approvals each policy
+    granted today when the rules are compiled, and incremented in memory
+    as they are used, so workers may overshoot a quota by what the
+    others used within one cache lifetime.
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl if ttl is not None else settings.POLICY_CACHE_SECONDS
+        self._compiled: dict[int, CompiledPolicies] = {}
+        self._lock = threading.Lock()
+
+    def _compile(self, db: Session, user_id: int) -> CompiledPolicies:
+        day = datetime.combine(_utcnow().date(), dt_time.min)
+        compiled = CompiledPolicies(day=day, expires_at=time.monotonic() + self.ttl)
+
+        policies = db.scalars(
+            select(ApprovalPolicy)
+            .where(ApprovalPolicy.user_id == user_id, ApprovalPolicy.enabled.is_(True))
+            .order_by(ApprovalPolicy.id)
+        ).all()
+        for policy in policies:
+            rule = CompiledRule(
+                policy_id=policy.id,
+                max_risk=RISK_ORDER.get(policy.max_risk_level, -1),
+                predicates=tuple(compile_condition(c) for c in policy.conditions or []),
+                daily_quota=policy.daily_quota,
+            )
+            compiled.rules[policy.id] = rule
+            if policy.tool is None:
+                compiled.any_tool.append(rule)
+            else:
+                compiled.by_tool.setdefault(policy.tool, []).append(rule)
+
+        with_quota = [
+            rule.policy_id for rule in compiled.rules.values() if rule.daily_quota is not None
+        ]
+        if with_quota:
+            used = db.execute(
+                select(Approval.policy_id, func.count())
+                .where(Approval.policy_id.in_(with_quota), Approval.decided_at >= day)
+                .group_by(Approval.policy_id)
+            ).all()
+            for policy_id, count in used:
+                compiled.rules[policy_id].used_today = count
+
+        return compiled
+
+    def _policies(self, db: Session, user_id: int) -> CompiledPolicies:
+        compiled = self._compiled.get(user_id)
+        if (
+            compiled is None
+            or compiled.expires_at <= time.monotonic()
+            or compiled.day.date() != _utcnow().date()
+        ):
+            compiled = self._compile(db, user_id)
+            with self._lock:
+                self._compiled[user_id] = compiled
+        return compiled
+
+    def needs_approval(self, risk_level: str) -> bool:
+        return risk_level in APPROVAL_RISK_LEVELS
+
+    def reserve(self, db: Session, user_id: int, facts: dict) -> Optional[int]:
+        """
+        Find the first rule that auto-approves a step and count one use of it.
+
+        Rules for the step's tool are tried before any-tool rules, each in
+        id order. Returns the policy id, or None if the step needs a
+        person. Call `release` if the approval is not committed.
+        """
+        compiled = self._policies(db, user_id)
+        risk = RISK_ORDER.get(facts.get("risk_level"), len(RISK_ORDER))
+
+        with self._lock:
+            for rule in (*compiled.by_tool.get(facts.get("tool"), ()), *compiled.any_tool):
+                if rule.matches(risk, facts):
+                    rule.used_today += 1
+                    return rule.policy_id
+        return None
+
+    def release(self, user_id: int, policy_id: int) -> None:
+        """Give back a use counted by `reserve` for an approval that was rolled back."""
+        with self._lock:
+            compiled = self._compiled.get(user_id)
+            rule = compiled.rules.get(policy_id) if compiled else None
+            if rule and rule.used_today:
+                rule.used_today -= 1
+
+    def invalidate(self, user_id: int) -> None:
+        """Drop a user's compiled rules; call after committing a change to their policies."""
+        with self._lock:
+            self._compiled.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._compiled.clear()
+
+
+# Process-wide engine shared by schedulers and the policy endpoints
+policy_engine = PolicyEngine()
+
+
+class PolicyService:
+    """Manages a user's auto-approval policies."""
+
+    def __init__(self, db=None):
+        self.db = db or SessionLocal()
+
+    def list_policies(self, user_id: int) -> list[ApprovalPolicy]:
+        return list(
+            self.db.scalars(
+                select(ApprovalPolicy)
+                .where(ApprovalPolicy.user_id == user_id)
+                .order_by(ApprovalPolicy.id)
+            )
+        )
+
+    def create_policy(
+        self,
+        user_id: int,
+        tool: Optional[str] = None,
+        max_risk_level: str = "L3",
+        conditions: Optional[list] = None,
+        daily_quota: Optional[int] = None,
+    ) -> ApprovalPolicy:
+        """Create an enabled policy. Raises ValueError if it does not compile."""
+        conditions = conditions or []
+        validate_policy(max_risk_level, conditions, daily_quota)
+
+        policy = ApprovalPolicy(
+            user_id=user_id,
+            tool=tool,
+            max_risk_level=max_risk_level,
+            conditions=conditions,
+            daily_quota=daily_quota,
+            enabled=True,
+        )
+        self.db.add(policy)
+        self.db.commit()
+        policy_engine.invalidate(user_id)
+        return policy
+
+    def update_policy(self, policy_id: int, **changes) -> Optional[ApprovalPolicy]:
+        """
+        Change a policy's fields; returns None if it does not exist.
+
+        Raises ValueError if a required field is set to None or the
+        result does not compile.
+        """
+        for name in REQUIRED_FIELDS:
+            if name in changes and changes[name] is None:
+                raise ValueError(f"{name} cannot be null")
+
+        policy = self.db.get(ApprovalPolicy, policy_id)
+        if not policy:
+            return None
+
+        merged = {
+            "max_risk_level": policy.max_risk_level,
+            "conditions": policy.conditions,
+            "daily_quota": policy.daily_quota,
+        }
+        merged.update((name, value) for name, value in changes.items() if name in merged)
+        validate_policy(**merged)
+
+        for name, value in changes.items():
+            setattr(policy, name, value)
+
+        self.db.commit()
+        policy_engine.invalidate(policy.user_id)
+        return policy
+
+    def delete_policy(self, policy_id: int) -> bool:
+        policy = self.db.get(ApprovalPolicy, policy_id)
+        if not policy:
+            return False
+
+        user_id = policy.user_id
+        self.db.delete(policy)
+        self.db.commit()
+        policy_engine.invalidate(user_id)
+        return True
+
+    def close(self):
+        """Close database session."""
+        self.db.close()
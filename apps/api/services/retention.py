@@ -0,0 +1,332 @@
+"""Retention — purges finished runs in small, throttled, resumable batches."""
+
+import asyncio
+import contextlib
+import gzip
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, inspect, select
+from sqlalchemy.orm import Session
+
+from config import settings
+from db import SchedulerSessionLocal
+from models.approvals import Approval
+from models.retention_checkpoint import RetentionCheckpoint
+from models.run_summary import RunSummary
+from models.timeline_archive import TimelineArchive
+from models.timeline_event import TimelineEvent
+from models.tool_calls import ToolCall
+from models.workflows import WorkflowRun, WorkflowStep, TERMINAL_RUN_STATES
+from services.timeline_archive import compact_segments, iter_timeline, remove_orphan_segments
+
+logger = logging.getLogger(__name__)
+
+# Checkpoint row of the finished-runs purge
+JOB = "finished_runs"
+
+# Tables holding a run's rows, deleted children first so no statement
+# has to cascade or null out references. timeline_events goes before
+# these, in chunks (`_delete_events`).
+PURGE_ORDER = [TimelineArchive, ToolCall, RunSummary, Approval, WorkflowStep]
+
+
+@dataclass
+class PurgeStats:
+    """What one purge call did."""
+
+    runs: int = 0
+    rows: int = 0
+    batches: int = 0
+    complete: bool = False  # The pass reached the end of workflow_runs
+
+
+def _utcnow() -> datetime:
+    # updated_at is stored as a naive UTC timestamp
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _checkpoint(db: Session, job: str) -> RetentionCheckpoint:
+    """The job's checkpoint, locked so concurrent purges take turns."""
+    checkpoint = db.scalars(
+        select(RetentionCheckpoint).where(RetentionCheckpoint.job == job).with_for_update()
+    ).first()
+    if checkpoint is None:
+        checkpoint = RetentionCheckpoint(job=job, last_run_id=0, runs_deleted=0, rows_deleted=0)
+        db.add(checkpoint)
+    if checkpoint.pass_started_at is None:
+        checkpoint.pass_started_at = _utcnow()
+    return checkpoint
+
+
+def throttle_delay(rows: int, elapsed: float, max_rows_per_second: int) -> float:
+    """Seconds to wait after deleting `rows` in `elapsed` seconds to hold the target rate."""
+    if max_rows_per_second <= 0:
+        return 0.0
+    return max(0.0, rows / max_rows_per_second - elapsed)
+
+
+# ── Archive ─────────────────────────────────────────
+
+
+def _columns(obj) -> dict:
+    return {attr.key: getattr(obj, attr.key) for attr in inspect(obj).mapper.column_attrs}
+
+
+def write_run_archive(db: Session, run_ids: list[int], archive_dir: str) -> str:
+    """
+    Write runs with their steps, approvals, tool calls and full timeline
+    (archived segments included) to one gzipped NDJSON file.
+
+    The file name is derived from the batch's id range and replaced
+    atomically, so a batch retried after a crash overwrites its own file.
+    Runs already in that file keep their record: the crash may have
+    deleted some of their events since. Returns the file path.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"runs-{run_ids[0]:012d}-{run_ids[-1]:012d}.jsonl.gz")
+    tmp_path = f"{path}.tmp"
+
+    written = {}
+    if os.path.exists(path):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                written[json.loads(line)["run"]["id"]] = line
+
+    children = {
+        "steps": WorkflowStep,
+        "approvals": Approval,
+        "tool_calls": ToolCall,
+    }
+
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        for run in db.scalars(select(WorkflowRun).where(WorkflowRun.id.in_(run_ids))):
+            if run.id in written:
+                f.write(written[run.id])
+                continue
+            record = {"run": _columns(run)}
+            for key, model in children.items():
+                rows = db.scalars(select(model).where(model.run_id == run.id).order_by(model.id))
+                record[key] = [_columns(row) for row in rows]
+            record["events"] = [json.loads(line) for _, line in iter_timeline(db, run.id)]
+            f.write(json.dumps(record, default=str, separators=(",", ":")) + "\n")
+
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp_path, path)
+    return path
+
+
+# ── Purge ───────────────────────────────────────────
+
+
+def _delete_events(db: Session, run_ids: list[int], chunk_rows: int) -> int:
+    """
+    Delete the runs' live timeline events, `chunk_rows` at a time.
+
+    Each chunk is a keyset page of event ids and commits on its own,
+    so a run with a long timeline never holds one huge DELETE open.
+    Returns the number of rows deleted.
+    """
+    rows, after = 0, 0
+    while True:
+        ids = list(
+            db.scalars(
+                select(TimelineEvent.id)
+                .where(TimelineEvent.run_id.in_(run_ids), TimelineEvent.id > after)
+                .order_by(TimelineEvent.id)
+                .limit(chunk_rows)
+            )
+        )
+        if not ids:
+            return rows
+        rows += db.execute(
+            delete(TimelineEvent).where(TimelineEvent.id.in_(ids)),
+            execution_options={"synchronize_session": False},
+        ).rowcount
+        db.commit()
+        if len(ids) < chunk_rows:
+            return rows
+        after = ids[-1]
+
+
+def purge_batch(
+    db: Session,
+    cutoff: datetime,
+    batch_runs: int,
+    archive_dir: Optional[str] = None,
+    job: str = JOB,
+    chunk_rows: Optional[int] = None,
+) -> Optional[PurgeStats]:
+    """
+    Delete the next batch of finished runs last updated before `cutoff`.
+
+    Runs are walked in id order from the checkpoint (keyset, never
+    OFFSET). The batch's live timeline events are deleted first, in
+    commits of at most `chunk_rows` rows. The rest of the batch's rows
+    and the checkpoint advance then commit together, so a crash leaves
+    the runs in place (with part of their timeline gone) and a rerun
+    picks up the same batch. Archived events go too: the segment files
+    holding them are rewritten without them (`compact_segments`) and the
+    old files unlinked after the commit.
+    Returns None, after resetting the checkpoint and removing orphaned
+    segment files, once the pass has reached the end.
+    """
+    checkpoint = _checkpoint(db, job)
+
+    run_ids = list(
+        db.scalars(
+            select(WorkflowRun.id)
+            .where(
+                WorkflowRun.id > checkpoint.last_run_id,
+                WorkflowRun.state.in_(TERMINAL_RUN_STATES),
+                WorkflowRun.updated_at < cutoff,
+            )
+            .order_by(WorkflowRun.id)
+            .limit(batch_runs)
+        )
+    )
+
+    if not run_ids:
+        logger.info(
+            "Retention pass complete: %d runs, %d rows since %s",
+            checkpoint.runs_deleted,
+            checkpoint.rows_deleted,
+            checkpoint.pass_started_at,
+        )
+        checkpoint.last_run_id = 0
+        checkpoint.runs_deleted = checkpoint.rows_deleted = 0
+        checkpoint.pass_started_at = None
+        db.commit()
+        for name in remove_orphan_segments(db):
+            logger.info("Removed orphaned timeline segment %s", name)
+        return None
+
+    if archive_dir:
+        write_run_archive(db, run_ids, archive_dir)
+
+    rows = _delete_events(db, run_ids, chunk_rows or settings.RETENTION_CHUNK_ROWS)
+
+    # The chunk commits released the lock; a purge that ran meanwhile
+    # may have moved the checkpoint past this batch
+    checkpoint = _checkpoint(db, job)
+    superseded = compact_segments(db, run_ids)
+
+    for model in PURGE_ORDER:
+        rows += db.execute(
+            delete(model).where(model.run_id.in_(run_ids)),
+            execution_options={"synchronize_session": False},
+        ).rowcount
+    rows += db.execute(
+        delete(WorkflowRun).where(WorkflowRun.id.in_(run_ids)),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+
+    checkpoint.last_run_id = max(checkpoint.last_run_id, run_ids[-1])
+    checkpoint.runs_deleted += len(run_ids)
+    checkpoint.rows_deleted += rows
+    db.commit()
+
+    for path in superseded:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+
+    return PurgeStats(runs=len(run_ids), rows=rows, batches=1)
+
+
+def _options(older_than_days, batch_runs, max_rows_per_second, archive):
+    """Fill unset options from settings."""
+    if older_than_days is None:
+        older_than_days = settings.RETENTION_AFTER_DAYS
+    if archive is None:
+        archive = settings.RETENTION_ARCHIVE
+    if max_rows_per_second is None:
+        max_rows_per_second = settings.RETENTION_MAX_ROWS_PER_SECOND
+    return (
+        _utcnow() - timedelta(days=older_than_days),
+        batch_runs or settings.RETENTION_BATCH_RUNS,
+        max_rows_per_second,
+        settings.RETENTION_ARCHIVE_DIR if archive else None,
+    )
+
+
+def purge_finished_runs(
+    db: Session,
+    older_than_days: Optional[int] = None,
+    batch_runs: Optional[int] = None,
+    max_rows_per_second: Optional[int] = None,
+    archive: Optional[bool] = None,
+    max_batches: Optional[int] = None,
+) -> PurgeStats:
+    """
+    Purge finished runs older than `older_than_days`, batch by batch.
+
+    Sleeps between batches so deletes average at most
+    `max_rows_per_second` rows across all tables. Stops after
+    `max_batches` batches, if given; the next call resumes from the
+    checkpoint.
+    """
+    cutoff, batch_runs, max_rows_per_second, archive_dir = _options(
+        older_than_days, batch_runs, max_rows_per_second, archive
+    )
+    stats = PurgeStats()
+
+    while max_batches is None or stats.batches < max_batches:
+        start = time.monotonic()
+        batch = purge_batch(db, cutoff, batch_runs, archive_dir)
+        if batch is None:
+            stats.complete = True
+            break
+
+        stats.runs += batch.runs
+        stats.rows += batch.rows
+        stats.batches += 1
+        time.sleep(throttle_delay(batch.rows, time.monotonic() - start, max_rows_per_second))
+
+    return stats
+
+
+def _purge_one(
+    cutoff: datetime, batch_runs: int, archive_dir: Optional[str]
+) -> Optional[PurgeStats]:
+    db = SchedulerSessionLocal()
+    try:
+        return purge_batch(db, cutoff, batch_runs, archive_dir)
+    finally:
+        db.close()
+
+
+async def run_retention_maintenance(interval: Optional[int] = None) -> None:
+    """
+    Background task: purge finished runs every `interval` seconds.
+
+    Each batch runs in a worker thread on the scheduler pool, and the
+    throttle sleeps on the event loop, so shutdown can cancel the task
+    between batches.
+    """
+    if interval is None:
+        interval = settings.RETENTION_INTERVAL_SECONDS
+    if interval <= 0:
+        return
+
+    while True:
+        cutoff, batch_runs, max_rows_per_second, archive_dir = _options(None, None, None, None)
+        try:
+            while True:
+                start = time.monotonic()
+                batch = await asyncio.to_thread(_purge_one, cutoff, batch_runs, archive_dir)
+                if batch is None:
+                    break
+                await asyncio.sleep(
+                    throttle_delay(batch.rows, time.monotonic() - start, max_rows_per_second)
+                )
+        except Exception:
+            logger.exception("Retention purge failed")
+
+        await asyncio.sleep(interval)
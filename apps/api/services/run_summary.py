@@ -0,0 +1,232 @@
+"""Run summaries — the dashboard projection, kept in step with transitions."""
+
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import DateTime, bindparam, case, extract, func, literal, select, update
+from sqlalchemy.orm import Session
+
+from models.approvals import Approval, ApprovalStatus
+from models.run_summary import RunSummary
+from models.workflows import WorkflowRun, WorkflowStep, RunState, StepState, TERMINAL_RUN_STATES
+
+# Summary column holding each step state's count
+STEP_COUNT_COLUMNS = {
+    StepState.PENDING: "steps_pending",
+    StepState.READY: "steps_ready",
+    StepState.RUNNING: "steps_running",
+    StepState.BLOCKED: "steps_blocked",
+    StepState.SUCCEEDED: "steps_succeeded",
+    StepState.FAILED: "steps_failed",
+    StepState.SKIPPED: "steps_skipped",
+}
+
+
+def _utcnow() -> datetime:
+    # Columns are naive UTC, like func.now() on the server
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def start_run_summary(db: Session, run: WorkflowRun, steps: int) -> RunSummary:
+    """Add the summary of a run just created with `steps` PENDING steps."""
+    now = _utcnow()
+    summary = RunSummary(
+        run_id=run.id,
+        user_id=run.user_id,
+        intent=run.intent,
+        state=run.state,
+        steps_total=steps,
+        steps_pending=steps,
+        started_at=run.created_at or now,
+        last_event_at=now,
+        duration_seconds=0.0,
+    )
+    db.add(summary)
+    return summary
+
+
+def _seconds(db: Session, start, end):
+    """SQL for the seconds from `start` to `end`, both timestamps."""
+    if db.get_bind().dialect.name == "postgresql":
+        return extract("epoch", end - start)
+    return (func.julianday(end) - func.julianday(start)) * 86400.0
+
+
+def _first_required(run_id: int, column):
+    """Scalar subquery: `column` of the run's oldest REQUIRED approval."""
+    return (
+        select(column)
+        .where(Approval.run_id == run_id, Approval.status == ApprovalStatus.REQUIRED)
+        .order_by(Approval.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+def apply_transition(
+    db: Session,
+    run_id: int,
+    moves: Iterable[tuple[StepState, StepState]] = (),
+    state: Optional[RunState] = None,
+    blocked_by: Optional[Approval] = None,
+    decided: Iterable[int] = (),
+) -> None:
+    """
+    Adjust a run's summary for a transition, in one UPDATE.
+
+    Call inside the transition's transaction, before committing, with
+    what it changed:
+
+    - moves: a (from, to) step state pair per step moved
+    - state: the run's new state, if it changed
+    - blocked_by: a REQUIRED approval just created
+    - decided: ids of approvals that are no longer REQUIRED
+
+    Counts are shifted in place (`steps_ready = steps_ready - 1`), so
+    concurrent transitions of one run never lose each other's changes.
+    Pending changes are flushed first, assigning `blocked_by.id`; a run
+    without a summary row is recounted by `refresh_run_summary` instead.
+    """
+    db.flush()  # Sessions do not autoflush; the decided approvals must be written
+
+    table = RunSummary.__table__
+    now = literal(_utcnow(), DateTime)
+    values = {
+        "last_event_at": case((table.c.last_event_at < now, now), else_=table.c.last_event_at)
+    }
+
+    deltas = Counter()
+    for before, after in moves:
+        deltas[before] -= 1
+        deltas[after] += 1
+    for step_state, delta in deltas.items():
+        if delta:
+            column = table.c[STEP_COUNT_COLUMNS[step_state]]
+            values[column.name] = column + delta
+
+    if blocked_by is not None:
+        values["blocking_approval_id"] = func.coalesce(
+            table.c.blocking_approval_id, blocked_by.id
+        )
+        values["blocking_reason"] = case(
+            (table.c.blocking_approval_id.is_(None), blocked_by.reason),
+            else_=table.c.blocking_reason,
+        )
+    decided = list(decided)
+    if decided:
+        # The oldest REQUIRED approval left, once the blocking one is decided
+        was_decided = table.c.blocking_approval_id.in_(decided)
+        values["blocking_approval_id"] = case(
+            (was_decided, _first_required(run_id, Approval.id)),
+            else_=table.c.blocking_approval_id,
+        )
+        values["blocking_reason"] = case(
+            (was_decided, _first_required(run_id, Approval.reason)),
+            else_=table.c.blocking_reason,
+        )
+
+    finished_at = func.coalesce(table.c.finished_at, now)
+    if state is not None:
+        values["state"] = state
+        if state in TERMINAL_RUN_STATES:
+            values["finished_at"] = finished_at
+        else:
+            values["finished_at"] = None
+            finished_at = now
+    values["duration_seconds"] = _seconds(db, table.c.started_at, finished_at)
+
+    updated = db.execute(
+        update(table).where(table.c.run_id == run_id).values(**values)
+    ).rowcount
+    if not updated:
+        refresh_run_summary(db, run_id)
+
+
+def refresh_run_summary(db: Session, run_id: int) -> Optional[RunSummary]:
+    """
+    Recompute a run's summary from its steps and approvals.
+
+    For backfills and repairs; transitions call `apply_transition`, one
+    statement instead of four. Runs inside the caller's transaction,
+    locking the summary row first so concurrent refreshes take turns.
+    """
+    db.flush()  # Sessions do not autoflush; count the caller's changes too
+
+    run = db.get(WorkflowRun, run_id)
+    if run is None:
+        return None
+
+    now = _utcnow()
+    summary = db.scalars(
+        select(RunSummary).where(RunSummary.run_id == run_id).with_for_update()
+    ).first()
+    if summary is None:
+        summary = RunSummary(
+            run_id=run.id,
+            user_id=run.user_id,
+            intent=run.intent,
+            started_at=run.created_at or now,
+        )
+        db.add(summary)
+
+    counts = dict(
+        db.execute(
+            select(WorkflowStep.state, func.count())
+            .where(WorkflowStep.run_id == run_id)
+            .group_by(WorkflowStep.state)
+        ).all()
+    )
+    for state, column in STEP_COUNT_COLUMNS.items():
+        setattr(summary, column, counts.get(state, 0))
+    summary.steps_total = sum(counts.values())
+
+    blocking = db.execute(
+        select(Approval.id, Approval.reason)
+        .where(Approval.run_id == run_id, Approval.status == ApprovalStatus.REQUIRED)
+        .order_by(Approval.id)
+        .limit(1)
+    ).first()
+    summary.blocking_approval_id, summary.blocking_reason = blocking or (None, None)
+
+    summary.state = run.state
+    summary.last_event_at = max(summary.last_event_at or now, now)
+    if run.state in TERMINAL_RUN_STATES:
+        summary.finished_at = summary.finished_at or now
+    else:
+        summary.finished_at = None
+    summary.duration_seconds = (
+        (summary.finished_at or now) - summary.started_at
+    ).total_seconds()
+
+    return summary
+
+
+def touch_last_event(db: Session, rows: list[dict]) -> None:
+    """
+    Advance `last_event_at` for the runs of newly written timeline rows.
+
+    One executemany UPDATE for the whole batch; runs are updated in id
+    order so concurrent batches lock summary rows in the same order.
+    """
+    latest: dict[int, datetime] = {}
+    for row in rows:
+        created_at = row["created_at"]
+        latest[row["run_id"]] = max(latest.get(row["run_id"], created_at), created_at)
+
+    if not latest:
+        return
+
+    table = RunSummary.__table__
+    db.execute(
+        update(table)
+        .where(
+            table.c.run_id == bindparam("summary_run_id"),
+            table.c.last_event_at < bindparam("event_at"),
+        )
+        .values(last_event_at=bindparam("event_at")),
+        [
+            {"summary_run_id": run_id, "event_at": latest[run_id]}
+            for run_id in sorted(latest)
+        ],
+    )
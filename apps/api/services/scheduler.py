@@ -1,11 +1,24 @@
 """Scheduler — DAG resolution and step readiness determination."""
 
+import logging
+import time
 from datetime import datetime, timezone
 from typing import Optional, List
 
-from db import SessionLocal
-from models.workflows import WorkflowRun, WorkflowStep, RunState, StepState
+from db import SessionLocal, count_queries, log_queries
+from models.workflows import WorkflowRun, WorkflowStep, RunState, StepState, TERMINAL_RUN_STATES
 from models.approvals import Approval, ApprovalStatus
+from models.timeline_event import EventType
+from services.approval_inbox import pending_counts
+from services.approval_timers import approval_timers, deadline_columns
+from services.concurrency import TransitionConflict, with_retries
+from services.metrics import SCHEDULER_ROUND, SCHEDULER_ROUND_STATEMENTS
+from services.policy import policy_engine
+from services.run_summary import apply_transition
+from services.timeline import timeline_writer
+from services.tracing import tracer
+
+logger = logging.getLogger(__name__)
 
 
 class Scheduler:
@@ -21,37 +34,25 @@ class Scheduler:
         A step is ready if:
         - state == pending
         - all dependencies are succeeded
-        """
-        run = self.db.query(WorkflowRun).filter(
-            WorkflowRun.id == run_id).first()
-        if not run:
-            return []
 
-        pending_steps = (
-            self.db.query(WorkflowStep)
-            .filter(WorkflowStep.run_id == run_id, WorkflowStep.state == StepState.PENDING)
-            .all()
-        )
+        The run's steps are loaded with one query and dependencies are
+        resolved in memory, so the cost does not grow with the number
+        of pending steps.
+        """
+        steps = self.db.query(WorkflowStep).filter(WorkflowStep.run_id == run_id).all()
+        states = {step.id: step.state for step in steps}
 
         ready = []
-        for step in pending_steps:
-            if not step.depends_on:
-                # No dependencies - ready immediately
-                ready.append(step)
+        for step in steps:
+            if step.state != StepState.PENDING:
                 continue
 
-            # Check if all dependencies are succeeded
-            dependency_steps = (
-                self.db.query(WorkflowStep)
-                .filter(WorkflowStep.id.in_(step.depends_on))
-                .all()
-            )
-
-            all_deps_succeeded = all(
-                dep.state == StepState.SUCCEEDED for dep in dependency_steps
-            )
-
-            if all_deps_succeeded:
+            # Dependencies are steps of the same run; ids not found are ignored
+            if all(
+                states[dep] == StepState.SUCCEEDED
+                for dep in step.depends_on or []
+                if dep in states
+            ):
                 ready.append(step)
 
         return ready
@@ -61,40 +62,140 @@ class Scheduler:
         """
         Process a single step:
         - Check risk level
-        - Create approval if needed
-        - Transition to ready or blocked
+        - Auto-approve it if one of the user's policies allows, otherwise
+          create an approval if needed
+        - Transition to ready or blocked, staging the step's timeline
+          events in the same commit
 
-        Returns the new state (ready, blocked).
-        """
-        step = self.db.query(WorkflowStep).filter(
-            WorkflowStep.id == step_id).first()
-        if not step:
-            return None
+        The transition is version-checked and retried from a fresh read
+        on conflict; a step that is no longer PENDING by then was
+        processed by another worker and is left alone.
 
-        # Determine if approval is needed based on risk level
-        needs_approval = step.risk_level in ["L2", "L3"]
+        Returns the new state (ready, blocked), or None if the step was
+        not processed.
+        """
 
-        if needs_approval:
-            # Create approval record
-            approval = Approval(
-                run_id=step.run_id,
-                step_id=step.id,
-                reason=f"High-risk operation: {step.name} (risk level: {step.risk_level})",
-                status=ApprovalStatus.REQUIRED,
-            )
-            self.db.add(approval)
+        def transition() -> Optional[str]:
+            step = self.db.query(WorkflowStep).filter(
+                WorkflowStep.id == step_id).first()
+            if not step or step.state != StepState.PENDING:
+                return None
+
+            # High-risk steps need a decision: a matching policy, or a person
+            needs_approval = policy_engine.needs_approval(step.risk_level)
+            policy_id = None
+            if needs_approval:
+                user_id, intent = self.db.query(WorkflowRun.user_id, WorkflowRun.intent).filter(
+                    WorkflowRun.id == step.run_id).one()
+                policy_id = policy_engine.reserve(
+                    self.db,
+                    user_id,
+                    {
+                        "tool": step.tool,
+                        "name": step.name,
+                        "risk_level": step.risk_level,
+                        "intent": intent,
+                    },
+                )
+
+            if policy_id is not None:
+                try:
+                    return self._auto_approve(step, policy_id)
+                except Exception:
+                    policy_engine.release(user_id, policy_id)
+                    raise
+
+            if needs_approval:
+                # Create approval record, addressed to the run's owner, with
+                # the configured deadline if any
+                approval = Approval(
+                    run_id=step.run_id,
+                    step_id=step.id,
+                    approver_id=user_id,
+                    reason=f"High-risk operation: {step.name} (risk level: {step.risk_level})",
+                    status=ApprovalStatus.REQUIRED,
+                    **deadline_columns(),
+                )
+                self.db.add(approval)
+
+                # Mark step as blocked
+                step.state = StepState.BLOCKED
+                apply_transition(  # Flushes, assigning approval.id
+                    self.db,
+                    step.run_id,
+                    [(StepState.PENDING, StepState.BLOCKED)],
+                    blocked_by=approval,
+                )
+                timeline_writer.stage(
+                    self.db,
+                    step.run_id,
+                    step.id,
+                    EventType.STEP_BLOCKED,
+                    f"Step blocked pending approval: {step.name}",
+                )
+                timeline_writer.stage(
+                    self.db,
+                    step.run_id,
+                    step.id,
+                    EventType.APPROVAL_REQUIRED,
+                    f"Approval required: {step.name}",
+                    approval_id=approval.id,
+                )
+                self.db.commit()
+                pending_counts.invalidate(user_id)
+                approval_timers.arm(approval.id, approval.expires_at)
+
+                return "blocked"
+            else:
+                # Mark as ready for execution
+                step.state = StepState.READY
+                apply_transition(self.db, step.run_id, [(StepState.PENDING, StepState.READY)])
+                timeline_writer.stage(
+                    self.db, step.run_id, step.id, EventType.STEP_READY, f"Step ready: {step.name}"
+                )
+                self.db.commit()
+
+                return "ready"
+
+        try:
+            return with_retries(self.db, transition)
+        except TransitionConflict:
+            return None
 
-            # Mark step as blocked
-            step.state = StepState.BLOCKED
-            self.db.commit()
+    def _auto_approve(self, step: WorkflowStep, policy_id: int) -> str:
+        """
+        Approve a step on a policy's behalf and mark it ready, in one commit.
 
-            return "blocked"
-        else:
-            # Mark as ready for execution
-            step.state = StepState.READY
-            self.db.commit()
+        The approval is recorded already APPROVED, with `policy_id` and
+        no `decided_by`, so audits and the policy's daily quota see it.
+        """
+        approval = Approval(
+            run_id=step.run_id,
+            step_id=step.id,
+            reason=f"High-risk operation: {step.name} (risk level: {step.risk_level})",
+            status=ApprovalStatus.APPROVED,
+            decided_at=datetime.now(timezone.utc).replace(tzinfo=None),
+            policy_id=policy_id,
+        )
+        self.db.add(approval)
+
+        step.state = StepState.READY
+        # Flushes, assigning approval.id
+        apply_transition(self.db, step.run_id, [(StepState.PENDING, StepState.READY)])
+        timeline_writer.stage(
+            self.db,
+            step.run_id,
+            step.id,
+            EventType.APPROVAL_APPROVED,
+            f"Approval granted by policy {policy_id}: {step.name}",
+            approval_id=approval.id,
+        )
+        timeline_writer.stage(
+            self.db, step.run_id, step.id, EventType.STEP_READY, f"Step ready: {step.name}"
+        )
+        self.db.commit()
 
-            return "ready"
+        return "ready"
 
     def schedule_round(self, run_id: int) -> dict:
         """
@@ -106,7 +207,26 @@ class Scheduler:
         Returns dict with:
         - ready_steps: list of WorkflowStep
         - blocked_steps: list of WorkflowStep
+
+        The round's statements and DB time are counted and logged (see
+        `log_queries`), and exported with its duration as metrics. The
+        round is traced as a span with its counts.
         """
+        start = time.perf_counter()
+        with tracer.span("scheduler.schedule_round", run_id=run_id), count_queries() as queries:
+            result = self._schedule_round(run_id)
+            tracer.annotate(
+                ready=len(result["ready_steps"]),
+                blocked=len(result["blocked_steps"]),
+                statements=queries.statements,
+            )
+
+        SCHEDULER_ROUND.observe(time.perf_counter() - start)
+        SCHEDULER_ROUND_STATEMENTS.observe(queries.statements)
+        log_queries("scheduler_round", queries, run_id=run_id)
+        return result
+
+    def _schedule_round(self, run_id: int) -> dict:
         run = self.db.query(WorkflowRun).filter(
             WorkflowRun.id == run_id).first()
         if not run:
@@ -133,46 +253,85 @@ class Scheduler:
         return {"ready_steps": ready_to_dispatch, "blocked_steps": blocked}
 
     def update_run_state(self, run_id: int) -> None:
-        """Update workflow run state based on step states."""
-        run = self.db.query(WorkflowRun).filter(
-            WorkflowRun.id == run_id).first()
-        if not run:
-            return
-
-        steps = self.db.query(WorkflowStep).filter(
-            WorkflowStep.run_id == run_id).all()
+        """
+        Update workflow run state based on step states.
 
-        if not steps:
-            run.state = RunState.COMPLETED
-            self.db.commit()
-            return
+        The run UPDATE is version-checked; on conflict the state is
+        recomputed from a fresh read and written again.
+        """
 
-        # Count step states
-        state_counts = {}
-        for step in steps:
-            state_counts[step.state] = state_counts.get(step.state, 0) + 1
-
-        # Determine run state
-        if state_counts.get(StepState.BLOCKED, 0) > 0:
-            run.state = RunState.WAITING_APPROVAL
-        elif state_counts.get(StepState.RUNNING, 0) > 0:
-            run.state = RunState.EXECUTING
-        elif state_counts.get(StepState.FAILED, 0) > 0:
-            # If any step failed and we can't recover, mark failed
-            # (In a real system, would check if workflow is still viable)
-            if state_counts.get(StepState.PENDING, 0) == 0 and state_counts.get(
-                StepState.READY, 0
-            ) == 0:
-                run.state = RunState.FAILED
+        def transition() -> None:
+            run = self.db.query(WorkflowRun).filter(
+                WorkflowRun.id == run_id).first()
+            if not run:
+                return
+
+            if run.state == RunState.CANCELED:
+                # Canceled runs stay canceled, even if a step was still running
+                return
+
+            previous_state = run.state
+            steps = self.db.query(WorkflowStep).filter(
+                WorkflowStep.run_id == run_id).all()
+
+            if not steps:
+                run.state = RunState.COMPLETED
+                self._record_finished(run, previous_state)
+                if run.state != previous_state:
+                    apply_transition(self.db, run_id, state=run.state)
+                self.db.commit()
+                return
+
+            # Count step states
+            state_counts = {}
+            for step in steps:
+                state_counts[step.state] = state_counts.get(step.state, 0) + 1
+
+            # Determine run state
+            if state_counts.get(StepState.BLOCKED, 0) > 0:
+                run.state = RunState.WAITING_APPROVAL
+            elif state_counts.get(StepState.RUNNING, 0) > 0:
+                run.state = RunState.EXECUTING
+            elif state_counts.get(StepState.FAILED, 0) > 0:
+                # If any step failed and we can't recover, mark failed
+                # (In a real system, would check if workflow is still viable)
+                if state_counts.get(StepState.PENDING, 0) == 0 and state_counts.get(
+                    StepState.READY, 0
+                ) == 0:
+                    run.state = RunState.FAILED
+                else:
+                    run.state = RunState.EXECUTING
+            elif state_counts.get(StepState.SUCCEEDED, 0) + state_counts.get(
+                StepState.SKIPPED, 0
+            ) == len(steps):
+                # All steps succeeded, or were skipped by a rejection
+                run.state = RunState.COMPLETED
             else:
                 run.state = RunState.EXECUTING
-        elif state_counts.get(StepState.SUCCEEDED, 0) == len(steps):
-            # All steps succeeded
-            run.state = RunState.COMPLETED
-        else:
-            run.state = RunState.EXECUTING
 
-        self.db.commit()
+            self._record_finished(run, previous_state)
+            if run.state != previous_state:
+                apply_transition(self.db, run_id, state=run.state)
+            self.db.commit()
+
+        try:
+            with_retries(self.db, transition)
+        except TransitionConflict:
+            # Left as is; the next scheduling round recomputes it
+            logger.warning("Run %s state update kept conflicting", run_id)
+
+    def _record_finished(self, run: WorkflowRun, previous_state: RunState) -> None:
+        """Stage a WORKFLOW_COMPLETED event when the run first reaches a final state."""
+        if run.state == previous_state or run.state not in TERMINAL_RUN_STATES:
+            return
+
+        timeline_writer.stage(
+            self.db,
+            run.id,
+            None,
+            EventType.WORKFLOW_COMPLETED,
+            f"Workflow {run.state.value}",
+        )
 
     def close(self):
         """Close database session."""
@@ -0,0 +1,281 @@
+"""Timeline writer — buffered, batched persistence of timeline events."""
+
+import enum
+import json
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import Session
+
+from config import settings
+from db import SchedulerSessionLocal
+from models.timeline_event import TimelineEvent, EventType
+from services.frames import encode_payload
+from services.metrics import TIMELINE_EVENTS_DROPPED
+from services.run_summary import touch_last_event
+from services.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+
+def _utcnow() -> datetime:
+    # created_at is stored as a naive UTC timestamp
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class DurabilityMode(str, enum.Enum):
+    """How timeline events reach the database."""
+
+    SYNC = "sync"  # One commit per event; nothing is lost on a crash
+    BATCHED = "batched"  # Buffered and flushed as multi-row INSERTs
+
+
+class TimelineWriter:
+    """
+    Writes timeline events with as few commits as possible.
+
+    Three ways to record an event:
+    - `stage(db, ...)` adds the event to the caller's session so it is
+      committed together with the step transition it describes.
+    - `record(...)` in BATCHED mode buffers the event; the buffer is
+      flushed as one multi-row INSERT when it reaches
+      `max_batch` events or every `flush_interval` seconds.
+    - `record(...)` in SYNC mode commits the event on its own.
+
+    BATCHED trades up to `flush_interval` of events on a crash for a
+    single commit per batch. Call `close()` on shutdown to flush what is
+    left in the buffer.
+
+    A batch that fails to flush goes back to the buffer. After
+    `max_attempts` failures in a row it is written row by row, and rows
+    the database rejects (a constraint or a value it cannot store) are
+    logged and dropped instead of wedging every later flush. While the
+    database is unreachable the buffer keeps at most `max_buffer` events,
+    dropping the oldest. Drops are counted in
+    `lifeos_timeline_events_dropped_total`.
+    """
+
+    def __init__(
+        self,
+        session_factory=SchedulerSessionLocal,
+        mode: Optional[DurabilityMode] = None,
+        max_batch: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        max_buffer: Optional[int] = None,
+    ):
+        self.session_factory = session_factory
+        self.mode = DurabilityMode(mode or settings.TIMELINE_DURABILITY)
+        self.max_batch = max_batch or settings.TIMELINE_FLUSH_MAX_EVENTS
+        self.flush_interval = (
+            flush_interval
+            if flush_interval is not None
+            else settings.TIMELINE_FLUSH_INTERVAL_MS / 1000
+        )
+        self.max_attempts = max_attempts or settings.TIMELINE_FLUSH_MAX_ATTEMPTS
+        self.max_buffer = max_buffer or settings.TIMELINE_BUFFER_MAX_EVENTS
+        # Consecutive failed flushes of the events at the front of the buffer
+        self._failures = 0
+
+        self._buffer: list[dict] = []
+        self._lock = threading.Lock()
+        # Serializes flushes so batches are inserted in record order
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def build_row(
+        run_id: int,
+        step_id: Optional[int],
+        event_type: EventType,
+        message: str,
+        metadata: Optional[dict] = None,
+        approval_id: Optional[int] = None,
+    ) -> dict:
+        """
+        Build the column values for one timeline event.
+
+        The wire payload is serialized here, once, so readers never
+        touch JSON when fanning the event out.
+        """
+        # Stamped at record time, not flush time, so buffering
+        # does not skew the timeline
+        created_at = _utcnow()
+        return {
+            "run_id": run_id,
+            "step_id": step_id,
+            "approval_id": approval_id,
+            "event_type": event_type,
+            "message": message,
+            "metadata": json.dumps(metadata) if metadata else None,
+            "payload": encode_payload(
+                event_type.value, message, created_at.isoformat(), metadata
+            ),
+            "created_at": created_at,
+        }
+
+    def stage(
+        self,
+        db: Session,
+        run_id: int,
+        step_id: Optional[int],
+        event_type: EventType,
+        message: str,
+        metadata: Optional[dict] = None,
+        approval_id: Optional[int] = None,
+    ) -> None:
+        """Add an event to the caller's transaction without committing."""
+        row = self.build_row(run_id, step_id, event_type, message, metadata, approval_id)
+        self.stage_rows(db, [row])
+
+    def stage_rows(self, db: Session, rows: list[dict]) -> None:
+        """Add events built by `build_row` to the caller's transaction in one INSERT."""
+        if not rows:
+            return
+        with tracer.span("timeline.stage", events=len(rows)):
+            db.execute(insert(TimelineEvent.__table__), rows)
+            touch_last_event(db, rows)
+
+    def record(
+        self,
+        run_id: int,
+        step_id: Optional[int],
+        event_type: EventType,
+        message: str,
+        metadata: Optional[dict] = None,
+        approval_id: Optional[int] = None,
+    ) -> None:
+        """Record a standalone event according to the durability mode."""
+        with tracer.span(
+            "timeline.record", run_id=run_id, event=event_type.value, mode=self.mode.value
+        ):
+            row = self.build_row(run_id, step_id, event_type, message, metadata, approval_id)
+
+            if self.mode == DurabilityMode.SYNC:
+                self._write([row])
+                return
+
+            with self._lock:
+                self._buffer.append(row)
+                full = len(self._buffer) >= self.max_batch
+                self._trim()
+
+            if full:
+                self.flush()
+
+    def flush(self) -> int:
+        """Write all buffered events in one transaction. Returns the count written."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+
+            if not rows:
+                return 0
+
+            if self._failures >= self.max_attempts:
+                return self._write_each(rows)
+
+            try:
+                self._write(rows)
+            except Exception:
+                self._failures += 1
+                logger.exception(
+                    "Timeline flush failed (%d of %d); re-buffering %d events",
+                    self._failures, self.max_attempts, len(rows),
+                )
+                self._requeue(rows)
+                return 0
+
+            self._failures = 0
+            return len(rows)
+
+    def _write_each(self, rows: list[dict]) -> int:
+        """
+        Write rows one transaction each, dropping those the database rejects.
+
+        Stops at the first other error (the database is likely down) and
+        re-buffers the rest, so an outage does not discard events.
+        """
+        written = 0
+        for i, row in enumerate(rows):
+            try:
+                self._write([row])
+            except (IntegrityError, DataError):
+                logger.exception(
+                    "Dropping timeline event rejected by the database: run %s, %s",
+                    row["run_id"], row["event_type"].value,
+                )
+                TIMELINE_EVENTS_DROPPED.labels("rejected").inc()
+                continue
+            except Exception:
+                logger.exception("Timeline flush failed; re-buffering %d events", len(rows) - i)
+                self._requeue(rows[i:])
+                return written
+            written += 1
+
+        self._failures = 0
+        return written
+
+    def _requeue(self, rows: list[dict]) -> None:
+        """Put unwritten rows back at the front of the buffer."""
+        with self._lock:
+            self._buffer[:0] = rows
+            self._trim()
+
+    def _trim(self) -> None:
+        """Drop the oldest buffered events beyond `max_buffer`; call with the lock held."""
+        excess = len(self._buffer) - self.max_buffer
+        if excess > 0:
+            del self._buffer[:excess]
+            TIMELINE_EVENTS_DROPPED.labels("buffer_full").inc(excess)
+            logger.error("Timeline buffer full; dropped the %d oldest events", excess)
+
+    def _write(self, rows: list[dict]) -> None:
+        """Insert rows as a single multi-row INSERT, touch their run summaries, commit once."""
+        with tracer.span("timeline.write", events=len(rows)):
+            db = self.session_factory()
+            try:
+                db.execute(insert(TimelineEvent.__table__), rows)
+                touch_last_event(db, rows)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+    def start(self) -> None:
+        """Start the background thread that flushes on the time threshold."""
+        if self.mode != DurabilityMode.BATCHED or self._thread is not None:
+            return
+
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="timeline-writer", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self) -> None:
+        """Stop the flush thread and write out anything still buffered."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+
+# Process-wide writer shared by routers and services
+timeline_writer = TimelineWriter()
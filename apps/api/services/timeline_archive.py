@@ -0,0 +1,568 @@
+"""Timeline partitioning and archival to compressed segment files."""
+
+import asyncio
+import logging
+import os
+import re
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+from typing import AsyncIterator, Iterator, Optional
+
+from sqlalchemy import column, delete, insert, literal, select, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from config import settings
+from db import SchedulerSessionLocal
+from models.timeline_archive import TimelineArchive
+from models.timeline_event import TimelineEvent
+from models.workflows import WorkflowRun, TERMINAL_RUN_STATES
+from services.frames import json_line
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "timeline_events"
+
+# Catches rows no range partition covers (migration 0010)
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+
+# pg_get_expr() output for a range partition bound
+_BOUND_RE = re.compile(r"FROM \((MINVALUE|'[^']+')\) TO \('([^']+)'\)")
+
+# Segment file name: partition name, compaction generation (from 2), ".seg"
+_SEGMENT_RE = re.compile(r"^(?P<stem>.+?)(?:\.g(?P<generation>\d+))?\.seg$")
+
+
+@dataclass
+class Partition:
+    """One range partition of timeline_events."""
+
+    name: str
+    lower: Optional[datetime]  # None for MINVALUE
+    upper: datetime
+
+
+def _utcnow() -> datetime:
+    # created_at is stored as a naive UTC timestamp
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# ── Partitions ──────────────────────────────────────
+
+
+def is_partitioned(db: Session) -> bool:
+    """True when timeline_events is a partitioned Postgres table."""
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+
+    relkind = db.execute(
+        text("SELECT relkind FROM pg_class WHERE relname = :name"),
+        {"name": PARENT_TABLE},
+    ).scalar()
+    return relkind == "p"
+
+
+def list_partitions(db: Session) -> list[Partition]:
+    """List timeline_events partitions ordered by their lower bound."""
+    rows = db.execute(
+        text(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = :parent
+            """
+        ),
+        {"parent": PARENT_TABLE},
+    ).all()
+
+    partitions = []
+    for name, bound in rows:
+        match = _BOUND_RE.search(bound or "")
+        if not match:
+            continue
+        lower, upper = match.groups()
+        partitions.append(
+            Partition(
+                name=name,
+                lower=None if lower == "MINVALUE" else datetime.fromisoformat(lower.strip("'")),
+                upper=datetime.fromisoformat(upper),
+            )
+        )
+
+    return sorted(partitions, key=lambda p: p.lower or datetime.min)
+
+
+def _align(moment: datetime) -> datetime:
+    """Round down to a partition boundary (a multiple of the width in days)."""
+    day = moment.date().toordinal()
+    return datetime.fromordinal(day - day % settings.TIMELINE_PARTITION_DAYS)
+
+
+def _create_partition(
+    db: Session, name: str, lower: datetime, upper: datetime, has_default: bool
+) -> int:
+    """
+    Create the partition [lower, upper), moving in any rows the default
+    partition caught for that range. Returns the number moved.
+
+    Postgres refuses the CREATE while the default holds rows of the new
+    range, so the default is detached around the move; the lock this
+    takes on the parent is held only on that path.
+    """
+    bound = f"FOR VALUES FROM ('{lower.isoformat(sep=' ')}') TO ('{upper.isoformat(sep=' ')}')"
+    window = {"lower": lower, "upper": upper}
+    in_window = "created_at >= :lower AND created_at < :upper"
+
+    stray = has_default and db.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_window})"),
+        window,
+    ).scalar()
+    if not stray:
+        db.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT_TABLE} {bound}"))
+        return 0
+
+    db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}"))
+    db.execute(text(f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} {bound}"))
+    moved = db.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE {in_window} RETURNING *) "
+            f"INSERT INTO {PARENT_TABLE} SELECT * FROM moved"
+        ),
+        window,
+    ).rowcount
+    db.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+    return moved
+
+
+def ensure_partitions(db: Session, days_ahead: Optional[int] = None) -> list[str]:
+    """
+    Create partitions covering now through `days_ahead` days from now.
+
+    Runs on startup and then periodically from `run_partition_maintenance`.
+    Events the default partition caught while this fell behind are moved
+    into the partitions created for them, so that range is covered too.
+    Returns the names of new partitions.
+    """
+    if not is_partitioned(db):
+        return []
+
+    if days_ahead is None:
+        days_ahead = settings.TIMELINE_PARTITIONS_AHEAD
+
+    width = timedelta(days=settings.TIMELINE_PARTITION_DAYS)
+    horizon = _utcnow() + timedelta(days=days_ahead)
+
+    # Range partitions are contiguous from MINVALUE, so the default only
+    # holds rows past the last of them
+    has_default = db.execute(
+        text("SELECT to_regclass(:name) IS NOT NULL"), {"name": DEFAULT_PARTITION}
+    ).scalar()
+    if has_default:
+        latest = db.execute(text(f"SELECT max(created_at) FROM {DEFAULT_PARTITION}")).scalar()
+        if latest is not None:
+            horizon = max(horizon, latest)
+
+    lower = max(
+        (p.upper for p in list_partitions(db)),
+        default=_align(_utcnow()),
+    )
+
+    created = []
+    while lower <= horizon:
+        upper = lower + width
+        name = f"{PARENT_TABLE}_p{lower:%Y%m%d}"
+        moved = _create_partition(db, name, lower, upper, has_default)
+        if moved:
+            logger.warning("Moved %d event(s) from %s into %s", moved, DEFAULT_PARTITION, name)
+        created.append(name)
+        lower = upper
+
+    db.commit()
+    return created
+
+
+async def run_partition_maintenance(interval: float = 6 * 3600) -> None:
+    """Background task: keep future partitions created while the app runs."""
+    while True:
+        db = SchedulerSessionLocal()
+        try:
+            created = await asyncio.to_thread(ensure_partitions, db)
+            if created:
+                logger.info("Created timeline partitions: %s", ", ".join(created))
+        except Exception:
+            logger.exception("Timeline partition maintenance failed")
+        finally:
+            db.close()
+
+        await asyncio.sleep(interval)
+
+
+# ── Archival ────────────────────────────────────────
+
+
+def _archive_dir() -> str:
+    return settings.TIMELINE_ARCHIVE_DIR
+
+
+def _has_active_runs(db: Session, partition: str) -> bool:
+    """True if any event in the partition belongs to a run that has not finished."""
+    events = table(partition, column("run_id"))
+    return (
+        db.execute(
+            select(literal(1))
+            .select_from(events.join(WorkflowRun, WorkflowRun.id == events.c.run_id))
+            .where(WorkflowRun.state.not_in(TERMINAL_RUN_STATES))
+            .limit(1)
+        ).first()
+        is not None
+    )
+
+
+def _partition_events(db: Session, partition: str) -> Iterator[TimelineEvent]:
+    """Stream a partition's events ordered by run then id."""
+    columns = list(TimelineEvent.__table__.columns)
+    statement = text(
+        f"SELECT {', '.join(c.name for c in columns)} "
+        f"FROM {partition} ORDER BY run_id, id"
+    ).columns(*columns)
+
+    return db.scalars(
+        select(TimelineEvent).from_statement(statement),
+        execution_options={"yield_per": 1000},
+    )
+
+
+def write_segment(path: str, events: Iterator[TimelineEvent]) -> list[dict]:
+    """
+    Write events (ordered by run, then id) to a new segment file.
+
+    Each run becomes one zlib block of newline-separated JSON lines. The
+    file is written to a temporary name and renamed into place, and is
+    never modified afterwards. Returns one offset-index entry per block.
+    """
+    segment = os.path.basename(path)
+    entries = []
+    tmp_path = f"{path}.tmp"
+
+    with open(tmp_path, "wb") as f:
+        for run_id, run_events in groupby(events, key=lambda e: e.run_id):
+            offset = f.tell()
+            compressor = zlib.compressobj()
+            first_id = last_id = None
+            count = 0
+
+            for event in run_events:
+                if count:
+                    f.write(compressor.compress(b"\n"))
+                f.write(compressor.compress(json_line(event.id, event.frame_payload())))
+                first_id = first_id or event.id
+                last_id = event.id
+                count += 1
+
+            f.write(compressor.flush())
+            entries.append(
+                {
+                    "run_id": run_id,
+                    "segment": segment,
+                    "offset": offset,
+                    "length": f.tell() - offset,
+                    "first_event_id": first_id,
+                    "last_event_id": last_id,
+                    "event_count": count,
+                }
+            )
+
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp_path, path)
+    return entries
+
+
+def archive_partition(db: Session, partition: Partition) -> int:
+    """
+    Move one partition's events into a segment file and drop the partition.
+
+    The offset index and the DETACH/DROP commit in one transaction. If a
+    previous attempt died after writing the segment, the segment is
+    rewritten and its stale index rows are replaced, so re-running is
+    safe. Returns the number of archived events.
+    """
+    os.makedirs(_archive_dir(), exist_ok=True)
+    path = os.path.join(_archive_dir(), f"{partition.name}.seg")
+
+    entries = write_segment(path, _partition_events(db, partition.name))
+
+    db.execute(delete(TimelineArchive).where(TimelineArchive.segment == os.path.basename(path)))
+    if entries:
+        db.execute(insert(TimelineArchive), entries)
+    db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {partition.name}"))
+    db.execute(text(f"DROP TABLE {partition.name}"))
+    db.commit()
+
+    return sum(e["event_count"] for e in entries)
+
+
+def archive_partitions(db: Session, older_than_days: Optional[int] = None) -> list[str]:
+    """
+    Archive every partition that ended more than `older_than_days` ago.
+
+    A partition is skipped while any of its runs is still active; it is
+    picked up on a later pass once they finish. Returns archived names.
+    """
+    if not is_partitioned(db):
+        return []
+
+    if older_than_days is None:
+        older_than_days = settings.TIMELINE_ARCHIVE_AFTER_DAYS
+
+    cutoff = _utcnow() - timedelta(days=older_than_days)
+    archived = []
+
+    for partition in list_partitions(db):
+        if partition.upper > cutoff:
+            continue
+        if _has_active_runs(db, partition.name):
+            logger.info("Skipping %s: it still holds events of active runs", partition.name)
+            continue
+
+        count = archive_partition(db, partition)
+        logger.info("Archived %s (%d events)", partition.name, count)
+        archived.append(partition.name)
+
+    return archived
+
+
+# ── Compaction ──────────────────────────────────────
+
+
+def _next_segment(segment: str) -> str:
+    """Name of the next generation of a segment file."""
+    match = _SEGMENT_RE.match(segment)
+    generation = int(match["generation"] or 1) + 1
+    return f"{match['stem']}.g{generation}.seg"
+
+
+def compact_segments(db: Session, run_ids: list[int]) -> list[str]:
+    """
+    Rewrite the segment files holding the runs' blocks without them.
+
+    Each affected segment's other blocks are copied, still compressed,
+    into a new generation of the file, and their index rows are
+    repointed at it; a segment left with no blocks gets no new file.
+    Segments are never modified in place, so a reader holding the old
+    index rows reads the old file until it is unlinked. Neither the runs' index rows
+    nor anything else is deleted or committed here: the caller deletes
+    the rows, commits, then unlinks the returned superseded files
+    (whatever is left after a crash is removed by
+    `remove_orphan_segments`).
+    """
+    affected = select(TimelineArchive.segment).where(TimelineArchive.run_id.in_(run_ids))
+    archives = db.scalars(
+        select(TimelineArchive)
+        .where(TimelineArchive.segment.in_(affected))
+        .order_by(TimelineArchive.segment, TimelineArchive.offset)
+    ).all()
+
+    purged = set(run_ids)
+    superseded = []
+    for segment, blocks in groupby(archives, key=lambda archive: archive.segment):
+        path = os.path.join(_archive_dir(), segment)
+        superseded.append(path)
+        kept = [block for block in blocks if block.run_id not in purged]
+        if not kept:
+            continue
+
+        new_segment = _next_segment(segment)
+        new_path = os.path.join(_archive_dir(), new_segment)
+        tmp_path = f"{new_path}.tmp"
+        with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+            for block in kept:
+                src.seek(block.offset)
+                data = src.read(block.length)
+                block.segment, block.offset = new_segment, dst.tell()
+                dst.write(data)
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp_path, new_path)
+
+    return superseded
+
+
+def remove_orphan_segments(db: Session, min_age_seconds: float = 3600) -> list[str]:
+    """
+    Unlink segment files no index row points at.
+
+    These are files superseded by compaction, or written by an archive
+    or compaction whose transaction never committed. Files younger than
+    `min_age_seconds` are left alone: their transaction may still be
+    open. Returns the removed file names.
+    """
+    archive_dir = _archive_dir()
+    if not os.path.isdir(archive_dir):
+        return []
+
+    referenced = set(db.scalars(select(TimelineArchive.segment).distinct()))
+    cutoff = time.time() - min_age_seconds
+    removed = []
+    for name in os.listdir(archive_dir):
+        path = os.path.join(archive_dir, name)
+        if not name.endswith((".seg", ".seg.tmp")) or name in referenced:
+            continue
+        if os.path.getmtime(path) > cutoff:
+            continue
+        os.remove(path)
+        removed.append(name)
+    return removed
+
+
+# ── Reads ───────────────────────────────────────────
+
+
+def _read_block(archive: TimelineArchive) -> bytes:
+    path = os.path.join(_archive_dir(), archive.segment)
+    with open(path, "rb") as f:
+        f.seek(archive.offset)
+        return zlib.decompress(f.read(archive.length))
+
+
+def _archived_blocks(run_id: int, after: int):
+    """Statement for a run's archive blocks holding events with id > after."""
+    return (
+        select(TimelineArchive)
+        .where(
+            TimelineArchive.run_id == run_id,
+            TimelineArchive.last_event_id > after,
+        )
+        .order_by(TimelineArchive.first_event_id)
+    )
+
+
+def _block_lines(
+    block: bytes,
+    run_id: int,
+    after: int,
+    tag_run: bool,
+) -> Iterator[tuple[int, bytes]]:
+    for line in block.split(b"\n"):
+        # Lines always start with {"id":<n>,
+        comma = line.index(b",")
+        event_id = int(line[6:comma])
+        if event_id <= after:
+            continue
+        if tag_run:
+            line = b'{"id":%d,"run_id":%d,%s' % (event_id, run_id, line[comma + 1:])
+        yield event_id, line
+
+
+def _live_events(run_id: int, after: int, limit: Optional[int]):
+    """Statement for a run's not-yet-archived events with id > after."""
+    statement = (
+        select(TimelineEvent)
+        .where(
+            TimelineEvent.run_id == run_id,
+            TimelineEvent.id > after,
+        )
+        .order_by(TimelineEvent.id)
+    )
+    return statement if limit is None else statement.limit(limit)
+
+
+def iter_archived(
+    db: Session,
+    run_id: int,
+    after: int = 0,
+    tag_run: bool = False,
+) -> Iterator[tuple[int, bytes]]:
+    """Yield (event_id, json_line) for a run's archived events with id > after."""
+    for block in db.scalars(_archived_blocks(run_id, after)).all():
+        yield from _block_lines(_read_block(block), run_id, after, tag_run)
+
+
+def iter_timeline(
+    db: Session,
+    run_id: int,
+    after: int = 0,
+    limit: Optional[int] = None,
+    yield_per: Optional[int] = None,
+    tag_run: bool = False,
+) -> Iterator[tuple[int, bytes]]:
+    """
+    Yield (event_id, json_line) for a run's timeline with id > after.
+
+    Archived events come first (they are always older), then live rows.
+    Callers do not need to know which partitions have been archived.
+    With `tag_run` each line also carries the run id.
+    """
+    remaining = limit
+
+    for event_id, line in iter_archived(db, run_id, after, tag_run):
+        if remaining == 0:
+            return
+        yield event_id, line
+        after = event_id
+        if remaining is not None:
+            remaining -= 1
+
+    statement = _live_events(run_id, after, remaining)
+    if yield_per:
+        statement = statement.execution_options(yield_per=yield_per)
+
+    for event in db.scalars(statement):
+        yield event.id, json_line(event.id, event.frame_payload(), run_id if tag_run else None)
+
+
+async def aiter_archived(
+    db: AsyncSession,
+    run_id: int,
+    after: int = 0,
+    tag_run: bool = False,
+) -> AsyncIterator[tuple[int, bytes]]:
+    """`iter_archived` on an AsyncSession; segment reads run in a worker thread."""
+    for block in (await db.scalars(_archived_blocks(run_id, after))).all():
+        data = await asyncio.to_thread(_read_block, block)
+        for item in _block_lines(data, run_id, after, tag_run):
+            yield item
+
+
+async def aiter_timeline(
+    db: AsyncSession,
+    run_id: int,
+    after: int = 0,
+    limit: Optional[int] = None,
+    yield_per: Optional[int] = None,
+    tag_run: bool = False,
+) -> AsyncIterator[tuple[int, bytes]]:
+    """
+    `iter_timeline` on an AsyncSession.
+
+    With `yield_per` live rows come from a server-side cursor that many
+    at a time; otherwise they are fetched in one round trip.
+    """
+    remaining = limit
+
+    async for event_id, line in aiter_archived(db, run_id, after, tag_run):
+        if remaining == 0:
+            return
+        yield event_id, line
+        after = event_id
+        if remaining is not None:
+            remaining -= 1
+
+    statement = _live_events(run_id, after, remaining)
+    tag = run_id if tag_run else None
+
+    if not yield_per:
+        for event in (await db.scalars(statement)).all():
+            yield event.id, json_line(event.id, event.frame_payload(), tag)
+        return
+
+    async for event in await db.stream_scalars(
+        statement.execution_options(yield_per=yield_per)
+    ):
+        yield event.id, json_line(event.id, event.frame_payload(), tag)
@@ -0,0 +1,523 @@
+"""Timeline hub — one poll loop fanning timeline events out to all subscribers."""
+
+import asyncio
+import enum
+import logging
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from sqlalchemy import func, select
+
+from config import settings
+from db import StreamingSessionLocal
+from models.timeline_event import TimelineEvent, EventType
+from models.workflows import WorkflowRun
+from services.frames import SSECodec, msgpack_event, sse_frame
+from services.metrics import STREAMS_OPEN
+from services.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Events committed out of id order (concurrent writers) can land below
+# the high-water mark; this many ids below it are re-read each poll.
+LATE_COMMIT_WINDOW = 64
+# Max events fetched per poll
+POLL_BATCH_SIZE = 1000
+# Run owners remembered for user subscriptions before the cache is reset
+RUN_OWNER_CACHE_SIZE = 50_000
+# History re-read per query when a subscriber catches up
+CATCH_UP_PAGE_SIZE = 500
+
+
+@dataclass(slots=True)
+class HubEvent:
+    """A timeline event as delivered by the hub; frames are built once."""
+
+    id: int
+    run_id: int
+    event_type: EventType
+    payload: bytes
+    _sse: Optional[bytes] = None
+    _msgpack: Optional[bytes] = None
+
+    @property
+    def sse(self) -> bytes:
+        """SSE frame tagged with the run id, shared by every subscriber."""
+        if self._sse is None:
+            self._sse = sse_frame(self.id, self.payload, self.run_id)
+        return self._sse
+
+    @property
+    def msgpack(self) -> bytes:
+        """msgpack map tagged with the run id, shared by every WebSocket subscriber."""
+        if self._msgpack is None:
+            self._msgpack = msgpack_event(self.id, self.payload, self.run_id)
+        return self._msgpack
+
+    @classmethod
+    def from_row(cls, event: TimelineEvent) -> "HubEvent":
+        return cls(event.id, event.run_id, event.event_type, event.frame_payload())
+
+
+class OverflowPolicy(str, enum.Enum):
+    """What to do when a subscriber's queue is full."""
+
+    RESYNC = "resync"  # Drop queued events; the consumer re-reads them from the DB
+    SNAPSHOT = "snapshot"  # Drop queued events; send one snapshot of run states instead
+    DISCONNECT = "disconnect"  # Close the connection; the client reconnects with Last-Event-ID
+
+
+@dataclass(slots=True)
+class Overflow:
+    """Queued in place of dropped events to tell the consumer what happened."""
+
+    first_dropped_id: int
+    # Runs that had events dropped (for snapshots)
+    run_ids: set[int] = field(default_factory=set)
+
+
+@dataclass(eq=False)
+class Subscription:
+    """One connection's interest in a set of runs and/or a user's runs."""
+
+    run_ids: set[int] = field(default_factory=set)
+    user_id: Optional[int] = None
+    policy: OverflowPolicy = OverflowPolicy.RESYNC
+    max_queue: int = 1000
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    queue: asyncio.Queue = field(init=False)
+    # Set while the consumer has not yet handled an overflow
+    overflow: Optional[Overflow] = None
+
+    def __post_init__(self):
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+
+    def offer(self, event: HubEvent) -> bool:
+        """
+        Queue an event for delivery on this connection.
+
+        Returns True when this event overflowed the queue. The queue is
+        then emptied and replaced by one `Overflow` marker, so a slow
+        consumer never holds more than `max_queue` events.
+        """
+        if self.overflow is not None:
+            # Already overflowed; the consumer will recover these too
+            self.overflow.run_ids.add(event.run_id)
+            return False
+
+        try:
+            self.queue.put_nowait(event)
+            return False
+        except asyncio.QueueFull:
+            pass
+
+        dropped = [self.queue.get_nowait() for _ in range(self.queue.qsize())]
+        dropped.append(event)
+        self.overflow = Overflow(
+            first_dropped_id=min(e.id for e in dropped),
+            run_ids={e.run_id for e in dropped},
+        )
+        self.queue.put_nowait(self.overflow)
+        return True
+
+    async def next(self, timeout: float) -> Optional[HubEvent | Overflow]:
+        """Next queued item, or None if nothing arrived within `timeout`."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+async def snapshot_runs(run_ids) -> list[dict]:
+    """Current state and last event id of each run."""
+    async with StreamingSessionLocal() as db:
+        last_ids = (
+            select(TimelineEvent.run_id, func.max(TimelineEvent.id).label("last_id"))
+            .where(TimelineEvent.run_id.in_(run_ids))
+            .group_by(TimelineEvent.run_id)
+            .subquery()
+        )
+        rows = (
+            await db.execute(
+                select(WorkflowRun.id, WorkflowRun.state, last_ids.c.last_id)
+                .outerjoin(last_ids, last_ids.c.run_id == WorkflowRun.id)
+                .where(WorkflowRun.id.in_(run_ids))
+                .order_by(WorkflowRun.id)
+            )
+        ).all()
+        return [
+            {"run_id": run_id, "state": state.value, "last_event_id": last_id}
+            for run_id, state, last_id in rows
+        ]
+
+
+CatchUp = Callable[[int], Awaitable[list[tuple[int, bytes]]]]
+
+
+class SentIds:
+    """
+    Event ids one connection has been sent, to drop the hub's duplicates.
+
+    The hub re-delivers up to LATE_COMMIT_WINDOW ids below its tail, so
+    a late commit can arrive with an id below ones already sent; it is
+    sent unless its own id was. Ids that far below the highest sent are
+    beyond the hub's window and count as sent, as does everything up to
+    `floor`: the client's Last-Event-ID, or a snapshot that covered it.
+    """
+
+    __slots__ = ("floor", "high", "_recent")
+
+    def __init__(self, floor: int):
+        self.floor = floor
+        self.high = floor
+        self._recent: set[int] = set()
+
+    def __contains__(self, event_id: int) -> bool:
+        return (
+            event_id <= self.floor
+            or event_id <= self.high - LATE_COMMIT_WINDOW
+            or event_id in self._recent
+        )
+
+    def add(self, event_ids) -> None:
+        self._recent.update(event_ids)
+        self.high = max(self.high, max(self._recent, default=self.high))
+        self._recent = {i for i in self._recent if i > self.high - LATE_COMMIT_WINDOW}
+
+    def cover(self, event_id: int) -> None:
+        """Count everything up to `event_id` as sent."""
+        self.floor = max(self.floor, event_id)
+        self.high = max(self.high, event_id)
+
+
+async def _replay(
+    catch_up: CatchUp,
+    cursor: int,
+    codec: SSECodec,
+    sent: SentIds,
+) -> AsyncIterator[bytes]:
+    """Yield a chunk for each batch of history after `cursor` not yet in `sent`."""
+    max_batch = settings.STREAM_BATCH_MAX_EVENTS
+    while True:
+        with tracer.span("stream.catch_up", after=cursor):
+            page = await catch_up(cursor)
+        unsent = [(i, line) for i, line in page if i not in sent]
+        for start in range(0, len(unsent), max_batch):
+            batch = unsent[start:start + max_batch]
+            sent.add(i for i, _ in batch)
+            started = time.perf_counter()
+            yield codec.batch([codec.line(i, line) for i, line in batch])
+            tracer.record(
+                "stream.deliver",
+                started,
+                transport=codec.transport,
+                events=len(batch),
+                replay=True,
+            )
+        if len(page) < CATCH_UP_PAGE_SIZE:
+            return
+        cursor = page[-1][0]
+
+
+async def stream_frames(
+    sub: Subscription,
+    cursor: int,
+    catch_up: CatchUp,
+    codec: Optional[SSECodec] = None,
+    until: Optional[Callable[[Optional[HubEvent]], Awaitable[bool]]] = None,
+    replay: bool = True,
+) -> AsyncIterator[bytes]:
+    """
+    Yield a subscription's frames: history, then live events.
+
+    `await catch_up(after)` returns one page of (event_id, json_line)
+    from the DB. With `replay`, history after `cursor` is sent first.
+    Events already queued together
+    (usually one hub poll) go out as one chunk of up to
+    `STREAM_BATCH_MAX_EVENTS`, encoded by `codec` (SSE by default).
+    Live events are sent unless their own id was (see `SentIds`), so a
+    late commit below the highest id sent still goes out.
+
+    Stops after an event for which `await until(event)` is true.
+    `until(None)` is awaited after replaying history, since the deciding
+    event may have been replayed or summarized rather than queued.
+
+    Each chunk is traced as a `stream.deliver` span lasting until the
+    consumer asks for the next one, i.e. while it is written out.
+    """
+    codec = codec or SSECodec()
+    heartbeat = settings.STREAM_HEARTBEAT_SECONDS
+    max_batch = settings.STREAM_BATCH_MAX_EVENTS
+
+    sent = SentIds(cursor)
+
+    open_streams = STREAMS_OPEN.labels(codec.transport)
+    open_streams.inc()
+    try:
+        if replay:
+            async for chunk in _replay(catch_up, cursor, codec, sent):
+                yield chunk
+            if until is not None and await until(None):
+                return
+
+        while True:
+            item = await sub.next(heartbeat)
+
+            if item is None:
+                yield codec.batch([codec.heartbeat()])
+                continue
+
+            items = [item]
+            while len(items) < max_batch and not sub.queue.empty():
+                items.append(sub.queue.get_nowait())
+
+            # An overflow marker is always the last thing queued
+            overflow = items.pop() if isinstance(items[-1], Overflow) else None
+
+            frames = []
+            finished = False
+            for event in items:
+                if event.id in sent:
+                    continue  # Sent during catch-up, or re-delivered by the hub
+                frames.append(codec.event(event))
+                sent.add((event.id,))
+                if until is not None and await until(event):
+                    finished = True
+                    break
+
+            if frames:
+                started = time.perf_counter()
+                yield codec.batch(frames)
+                if tracer.enabled:
+                    run_ids = {event.run_id for event in items}
+                    tracer.record(
+                        "stream.deliver",
+                        started,
+                        run_id=run_ids.pop() if len(run_ids) == 1 else None,
+                        transport=codec.transport,
+                        events=len(frames),
+                    )
+            if finished:
+                return
+            if overflow is None:
+                continue
+
+            sub.overflow = None
+
+            if sub.policy == OverflowPolicy.DISCONNECT:
+                yield codec.batch([codec.message({
+                    "event": "overflow",
+                    "message": "Client too slow; reconnect with Last-Event-ID",
+                    "last_event_id": sent.high,
+                })])
+                return
+
+            if sub.policy == OverflowPolicy.SNAPSHOT:
+                runs = await snapshot_runs(overflow.run_ids | sub.run_ids)
+                yield codec.batch([codec.message({"event": "snapshot", "runs": runs})])
+                # Events up to the snapshot are covered by it
+                sent.cover(max((r["last_event_id"] or 0 for r in runs), default=0))
+            else:
+                # RESYNC: re-read what was dropped from the DB at the client's
+                # pace, from below the first dropped event that was not sent
+                after = overflow.first_dropped_id - 1
+                if sent.high:
+                    after = min(after, sent.high)
+                async for chunk in _replay(catch_up, after, codec, sent):
+                    yield chunk
+
+            if until is not None and await until(None):
+                return
+    finally:
+        open_streams.dec()
+
+
+class TimelineHub:
+    """
+    Polls timeline_events once for the whole process and routes new
+    events to subscriptions by run id or by run owner.
+
+    Connections no longer run their own poll loop or hold a DB session:
+    each poll is one `id > high-water mark` query regardless of how many
+    runs or connections are being watched.
+    """
+
+    def __init__(
+        self,
+        session_factory=StreamingSessionLocal,
+        poll_interval: Optional[float] = None,
+    ):
+        self.session_factory = session_factory
+        self.poll_interval = (
+            poll_interval
+            if poll_interval is not None
+            else settings.STREAM_POLL_INTERVAL_MS / 1000
+        )
+
+        self.subscriptions: dict[str, Subscription] = {}
+        self._by_run: dict[int, set[Subscription]] = {}
+        self._by_user: dict[int, set[Subscription]] = {}
+        # run id -> owner, for routing to user subscriptions
+        self._run_owner: dict[int, int] = {}
+
+        self._last_id: Optional[int] = None
+        self._recent: set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+        # Overflows per policy since startup
+        self.overflows: Counter = Counter()
+
+    # ── Subscriptions ───────────────────────────────
+
+    def subscribe(
+        self,
+        run_ids=(),
+        user_id: Optional[int] = None,
+        policy: Optional[OverflowPolicy] = None,
+    ) -> Subscription:
+        """Register a subscription and make sure the poll loop is running."""
+        sub = Subscription(
+            user_id=user_id,
+            policy=OverflowPolicy(policy or settings.STREAM_OVERFLOW_POLICY),
+            max_queue=settings.STREAM_QUEUE_MAX_EVENTS,
+        )
+        self.subscriptions[sub.id] = sub
+        self.add_runs(sub, run_ids)
+        if user_id is not None:
+            self._by_user.setdefault(user_id, set()).add(sub)
+
+        self.start()
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        self.subscriptions.pop(sub.id, None)
+        self.remove_runs(sub, list(sub.run_ids))
+        if sub.user_id is not None:
+            subs = self._by_user.get(sub.user_id, set())
+            subs.discard(sub)
+            if not subs:
+                self._by_user.pop(sub.user_id, None)
+
+        if not self.subscriptions:
+            # Nobody is listening: re-tail on the next subscription rather
+            # than page through, and dispatch, what is written meanwhile
+            self._last_id = None
+            self._recent = set()
+
+    def add_runs(self, sub: Subscription, run_ids) -> None:
+        for run_id in run_ids:
+            sub.run_ids.add(run_id)
+            self._by_run.setdefault(run_id, set()).add(sub)
+
+    def remove_runs(self, sub: Subscription, run_ids) -> None:
+        for run_id in run_ids:
+            sub.run_ids.discard(run_id)
+            subs = self._by_run.get(run_id, set())
+            subs.discard(sub)
+            if not subs:
+                self._by_run.pop(run_id, None)
+
+    # ── Polling ─────────────────────────────────────
+
+    def start(self) -> None:
+        """Start the poll loop on the running event loop (idempotent)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if self.subscriptions:
+                    events = await self._fetch()
+                    self._dispatch(events)
+            except Exception:
+                logger.exception("Timeline hub poll failed")
+
+            await asyncio.sleep(self.poll_interval)
+
+    async def _fetch(self) -> list[HubEvent]:
+        """Read events committed since the last poll."""
+        async with self.session_factory() as db:
+            if self._last_id is None:
+                # Start at the current tail; history is served by catch-up
+                self._last_id = await db.scalar(select(func.max(TimelineEvent.id))) or 0
+                return []
+
+            rows = (
+                await db.scalars(
+                    select(TimelineEvent)
+                    .where(TimelineEvent.id > self._last_id - LATE_COMMIT_WINDOW)
+                    .order_by(TimelineEvent.id)
+                    .limit(POLL_BATCH_SIZE)
+                )
+            ).all()
+            events = [HubEvent.from_row(row) for row in rows if row.id not in self._recent]
+
+            # Learn owners of unseen runs in one query, for user subscriptions
+            unknown = {e.run_id for e in events} - self._run_owner.keys()
+            if unknown and self._by_user:
+                if len(self._run_owner) > RUN_OWNER_CACHE_SIZE:
+                    self._run_owner.clear()
+                self._run_owner.update(
+                    (
+                        await db.execute(
+                            select(WorkflowRun.id, WorkflowRun.user_id)
+                            .where(WorkflowRun.id.in_(unknown))
+                        )
+                    ).all()
+                )
+
+            if self._last_id is None:
+                # The last subscription left during the poll; re-tail next time
+                return []
+
+            if rows:
+                self._last_id = max(self._last_id, rows[-1].id)
+            self._recent.update(e.id for e in events)
+            self._recent = {i for i in self._recent if i > self._last_id - LATE_COMMIT_WINDOW}
+
+            return events
+
+    def _dispatch(self, events: list[HubEvent]) -> None:
+        for event in events:
+            targets = set(self._by_run.get(event.run_id, ()))
+            owner = self._run_owner.get(event.run_id)
+            if owner is not None:
+                targets.update(self._by_user.get(owner, ()))
+
+            for sub in targets:
+                if sub.offer(event):
+                    self.overflows[sub.policy.value] += 1
+                    logger.warning(
+                        "Subscription %s overflowed (%s)", sub.id, sub.policy.value
+                    )
+
+    @property
+    def last_id(self) -> Optional[int]:
+        """Highest event id the hub has seen (None before the first poll)."""
+        return self._last_id
+
+    def stats(self) -> dict:
+        return {
+            "subscriptions": len(self.subscriptions),
+            "watched_runs": len(self._by_run),
+            "watched_users": len(self._by_user),
+            "last_event_id": self._last_id,
+            "queued_events": sum(sub.queue.qsize() for sub in self.subscriptions.values()),
+            "overflows": dict(self.overflows),
+        }
+
+
+# Process-wide hub shared by all streaming endpoints
+timeline_hub = TimelineHub()
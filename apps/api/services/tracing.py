@@ -0,0 +1,368 @@
+"""Tracing — spans of the submit, schedule, execute and stream paths."""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Iterable, Optional
+
+from config import settings
+
+
+@dataclass(slots=True)
+class Span:
+    """One timed operation. A trace's spans form a tree through `parent_id`."""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float  # Unix time
+    duration: float = 0.0  # Seconds
+    run_id: Optional[int] = None
+    attrs: dict = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Span":
+        return cls(**data)
+
+
+# The innermost open span of this thread or task
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+# Passed as `parent` to mean "whatever span is current"
+_CURRENT = object()
+
+
+class MemoryExporter:
+    """Keeps the newest `max_spans` finished spans in memory."""
+
+    def __init__(self, max_spans: Optional[int] = None):
+        self._spans: deque[Span] = deque(maxlen=max_spans or settings.TRACING_MEMORY_MAX_SPANS)
+
+    def export(self, span: Span) -> None:
+        self._spans.append(span)
+
+    def spans(self) -> list[Span]:
+        return list(self._spans)
+
+    def clear(self) -> None:
+        self._spans.clear()
+
+    def close(self) -> None:
+        pass
+
+
+class FileExporter:
+    """
+    Appends finished spans to `path` as JSON lines.
+
+    Writes go through the file's buffer; `close()` (on shutdown) flushes
+    it, so a running process's newest spans may not be on disk yet.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.TRACING_FILE
+        self._file = None
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class _SpanScope:
+    """Makes a span current for a `with` block and exports it on exit."""
+
+    __slots__ = ("tracer", "span", "_token", "_started")
+
+    def __init__(self, tracer: "Tracer", span: Span):
+        self.tracer = tracer
+        self.span = span
+
+    def __enter__(self) -> Span:
+        self._token = _current_span.set(self.span)
+        self._started = time.perf_counter()
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.span.duration = time.perf_counter() - self._started
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.span.error = exc_type.__name__
+        self.tracer.export(self.span)
+        return False
+
+
+class _NoopScope:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+_NOOP = _NoopScope()
+
+
+class Tracer:
+    """
+    Creates spans and hands finished ones to an exporter.
+
+    A span's parent is the span current in its context, so spans nest
+    across calls, and across `await` and the threadpool, without being
+    passed around. Work handed to another thread carries `current()`
+    along and passes it as `parent` (see `RunDispatcher.wake`). A span
+    without a `run_id` inherits its parent's.
+
+    With no exporter (`TRACING_EXPORTER=none`) `span()` returns a shared
+    no-op and nothing is recorded.
+    """
+
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def configure(self, exporter) -> None:
+        """Replace the exporter (None disables tracing), closing the old one."""
+        previous, self.exporter = self.exporter, exporter
+        if previous is not None:
+            previous.close()
+
+    def span(self, name: str, run_id: Optional[int] = None, parent=_CURRENT, **attrs):
+        """A `with` block timed as a child of `parent` (default: the current span)."""
+        if self.exporter is None:
+            return _NOOP
+        return _SpanScope(self, self._new_span(name, run_id, parent, attrs))
+
+    def traced(self, name: str):
+        """Decorator: time every call of the function as a span named `name`."""
+
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorate
+
+    def record(self, name: str, started: float, run_id: Optional[int] = None, **attrs) -> None:
+        """
+        Record a span that ran from `started` (`time.perf_counter()`) until now.
+
+        For work that cannot be a `with` block, such as a stream's frame
+        from `yield` to resumption; the span never becomes current.
+        """
+        if self.exporter is None:
+            return
+
+        span = self._new_span(name, run_id, _CURRENT, attrs)
+        span.duration = time.perf_counter() - started
+        span.start -= span.duration
+        self.export(span)
+
+    @staticmethod
+    def annotate(run_id: Optional[int] = None, **attrs) -> None:
+        """Add attributes (or the run id) to the current span, if any."""
+        span = _current_span.get()
+        if span is None:
+            return
+        if run_id is not None:
+            span.run_id = run_id
+        span.attrs.update(attrs)
+
+    @staticmethod
+    def current() -> Optional[Span]:
+        """The current span, to carry into work done on another thread."""
+        return _current_span.get()
+
+    def export(self, span: Span) -> None:
+        exporter = self.exporter
+        if exporter is not None:
+            exporter.export(span)
+
+    def close(self) -> None:
+        if self.exporter is not None:
+            self.exporter.close()
+
+    @staticmethod
+    def _new_span(name: str, run_id: Optional[int], parent, attrs: dict) -> Span:
+        if parent is _CURRENT:
+            parent = _current_span.get()
+        if parent is None:
+            trace_id, parent_id = os.urandom(16).hex(), None
+        else:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+            if run_id is None:
+                run_id = parent.run_id
+        span_id = os.urandom(8).hex()
+        return Span(name, trace_id, span_id, parent_id, time.time(), run_id=run_id, attrs=attrs)
+
+
+def make_exporter(kind: Optional[str] = None):
+    """The exporter named by `TRACING_EXPORTER` ("none", "memory" or "file")."""
+    kind = kind or settings.TRACING_EXPORTER
+    if kind == "memory":
+        return MemoryExporter()
+    if kind == "file":
+        return FileExporter()
+    return None
+
+
+# Process-wide tracer; every instrumented service records through it
+tracer = Tracer(make_exporter())
+
+
+class TracingMiddleware:
+    """
+    Opens a root span per HTTP request, named after its route template.
+
+    Spans of the endpoint, its threadpool work and a streaming body are
+    its children. Requests to `/{workflow_id}` routes are tagged with
+    that run.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        with tracer.span("http") as span:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                # Set on the scope by the router once a route matched
+                route = getattr(scope.get("route"), "path", "unmatched")
+                span.name = f"{scope['method']} {route}"
+                span.attrs["status"] = status
+                workflow_id = scope.get("path_params", {}).get("workflow_id")
+                if workflow_id is not None and span.run_id is None:
+                    span.run_id = int(workflow_id)
+
+
+# ── Offline analysis ────────────────────────────────
+
+
+def load_spans(path: Optional[str] = None) -> list[Span]:
+    """Read the spans written by a `FileExporter`."""
+    with open(path or settings.TRACING_FILE, encoding="utf-8") as f:
+        return [Span.from_dict(json.loads(line)) for line in f if line.strip()]
+
+
+def run_spans(spans: Iterable[Span], run_id: int) -> list[Span]:
+    """
+    Every span of the traces that touched a run, oldest first.
+
+    Whole traces are kept, so the submit request, its planning and the
+    dispatcher drives it led to come along even where a span itself
+    carries no run id.
+    """
+    spans = list(spans)
+    traces = {span.trace_id for span in spans if span.run_id == run_id}
+    return sorted((span for span in spans if span.trace_id in traces), key=lambda span: span.start)
+
+
+def _children(spans: list[Span]) -> dict[Optional[str], list[Span]]:
+    """Spans by parent id; spans whose parent is missing count as roots (None)."""
+    ids = {span.span_id for span in spans}
+    children: dict[Optional[str], list[Span]] = {}
+    for span in sorted(spans, key=lambda span: span.start):
+        parent = span.parent_id if span.parent_id in ids else None
+        children.setdefault(parent, []).append(span)
+    return children
+
+
+def format_tree(spans: list[Span]) -> list[str]:
+    """
+    One line per span, indented under its parent, with its offset from the
+    trace's start and its duration in milliseconds.
+
+    A drive started by a request outlives it: its offset and duration
+    are its own, not clipped to the parent's.
+    """
+    children = _children(spans)
+    lines: list[str] = []
+
+    def walk(span: Span, depth: int, origin: float) -> None:
+        attrs = " ".join(f"{key}={value}" for key, value in span.attrs.items())
+        error = f" error={span.error}" if span.error else ""
+        lines.append(
+            f"{(span.start - origin) * 1000:>+10.2f} {span.duration * 1000:>10.2f}ms  "
+            f"{'  ' * depth}{span.name}  {attrs}{error}".rstrip()
+        )
+        for child in children.get(span.span_id, []):
+            walk(child, depth + 1, origin)
+
+    for root in children.get(None, []):
+        walk(root, 0, root.start)
+    return lines
+
+
+def folded_stacks(spans: list[Span]) -> dict[str, int]:
+    """
+    Self time per call stack in microseconds, for flame graphs.
+
+    Written as `stack value` lines, this is the "folded" format read by
+    flamegraph.pl and speedscope. A span's self time is its duration less
+    its children's, floored at zero.
+    """
+    children = _children(spans)
+    stacks: dict[str, int] = {}
+
+    def walk(span: Span, prefix: str) -> None:
+        stack = f"{prefix};{span.name}" if prefix else span.name
+        kids = children.get(span.span_id, [])
+        own = max(span.duration - sum(child.duration for child in kids), 0.0)
+        stacks[stack] = stacks.get(stack, 0) + round(own * 1_000_000)
+        for child in kids:
+            walk(child, stack)
+
+    for root in children.get(None, []):
+        walk(root, "")
+    return stacks
+
+
+def summarize(spans: list[Span]) -> list[dict]:
+    """Count and total milliseconds per span name, largest total first."""
+    totals: dict[str, dict] = {}
+    for span in spans:
+        entry = totals.setdefault(span.name, {"name": span.name, "count": 0, "total_ms": 0.0})
+        entry["count"] += 1
+        entry["total_ms"] += span.duration * 1000
+    return sorted(totals.values(), key=lambda entry: entry["total_ms"], reverse=True)
@@ -0,0 +1,102 @@
+"""
+Shared test fixtures.
+
+Tests run against TEST_DATABASE_URL when it is set (use a throwaway
+Postgres database: the schema is created and dropped), otherwise against
+a temporary SQLite file.
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+
+# Must be set before anything imports db.py, which builds engines on import
+os.environ["DATABASE_URL"] = os.environ.get(
+    "TEST_DATABASE_URL",
+    f"sqlite:///{tempfile.mkdtemp(prefix='life-os-tests-')}/test.db",
+)
+
+import pytest  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+
+import models  # noqa: E402,F401  (registers every table)
+from db import Base, count_queries, engine as db_engine  # noqa: E402
+from models.approvals import Approval, ApprovalStatus  # noqa: E402
+from models.users import User  # noqa: E402
+from services.dispatcher import drive_run  # noqa: E402
+from services.orchestrator import Orchestrator  # noqa: E402
+from services.timeline import timeline_writer  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def engine():
+    """Sync engine with the full schema created."""
+    Base.metadata.create_all(db_engine)
+    yield db_engine
+    Base.metadata.drop_all(db_engine)
+
+
+@pytest.fixture
+def user(engine):
+    """User 1; every row written during the test is deleted afterwards."""
+    with engine.begin() as conn:
+        conn.execute(
+            insert(User), [{"id": 1, "email": "tests@example.com", "hashed_password": "x"}]
+        )
+
+    yield 1
+
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+
+
+@pytest.fixture
+def park_run(engine, user):
+    """
+    Factory: submit a job-application run for user 1 and drive it until it
+    parks on its approval. Returns (run_id, approval_id).
+    """
+    def park() -> tuple[int, int]:
+        orchestrator = Orchestrator()
+        try:
+            run_id = orchestrator.create_workflow(user, "apply to backend jobs").id
+        finally:
+            orchestrator.close()
+        drive_run(run_id)
+        timeline_writer.flush()
+
+        with engine.connect() as conn:
+            approval_id = conn.scalar(
+                select(Approval.id).where(
+                    Approval.run_id == run_id, Approval.status == ApprovalStatus.REQUIRED
+                )
+            )
+        return run_id, approval_id
+
+    return park
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Fail the test if a block runs more SQL statements than its budget.
+
+        with query_budget(3):
+            client.get("/api/workflows/1/timeline")
+
+    Counts statements on every engine made in the test's context,
+    including requests sent through TestClient, but not those of
+    background threads. Budgets pin the shape of a code path: one that
+    starts querying per row blows through its budget.
+    """
+
+    @contextmanager
+    def budget(max_statements: int):
+        with count_queries() as counter:
+            yield counter
+        assert counter.statements <= max_statements, (
+            f"{counter.statements} statements, budget {max_statements}"
+        )
+
+    return budget
@@ -0,0 +1,203 @@
+"""Approval timers: what happens to an approval when its deadline passes."""
+
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import insert, select, update
+
+from config import settings
+from db import SessionLocal
+from models.approvals import Approval, ApprovalStatus
+from models.timeline_event import EventType, TimelineEvent
+from models.users import User
+from models.workflows import RunState, StepState, WorkflowRun, WorkflowStep
+from services import approval
+from services.approval import ApprovalService
+from services.approval_timers import ApprovalTimers, expire_approvals
+from services.dispatcher import drive_run
+from services.timeline import timeline_writer
+
+ESCALATION_TIMEOUT = 600
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@pytest.fixture
+def deputy(engine, user):
+    """User 2, who escalated approvals go to."""
+    with engine.begin() as conn:
+        conn.execute(
+            insert(User), [{"id": 2, "email": "deputy@example.com", "hashed_password": "x"}]
+        )
+    return 2
+
+
+@pytest.fixture
+def overdue(engine, park_run):
+    """Factory: a parked run whose approval's deadline, with `action`, has passed."""
+
+    def make(action: str, escalate_to=None) -> tuple[int, int]:
+        run_id, approval_id = park_run()
+        with engine.begin() as conn:
+            conn.execute(
+                update(Approval)
+                .where(Approval.id == approval_id)
+                .values(
+                    expires_at=utcnow() - timedelta(seconds=1),
+                    expiry_action=action,
+                    escalate_to=escalate_to,
+                )
+            )
+        return run_id, approval_id
+
+    return make
+
+
+def expire(approval_ids: list[int]) -> dict:
+    db = SessionLocal()
+    try:
+        return expire_approvals(db, approval_ids)
+    finally:
+        db.close()
+
+
+def last_event(db, run_id: int) -> TimelineEvent:
+    return db.scalars(
+        select(TimelineEvent)
+        .where(TimelineEvent.run_id == run_id)
+        .order_by(TimelineEvent.id.desc())
+    ).first()
+
+
+def test_reject_skips_the_step_and_the_run_carries_on(overdue):
+    run_id, approval_id = overdue("reject")
+
+    result = expire([approval_id])
+    assert result == {"rejected": 1, "escalated": 0, "canceled_runs": 0, "rearm": []}
+
+    db = SessionLocal()
+    try:
+        approval = db.get(Approval, approval_id)
+        assert approval.status == ApprovalStatus.REJECTED
+        assert db.get(WorkflowStep, approval.step_id).state == StepState.SKIPPED
+        event = last_event(db, run_id)
+        assert event.event_type == EventType.APPROVAL_REJECTED
+        assert event.message.startswith("Approval expired: ")
+    finally:
+        db.close()
+
+    drive_run(run_id)
+    timeline_writer.flush()
+    db = SessionLocal()
+    try:
+        assert db.get(WorkflowRun, run_id).state == RunState.COMPLETED
+    finally:
+        db.close()
+
+
+def test_escalate_reassigns_with_a_new_deadline(monkeypatch, overdue, deputy):
+    monkeypatch.setattr(settings, "APPROVAL_ESCALATION_TIMEOUT_SECONDS", ESCALATION_TIMEOUT)
+    run_id, approval_id = overdue("escalate", escalate_to=deputy)
+
+    result = expire([approval_id])
+    assert (result["rejected"], result["escalated"], result["canceled_runs"]) == (0, 1, 0)
+
+    db = SessionLocal()
+    try:
+        approval = db.get(Approval, approval_id)
+        assert approval.status == ApprovalStatus.REQUIRED
+        assert approval.approver_id == deputy
+        assert (approval.expiry_action, approval.escalate_to) == ("reject", None)
+        assert result["rearm"] == [(approval_id, approval.expires_at)]
+        assert approval.expires_at - utcnow() > timedelta(seconds=ESCALATION_TIMEOUT - 60)
+        event = last_event(db, run_id)
+        assert event.event_type == EventType.APPROVAL_REQUIRED
+        assert event.message.startswith(f"Approval escalated to user {deputy}: ")
+    finally:
+        db.close()
+
+    # Not due yet: left alone
+    assert expire([approval_id])["escalated"] == 0
+
+
+def test_escalate_without_a_target_rejects(overdue):
+    _, approval_id = overdue("escalate")
+    assert expire([approval_id])["rejected"] == 1
+
+
+def test_cancel_run_cancels_the_run(overdue):
+    run_id, approval_id = overdue("cancel_run")
+
+    result = expire([approval_id])
+    assert result == {"rejected": 0, "escalated": 0, "canceled_runs": 1, "rearm": []}
+
+    db = SessionLocal()
+    try:
+        assert db.get(WorkflowRun, run_id).state == RunState.CANCELED
+        assert db.get(Approval, approval_id).status == ApprovalStatus.REJECTED
+        states = db.scalars(select(WorkflowStep.state).where(WorkflowStep.run_id == run_id)).all()
+        assert StepState.BLOCKED not in states and StepState.PENDING not in states
+        events = db.scalars(
+            select(TimelineEvent.event_type)
+            .where(TimelineEvent.run_id == run_id)
+            .order_by(TimelineEvent.id)
+        ).all()
+        assert events[-2:] == [EventType.APPROVAL_REJECTED, EventType.WORKFLOW_COMPLETED]
+    finally:
+        db.close()
+
+
+def test_decided_approval_does_not_expire(overdue):
+    _, approval_id = overdue("cancel_run")
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(Approval)
+            .where(Approval.id == approval_id)
+            .values(status=ApprovalStatus.APPROVED)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+    assert expire([approval_id]) == {"rejected": 0, "escalated": 0, "canceled_runs": 0, "rearm": []}
+
+
+def test_timer_thread_releases_due_deadlines(overdue):
+    _, approval_id = overdue("reject")
+    timers = ApprovalTimers()
+    timers.start()
+    try:
+        # Loaded from the table on start
+        deadline = time.monotonic() + 5
+        while timers.released["rejected"] < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        timers.stop()
+
+    assert timers.stats() == {"armed": 0, "rejected": 1, "escalated": 0, "canceled_runs": 0}
+
+
+def test_decisions_disarm_their_timers(monkeypatch, park_run):
+    (_, approved), (_, rejected), (_, batched) = park_run(), park_run(), park_run()
+    timers = ApprovalTimers()
+    monkeypatch.setattr(approval, "approval_timers", timers)
+    timers.start()
+    try:
+        for approval_id in (approved, rejected, batched):
+            timers.arm(approval_id, utcnow() + timedelta(hours=1))
+        assert timers.stats()["armed"] == 3
+
+        service = ApprovalService()
+        try:
+            assert service.approve_step(approved, decided_by=1)["success"]
+            assert service.reject_step(rejected, decided_by=1)["success"]
+            service.decide_many([{"approval_id": batched, "decision": "approve"}], decided_by=1)
+        finally:
+            service.close()
+        assert timers.stats()["armed"] == 0
+    finally:
+        timers.stop()
@@ -0,0 +1,129 @@
+"""Approval decisions: single, batched, and the run they resume."""
+
+from sqlalchemy import select
+
+import pytest
+
+from db import SessionLocal
+from models.approvals import Approval, ApprovalStatus
+from models.timeline_event import EventType, TimelineEvent
+from models.workflows import RunState, StepState, WorkflowRun, WorkflowStep
+from services.approval import ApprovalService
+from services.dispatcher import drive_run
+from services.timeline import timeline_writer
+
+DECISION_EVENTS = (EventType.APPROVAL_APPROVED, EventType.APPROVAL_REJECTED)
+
+
+def decision_events(db, run_ids) -> list[tuple[int, EventType]]:
+    return db.execute(
+        select(TimelineEvent.run_id, TimelineEvent.event_type)
+        .where(TimelineEvent.run_id.in_(run_ids), TimelineEvent.event_type.in_(DECISION_EVENTS))
+        .order_by(TimelineEvent.id)
+    ).all()
+
+
+@pytest.mark.parametrize(
+    "decide, resumed",
+    [
+        (
+            "approve_step",
+            [
+                EventType.APPROVAL_APPROVED,
+                EventType.STEP_RUNNING,
+                EventType.STEP_SUCCEEDED,
+                EventType.WORKFLOW_COMPLETED,
+            ],
+        ),
+        ("reject_step", [EventType.APPROVAL_REJECTED, EventType.WORKFLOW_COMPLETED]),
+    ],
+)
+def test_parked_run_resumes_after_decision(park_run, decide, resumed):
+    run_id, approval_id = park_run()
+    service = ApprovalService()
+    try:
+        assert getattr(service, decide)(approval_id, decided_by=1)["success"]
+    finally:
+        service.close()
+
+    # What the dispatcher does when woken
+    drive_run(run_id)
+    timeline_writer.flush()
+
+    db = SessionLocal()
+    try:
+        assert db.get(WorkflowRun, run_id).state == RunState.COMPLETED
+        events = db.scalars(
+            select(TimelineEvent.event_type)
+            .where(TimelineEvent.run_id == run_id)
+            .order_by(TimelineEvent.id)
+        ).all()
+    finally:
+        db.close()
+
+    # In id order: the run's start first, and the decision ahead of
+    # everything the resumed run recorded
+    assert events[0] == EventType.WORKFLOW_STARTED
+    parked = events.index(EventType.APPROVAL_REQUIRED)
+    assert events[parked + 1:] == resumed
+
+
+def test_decide_many_applies_valid_items_and_reports_the_rest(park_run):
+    runs = [park_run() for _ in range(4)]
+    (approved_run, approved), (rejected_run, rejected), (decided_run, decided) = runs[:3]
+    invalid_run, invalid = runs[3]
+    service = ApprovalService()
+    try:
+        assert service.approve_step(decided, decided_by=1)["success"]
+
+        result = service.decide_many(
+            [
+                {"approval_id": approved, "decision": "approve"},
+                {"approval_id": 9999, "decision": "approve"},
+                {"approval_id": rejected, "decision": "reject", "reason": "not now"},
+                {"approval_id": approved, "decision": "reject"},
+                {"approval_id": decided, "decision": "reject"},
+                {"approval_id": invalid, "decision": "maybe"},
+            ],
+            decided_by=1,
+        )
+    finally:
+        service.close()
+
+    assert [(r["approval_id"], r["success"], r["message"]) for r in result["results"]] == [
+        (approved, True, "Step 'Submit job application' approved and ready to execute"),
+        (9999, False, "Approval not found"),
+        (rejected, True, "Step 'Submit job application' rejected and marked as skipped"),
+        (approved, False, "Duplicate decision for this approval"),
+        (decided, False, "Approval is not in REQUIRED state"),
+        (invalid, False, "Decision must be 'approve' or 'reject'"),
+    ]
+    assert [r["run_id"] for r in result["results"]] == [
+        approved_run, None, rejected_run, approved_run, decided_run, invalid_run
+    ]
+    assert result["run_ids"] == sorted([approved_run, rejected_run])
+
+    db = SessionLocal()
+    try:
+        states = {
+            approval.id: (approval.status, step.state)
+            for approval, step in db.execute(
+                select(Approval, WorkflowStep).join(
+                    WorkflowStep, WorkflowStep.id == Approval.step_id
+                )
+            )
+        }
+        assert states[approved] == (ApprovalStatus.APPROVED, StepState.READY)
+        assert states[rejected] == (ApprovalStatus.REJECTED, StepState.SKIPPED)
+        assert states[invalid][0] == ApprovalStatus.REQUIRED
+        assert db.get(Approval, rejected).reason == "not now"
+
+        # One event per applied decision; the earlier single decision's is first
+        assert decision_events(db, [run_id for run_id, _ in runs]) == [
+            (decided_run, EventType.APPROVAL_APPROVED),
+            (approved_run, EventType.APPROVAL_APPROVED),
+            (rejected_run, EventType.APPROVAL_REJECTED),
+        ]
+    finally:
+        db.close()
+
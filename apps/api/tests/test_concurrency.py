@@ -0,0 +1,96 @@
+"""Optimistic concurrency: a transition that loses a version race re-reads and retries."""
+
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import select
+from sqlalchemy.orm.exc import StaleDataError
+
+from config import settings
+from db import SessionLocal
+from models.approvals import Approval, ApprovalStatus
+from models.timeline_event import EventType, TimelineEvent
+from models.workflows import StepState, WorkflowStep
+from services.approval import ApprovalService
+from services.concurrency import TransitionConflict, with_retries
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "TRANSITION_RETRY_BACKOFF_MS", 0)
+
+
+def retries() -> float:
+    return REGISTRY.get_sample_value("lifeos_transition_retries_total")
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def test_retries_until_the_transition_succeeds(db):
+    calls = []
+
+    def transition():
+        calls.append(len(calls))
+        if len(calls) < settings.TRANSITION_MAX_ATTEMPTS:
+            raise StaleDataError("version moved")
+        return "done"
+
+    assert with_retries(db, transition) == "done"
+    assert len(calls) == settings.TRANSITION_MAX_ATTEMPTS
+
+
+def test_gives_up_after_max_attempts(db):
+    calls = []
+
+    def transition():
+        calls.append(len(calls))
+        raise StaleDataError("version moved")
+
+    with pytest.raises(TransitionConflict):
+        with_retries(db, transition)
+    assert len(calls) == settings.TRANSITION_MAX_ATTEMPTS
+
+
+def test_losing_decision_sees_the_winner(park_run):
+    run_id, approval_id = park_run()
+    loser, winner = ApprovalService(), ApprovalService()
+    try:
+        # The loser read the approval while it was still REQUIRED (and holds
+        # on to it: the session's identity map only keeps it while referenced) ...
+        stale = loser.db.get(Approval, approval_id)
+        assert stale.status == ApprovalStatus.REQUIRED
+
+        # ... and the winner decides first
+        assert winner.reject_step(approval_id, decided_by=1, reason="no")["success"]
+
+        # The loser's stale write conflicts; its retry re-reads and backs off
+        before = retries()
+        result = loser.approve_step(approval_id, decided_by=1)
+        assert result == {"success": False, "message": "Approval is not in REQUIRED state"}
+        assert retries() == before + 1
+    finally:
+        loser.close()
+        winner.close()
+
+    db = SessionLocal()
+    try:
+        approval = db.get(Approval, approval_id)
+        assert approval.status == ApprovalStatus.REJECTED
+        assert db.get(WorkflowStep, approval.step_id).state == StepState.SKIPPED
+
+        # Only the winner's event was written
+        decisions = db.scalars(
+            select(TimelineEvent.event_type).where(
+                TimelineEvent.run_id == run_id,
+                TimelineEvent.event_type.in_(
+                    [EventType.APPROVAL_APPROVED, EventType.APPROVAL_REJECTED]
+                ),
+            )
+        ).all()
+        assert decisions == [EventType.APPROVAL_REJECTED]
+    finally:
+        db.close()
@@ -0,0 +1,276 @@
+"""Engines and sessions: which engine serves what, pools, replicas and SQLite mode."""
+
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, exc, func, select, text
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+
+from config import settings
+from db import (
+    READ_YOUR_WRITES_COOKIE,
+    Base,
+    InstrumentedQueuePool,
+    PoolMetrics,
+    RoutingSession,
+    WriteGate,
+    engines,
+    is_sqlite_file,
+    sqlite_pragmas,
+    to_async_url,
+    wants_primary,
+)
+from main import app
+from models.users import User
+from services.http_cache import response_cache
+
+
+@pytest.fixture
+def client():
+    response_cache.clear()
+    yield TestClient(app)
+    response_cache.clear()
+
+
+@contextmanager
+def statements_by_role():
+    """Count the statements run on each engine role."""
+    counts = Counter()
+    listeners = []
+    for role, engine in engines.items():
+        def count(*args, role=role):
+            counts[role] += 1
+
+        event.listen(engine, "before_cursor_execute", count)
+        listeners.append((engine, count))
+    try:
+        yield counts
+    finally:
+        for engine, count in listeners:
+            event.remove(engine, "before_cursor_execute", count)
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/api/workflows/{run_id}/timeline",
+        "/api/approvals/workflow/{run_id}",
+        "/api/approvals/{approval_id}",
+        "/api/approvals/inbox?approver_id=1",
+    ],
+)
+def test_async_read_routes_use_the_async_engine(client, park_run, url):
+    run_id, approval_id = park_run()
+    with statements_by_role() as counts:
+        response = client.get(url.format(run_id=run_id, approval_id=approval_id))
+    assert response.status_code == 200
+    assert counts["api_async"] > 0
+    assert counts["api"] == 0
+
+
+@pytest.mark.parametrize(
+    "sync_url, async_url",
+    [
+        ("sqlite:////var/lib/life_os.db", "sqlite+aiosqlite:////var/lib/life_os.db"),
+        (
+            "postgresql+psycopg2://app:s3cret@db:5432/life_os",
+            "postgresql+asyncpg://app:s3cret@db:5432/life_os",
+        ),
+        ("postgresql://app@db/life_os", "postgresql+asyncpg://app@db/life_os"),
+    ],
+)
+def test_async_url_swaps_the_driver(sync_url, async_url):
+    assert to_async_url(sync_url) == async_url
+
+
+def test_pool_metrics_count_checkouts_and_timeouts():
+    engine = create_engine(
+        settings.DATABASE_URL,
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    engine.pool.metrics = metrics = PoolMetrics("test", capacity=1)
+    try:
+        with engine.connect():
+            snapshot = metrics.snapshot(engine.pool)
+            assert snapshot["checked_out"] == 1 and snapshot["saturation"] == 1.0
+
+            with pytest.raises(exc.TimeoutError):
+                engine.connect()
+
+        snapshot = metrics.snapshot(engine.pool)
+        assert snapshot["checked_out"] == 0
+        assert (snapshot["checkouts"], snapshot["timeouts"]) == (2, 1)
+        assert snapshot["wait_ms"]["max"] >= 50
+
+        # A disposed engine's new pool keeps counting into the same metrics
+        engine.dispose()
+        with engine.connect():
+            pass
+        assert engine.pool.metrics is metrics
+        assert metrics.checkouts == 3
+    finally:
+        engine.dispose()
+
+
+def test_health_reports_every_pool(client):
+    body = client.get("/health/db").json()
+    assert body["status"] == "ok"
+    assert {pool["role"] for pool in body["pools"]} == set(engines)
+    api = next(pool for pool in body["pools"] if pool["role"] == "api")
+    assert api["capacity"] == settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+    assert set(api["wait_ms"]) == {"avg", "p95", "max"}
+
+
+@pytest.fixture
+def replica(tmp_path):
+    """An empty database standing in for a replica that has not caught up."""
+    replica = create_engine(f"sqlite:///{tmp_path}/replica.db")
+    Base.metadata.create_all(replica)
+    yield replica
+    replica.dispose()
+
+
+def count_users(db) -> int:
+    return db.scalar(select(func.count()).select_from(User))
+
+
+def test_routing_session_reads_from_the_replica(engine, user, replica):
+    Session = sessionmaker(class_=RoutingSession, primary=engine, replica=replica)
+
+    with Session() as db:
+        assert count_users(db) == 0  # The replica
+
+        # Writes go to the primary
+        db.add(User(id=2, email="routed@example.com", hashed_password="x"))
+        db.commit()
+        assert count_users(db) == 0
+
+    with Session(info={"primary": True}) as db:
+        assert count_users(db) == 2
+
+    with sessionmaker(class_=RoutingSession, primary=engine, replica=None)() as db:
+        assert count_users(db) == 2
+
+
+def request_with(cookies: str = "") -> Request:
+    headers = [(b"cookie", cookies.encode())] if cookies else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def test_primary_is_wanted_only_with_the_cookie():
+    assert not wants_primary(request_with())
+    assert not wants_primary(request_with("other=1"))
+    assert wants_primary(request_with(f"{READ_YOUR_WRITES_COOKIE}=1"))
+
+
+def test_successful_writes_pin_reads_to_the_primary(monkeypatch, client, park_run):
+    _, approval_id = park_run()
+    decide = f"/api/approvals/{approval_id}/decision"
+    approve = {"decision": "approve", "decided_by": 1}
+
+    # Without a replica there is nothing to pin
+    assert "set-cookie" not in client.post(decide, json=approve).headers
+
+    monkeypatch.setattr(settings, "REPLICA_DATABASE_URL", "postgresql://replica/life_os")
+    _, approval_id = park_run()
+    decide = f"/api/approvals/{approval_id}/decision"
+
+    assert "set-cookie" not in client.get(f"/api/approvals/{approval_id}").headers
+    assert "set-cookie" not in client.post(decide, json={"decision": "approve"}).headers  # 422
+
+    cookie = client.post(decide, json=approve).headers["set-cookie"]
+    assert cookie.startswith(f"{READ_YOUR_WRITES_COOKIE}=1;")
+    assert f"Max-Age={settings.READ_YOUR_WRITES_SECONDS}" in cookie
+
+
+@pytest.mark.parametrize(
+    "url, embedded",
+    [
+        ("sqlite:////var/lib/lifeos/life_os.db", True),
+        ("sqlite:///life_os.db", True),
+        ("sqlite://", False),
+        ("sqlite:///:memory:", False),
+        ("postgresql://localhost/life_os", False),
+    ],
+)
+def test_embedded_mode_needs_a_database_file(url, embedded):
+    assert is_sqlite_file(url) is embedded
+
+
+def test_writers_use_wal_and_readers_cannot_write():
+    writer, reader = sqlite_pragmas(read_only=False), sqlite_pragmas(read_only=True)
+
+    assert writer[0] == "PRAGMA journal_mode = WAL"
+    assert "PRAGMA query_only = ON" not in writer
+    assert "PRAGMA query_only = ON" in reader
+    assert not any("journal_mode" in pragma for pragma in reader)
+    assert "PRAGMA foreign_keys = ON" in writer and "PRAGMA foreign_keys = ON" in reader
+
+
+@pytest.fixture
+def gated(tmp_path):
+    """
+    A file database behind its own write gate. SQLite itself does not wait
+    for its lock (timeout 0), so any queueing comes from the gate.
+    """
+    gate = WriteGate(timeout=5)
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/gated.db", connect_args={"timeout": 0, "check_same_thread": False}
+    )
+    gate.install(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE log (writer TEXT)"))
+    yield engine, gate
+    engine.dispose()
+
+
+def test_write_gate_is_held_from_the_first_write_until_checkin(gated):
+    engine, gate = gated
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT count(*) FROM log"))
+        assert not gate._lock.locked()  # Reads do not queue
+
+        conn.execute(text("INSERT INTO log VALUES ('a')"))
+        assert gate._lock.locked()
+        conn.commit()
+        assert gate._lock.locked()  # Until the connection goes back to the pool
+
+    assert not gate._lock.locked()
+
+
+def test_write_gate_queues_concurrent_writers(gated):
+    engine, _ = gated
+    order = []
+    first_wrote = threading.Event()
+
+    def first():
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO log VALUES ('first')"))
+            first_wrote.set()
+            time.sleep(0.2)
+            order.append("first committed")
+
+    def second():
+        first_wrote.wait()
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO log VALUES ('second')"))  # "locked" without the gate
+            order.append("second wrote")
+
+    threads = [threading.Thread(target=first), threading.Thread(target=second)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert order == ["first committed", "second wrote"]
+    with engine.connect() as conn:
+        assert conn.scalars(text("SELECT writer FROM log")).all() == ["first", "second"]
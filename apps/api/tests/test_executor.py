@@ -0,0 +1,119 @@
+"""Step claims and version-checked completion: a step is never executed or completed twice."""
+
+import pytest
+from sqlalchemy import select, update
+
+from config import settings
+from db import SessionLocal
+from models.timeline_event import EventType, TimelineEvent
+from models.tool_calls import ToolCall
+from models.workflows import StepState, WorkflowStep
+from services.executor import CONFLICT, Executor
+from services.orchestrator import Orchestrator
+from services.scheduler import Scheduler
+from services.timeline import timeline_writer
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "TRANSITION_RETRY_BACKOFF_MS", 0)
+
+
+@pytest.fixture
+def ready_step(engine, user):
+    """A fresh run scheduled for one round; returns the id of a READY step."""
+    orchestrator = Orchestrator()
+    try:
+        run_id = orchestrator.create_workflow(user, "apply to backend jobs").id
+    finally:
+        orchestrator.close()
+
+    scheduler = Scheduler()
+    try:
+        scheduler.schedule_round(run_id)
+    finally:
+        scheduler.close()
+
+    with engine.connect() as conn:
+        return conn.scalar(
+            select(WorkflowStep.id)
+            .where(WorkflowStep.run_id == run_id, WorkflowStep.state == StepState.READY)
+            .order_by(WorkflowStep.id)
+            .limit(1)
+        )
+
+
+def tool_calls(engine, step_id: int) -> int:
+    with engine.connect() as conn:
+        return len(conn.scalars(select(ToolCall.id).where(ToolCall.step_id == step_id)).all())
+
+
+def test_second_claim_fails(engine, ready_step):
+    first, second = Executor(), Executor()
+    try:
+        # Both workers read the step while it was READY
+        mine = first.db.get(WorkflowStep, ready_step)
+        theirs = second.db.get(WorkflowStep, ready_step)
+        assert mine.state == theirs.state == StepState.READY
+
+        assert first.claim_step(mine)
+        assert not second.claim_step(theirs)
+    finally:
+        first.close()
+        second.close()
+
+    timeline_writer.flush()
+    with engine.connect() as conn:
+        step = conn.execute(
+            select(WorkflowStep.state, WorkflowStep.attempt).where(WorkflowStep.id == ready_step)
+        ).one()
+        running = conn.scalars(
+            select(TimelineEvent.id).where(
+                TimelineEvent.step_id == ready_step,
+                TimelineEvent.event_type == EventType.STEP_RUNNING,
+            )
+        ).all()
+    assert step == (StepState.RUNNING, 1)
+    assert len(running) == 1
+
+
+def test_claimed_execution_of_a_claimed_step_is_refused(engine, ready_step):
+    first, second = Executor(), Executor()
+    try:
+        assert first.execute_step(ready_step, claim=True)["success"]
+        result = second.execute_step(ready_step, claim=True)
+    finally:
+        first.close()
+        second.close()
+
+    assert result == {"success": False, "result": None, "error": "Step is not ready"}
+    assert tool_calls(engine, ready_step) == 1
+
+
+def test_losing_completion_writes_nothing(engine, ready_step, monkeypatch):
+    def completed_elsewhere(step, args):
+        # Another worker finishes the step while this one runs the tool
+        with engine.begin() as conn:
+            conn.execute(
+                update(WorkflowStep)
+                .where(WorkflowStep.id == step.id)
+                .values(state=StepState.SUCCEEDED, version=WorkflowStep.version + 1)
+            )
+        return {"status": "completed"}
+
+    executor = Executor()
+    step = executor.db.get(WorkflowStep, ready_step)
+    monkeypatch.setitem(Executor.TOOL_EXECUTORS, step.tool, completed_elsewhere)
+    try:
+        result = executor.execute_step(ready_step, claim=True)
+    finally:
+        executor.close()
+
+    assert result == {"success": False, "result": None, "error": CONFLICT}
+    assert tool_calls(engine, ready_step) == 0
+
+    db = SessionLocal()
+    try:
+        assert db.get(WorkflowStep, ready_step).state == StepState.SUCCEEDED
+    finally:
+        db.close()
@@ -0,0 +1,58 @@
+"""Wire frames: event ids spliced into payloads serialized once at write time."""
+
+import json
+from datetime import datetime
+
+from models.timeline_event import EventType, TimelineEvent
+from services.frames import encode_payload, json_line, sse_frame
+from services.timeline import TimelineWriter
+
+CREATED_AT = datetime(2026, 2, 14, 10, 30, 0, 123456)
+
+
+def test_id_is_spliced_before_the_payload():
+    payload = encode_payload("step_ready", "Step ready: a", "2026-02-14T10:30:00", {"n": 1})
+
+    assert json.loads(json_line(42, payload)) == {
+        "id": 42,
+        "event": "step_ready",
+        "message": "Step ready: a",
+        "timestamp": "2026-02-14T10:30:00",
+        "metadata": {"n": 1},
+    }
+    assert json_line(42, payload, run_id=7).startswith(b'{"id":42,"run_id":7,"event":')
+
+
+def test_sse_frame_carries_the_id_twice():
+    payload = encode_payload("step_ready", "multi\nline", "t")
+    frame = sse_frame(9, payload)
+
+    head, data, end = frame.split(b"\n", 2)
+    assert head == b"id: 9"
+    assert json.loads(data.removeprefix(b"data: "))["message"] == "multi\nline"
+    assert end == b"\n"
+
+
+def test_row_without_a_payload_encodes_like_one_with():
+    row = TimelineWriter.build_row(
+        1, None, EventType.STEP_SUCCEEDED, "Step succeeded: a", {"result": [1, "x"]}
+    )
+    metadata = row.pop("metadata")
+    written = TimelineEvent(id=5, event_metadata=metadata, **row)
+    legacy = TimelineEvent(id=5, event_metadata=metadata, **{**row, "payload": None})
+
+    assert legacy.frame_payload() == written.frame_payload()
+    assert legacy.to_sse() == written.to_sse()
+
+
+def test_legacy_row_without_metadata():
+    event = TimelineEvent(
+        id=3, run_id=1, event_type=EventType.STEP_READY, message="m", created_at=CREATED_AT
+    )
+    assert json.loads(json_line(event.id, event.frame_payload())) == {
+        "id": 3,
+        "event": "step_ready",
+        "message": "m",
+        "timestamp": "2026-02-14T10:30:00.123456",
+        "metadata": {},
+    }
@@ -0,0 +1,80 @@
+"""Conditional polling: ETags change with what a run's reads return, and only then."""
+
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, insert, select
+
+from main import app
+from models.timeline_event import EventType, TimelineEvent
+from services.approval import ApprovalService
+from services.http_cache import response_cache
+
+
+@pytest.fixture
+def client():
+    """A client without the lifespan; the body cache starts empty."""
+    response_cache.clear()
+    yield TestClient(app)
+    response_cache.clear()
+
+
+def write_event(engine, run_id: int, event_id: int) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            insert(TimelineEvent),
+            [
+                {
+                    "id": event_id,
+                    "run_id": run_id,
+                    "event_type": EventType.STEP_READY,
+                    "message": f"event {event_id}",
+                    "created_at": datetime.now(timezone.utc).replace(tzinfo=None),
+                }
+            ],
+        )
+
+
+def revalidate(client, url: str, etag: str):
+    return client.get(url, headers={"If-None-Match": etag})
+
+
+def test_timeline_etag_catches_a_late_commit(engine, client, park_run):
+    run_id, _ = park_run()
+    url = f"/api/workflows/{run_id}/timeline"
+    with engine.connect() as conn:
+        last_id = conn.scalar(select(func.max(TimelineEvent.id)))
+
+    # id N + 2 commits, then N + 1: the last id does not move
+    write_event(engine, run_id, last_id + 2)
+    first = client.get(url)
+    assert revalidate(client, url, first.headers["etag"]).status_code == 304
+
+    write_event(engine, run_id, last_id + 1)
+    second = revalidate(client, url, first.headers["etag"])
+    assert second.status_code == 200
+    assert second.headers["etag"] != first.headers["etag"]
+    assert f"event {last_id + 1}" in second.text
+
+
+def test_approvals_etag_changes_with_a_decision(client, park_run):
+    run_id, approval_id = park_run()
+    url = f"/api/approvals/workflow/{run_id}"
+    first = client.get(url)
+    assert first.json()["approvals"][0]["status"] == "required"
+    assert revalidate(client, url, first.headers["etag"]).status_code == 304
+
+    service = ApprovalService()
+    try:
+        assert service.approve_step(approval_id, decided_by=1)["success"]
+    finally:
+        service.close()
+
+    second = revalidate(client, url, first.headers["etag"])
+    assert second.status_code == 200
+    assert second.json()["approvals"][0]["status"] == "approved"
+
+
+def test_unknown_run_is_not_found(client):
+    assert client.get("/api/workflows/999999/timeline").status_code == 404
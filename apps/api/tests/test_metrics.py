@@ -0,0 +1,87 @@
+"""Prometheus export: request metrics by route template and the scrape-time collector."""
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from prometheus_client.parser import text_string_to_metric_families
+
+from main import app
+from services.http_cache import response_cache
+
+TIMELINE = "/api/workflows/{workflow_id}/timeline"
+
+
+@pytest.fixture
+def client():
+    response_cache.clear()
+    yield TestClient(app)
+    response_cache.clear()
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def scrape(client) -> dict:
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    return {family.name: family for family in text_string_to_metric_families(response.text)}
+
+
+def test_requests_are_labelled_by_route_template(client, park_run):
+    run_id, _ = park_run()
+    requests = sample("lifeos_http_requests_total", method="GET", route=TIMELINE, status="200")
+    timed = sample("lifeos_http_request_duration_seconds_count", method="GET", route=TIMELINE)
+    unmatched = sample("lifeos_http_requests_total", method="GET", route="unmatched", status="404")
+
+    for _ in range(2):
+        assert client.get(f"/api/workflows/{run_id}/timeline").status_code == 200
+    assert client.get(f"/nope/{run_id}").status_code == 404
+
+    assert sample(
+        "lifeos_http_requests_total", method="GET", route=TIMELINE, status="200"
+    ) == requests + 2
+    assert sample(
+        "lifeos_http_request_duration_seconds_count", method="GET", route=TIMELINE
+    ) == timed + 2
+    assert sample(
+        "lifeos_http_requests_total", method="GET", route="unmatched", status="404"
+    ) == unmatched + 1
+
+    # The raw URL never becomes a label
+    families = scrape(client)
+    routes = {s.labels.get("route") for s in families["lifeos_http_requests"].samples}
+    assert not any(str(run_id) in route for route in routes)
+
+
+def test_steps_are_timed_by_tool_and_outcome(park_run):
+    before = sample(
+        "lifeos_step_execution_duration_seconds_count", tool="job_search", outcome="succeeded"
+    )
+    park_run()
+    assert sample(
+        "lifeos_step_execution_duration_seconds_count", tool="job_search", outcome="succeeded"
+    ) == before + 1
+
+
+def test_scrape_reads_runtime_stats(client):
+    families = scrape(client)
+
+    for name in (
+        "lifeos_dispatcher_queued_runs",
+        "lifeos_dispatcher_workers",
+        "lifeos_approval_timers_armed",
+        "lifeos_stream_subscriptions",
+        "lifeos_response_cache_bytes",
+        "lifeos_timeline_events_dropped",
+        "lifeos_transition_conflicts",
+    ):
+        assert name in families, name
+
+    # One series per engine role with a pool
+    checkouts = families["lifeos_db_pool_checkouts"]
+    assert checkouts.type == "counter"
+    assert "api" in {s.labels["role"] for s in checkouts.samples}
+    capacity = families["lifeos_db_pool_capacity"]
+    assert all(s.value > 0 for s in capacity.samples)
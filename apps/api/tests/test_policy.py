@@ -0,0 +1,128 @@
+"""Auto-approval policies: matching, daily quotas and the endpoints."""
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from db import SessionLocal
+from main import app
+from models.approvals import Approval, ApprovalStatus
+from models.workflows import RunState, WorkflowRun
+from services.policy import PolicyService, policy_engine
+
+JOB_SUBMIT = {
+    "tool": "job_submit",
+    "name": "Submit job application",
+    "risk_level": "L3",
+    "intent": "apply to backend jobs",
+}
+
+
+@pytest.fixture
+def client():
+    """A client without the lifespan: no background services."""
+    return TestClient(app)
+
+
+@pytest.fixture
+def policies(user):
+    """A PolicyService; the engine's compiled rules are dropped afterwards."""
+    service = PolicyService()
+    yield service
+    service.close()
+    policy_engine.clear()
+
+
+@pytest.fixture
+def policy(client, user):
+    response = client.post(
+        "/api/approvals/policies",
+        json={"user_id": user, "tool": "job_submit", "daily_quota": 5},
+    )
+    assert response.status_code == 200
+    yield response.json()
+    policy_engine.clear()
+
+
+@pytest.mark.parametrize("field", ["max_risk_level", "conditions", "enabled"])
+def test_update_rejects_null_required_field(client, policy, field):
+    response = client.patch(f"/api/approvals/policies/{policy['id']}", json={field: None})
+    assert response.status_code == 400
+    assert client.get(
+        "/api/approvals/policies", params={"user_id": policy["user_id"]}
+    ).json()["policies"] == [policy]
+
+
+def test_update_clears_nullable_fields(client, policy):
+    response = client.patch(
+        f"/api/approvals/policies/{policy['id']}", json={"tool": None, "daily_quota": None}
+    )
+    assert response.status_code == 200
+    assert response.json()["tool"] is None
+    assert response.json()["daily_quota"] is None
+
+
+def test_tool_rules_are_tried_before_any_tool_rules(policies):
+    backend = policies.create_policy(
+        1,
+        tool="job_submit",
+        max_risk_level="L2",
+        conditions=[{"field": "intent", "op": "contains", "value": "backend"}],
+    ).id
+    senders = policies.create_policy(
+        1, conditions=[{"field": "name", "op": "matches", "value": "^(Submit|Send) "}]
+    ).id
+
+    def reserve(**facts):
+        return policy_engine.reserve(policies.db, 1, {**JOB_SUBMIT, **facts})
+
+    assert reserve(risk_level="L2") == backend
+    # Above the tool rule's risk ceiling, or failing its condition: the any-tool rule
+    assert reserve() == senders
+    assert reserve(risk_level="L2", intent="apply to frontend jobs") == senders
+    assert reserve(tool="email_send", name="Send weekly report") == senders
+    assert reserve(tool="email_send", name="Delete inbox") is None
+
+
+def test_disabled_policy_does_not_match(policies):
+    policy_id = policies.create_policy(1, tool="job_submit").id
+    policies.update_policy(policy_id, enabled=False)
+    assert policy_engine.reserve(policies.db, 1, JOB_SUBMIT) is None
+
+
+def test_daily_quota_reserve_and_release(policies):
+    policy_id = policies.create_policy(1, tool="job_submit", daily_quota=2).id
+
+    assert policy_engine.reserve(policies.db, 1, JOB_SUBMIT) == policy_id
+    assert policy_engine.reserve(policies.db, 1, JOB_SUBMIT) == policy_id
+    assert policy_engine.reserve(policies.db, 1, JOB_SUBMIT) is None
+
+    # A use whose approval rolled back is given back
+    policy_engine.release(1, policy_id)
+    assert policy_engine.reserve(policies.db, 1, JOB_SUBMIT) == policy_id
+    assert policy_engine.reserve(policies.db, 1, JOB_SUBMIT) is None
+
+
+def test_daily_quota_counts_committed_approvals(policies, park_run):
+    policy_id = policies.create_policy(1, tool="job_submit", daily_quota=1).id
+
+    # The first run is approved by the policy and runs to completion ...
+    auto_run, pending = park_run()
+    assert pending is None
+
+    # ... and uses up its quota, in memory and, once recompiled, from the table
+    for _ in range(2):
+        _, approval_id = park_run()
+        assert approval_id is not None
+        policy_engine.clear()
+
+    db = SessionLocal()
+    try:
+        assert db.get(WorkflowRun, auto_run).state == RunState.COMPLETED
+        approvals = db.execute(
+            select(Approval.run_id, Approval.status, Approval.policy_id).order_by(Approval.id)
+        ).all()
+        assert approvals[0] == (auto_run, ApprovalStatus.APPROVED, policy_id)
+        assert [row[1:] for row in approvals[1:]] == [(ApprovalStatus.REQUIRED, None)] * 2
+    finally:
+        db.close()
@@ -0,0 +1,140 @@
+"""
+Query-count budgets: hot endpoints and the scheduler run a fixed number of statements.
+
+Each budget is the statement count of the code path today plus a little
+slack. A change that makes a path query once per step, event or
+approval (an N+1) fails here before it shows up as latency.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, select, text
+
+from db import SessionLocal
+from main import app
+from models.approvals import Approval, ApprovalStatus
+from models.users import User
+from models.workflows import RunState, StepState, WorkflowRun, WorkflowStep
+from services.dispatcher import drive_run
+from services.orchestrator import Orchestrator
+from services.scheduler import Scheduler
+from services.timeline import timeline_writer
+
+# Pending steps behind one unfinished step: enough that per-step queries show
+WIDE_RUN_STEPS = 50
+
+
+@pytest.fixture(scope="module")
+def client():
+    """A client without the lifespan: no background thread runs a statement."""
+    return TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def parked_run(engine):
+    """A job-application run driven until it parks on its approval."""
+    with engine.begin() as conn:
+        conn.execute(
+            insert(User), [{"id": 1, "email": "budgets@example.com", "hashed_password": "x"}]
+        )
+
+    orchestrator = Orchestrator()
+    try:
+        run_id = orchestrator.create_workflow(1, "apply to backend jobs").id
+    finally:
+        orchestrator.close()
+    drive_run(run_id)
+    timeline_writer.flush()
+
+    yield run_id
+
+    with engine.begin() as conn:
+        for table in (
+            "run_summaries",
+            "timeline_events",
+            "approvals",
+            "workflow_steps",
+            "workflow_runs",
+            "users",
+        ):
+            conn.execute(text(f"DELETE FROM {table}"))
+
+
+@pytest.fixture
+def pending_approval(engine, parked_run):
+    with engine.connect() as conn:
+        return conn.scalar(
+            select(Approval.id).where(
+                Approval.run_id == parked_run, Approval.status == ApprovalStatus.REQUIRED
+            )
+        )
+
+
+def test_timeline_poll(client, parked_run, query_budget):
+    with query_budget(4):
+        response = client.get(f"/api/workflows/{parked_run}/timeline")
+    assert response.status_code == 200
+    assert response.json()["events"]
+
+    # Revalidation is the ETag lookup alone
+    with query_budget(1):
+        response = client.get(
+            f"/api/workflows/{parked_run}/timeline",
+            headers={"If-None-Match": response.headers["etag"]},
+        )
+    assert response.status_code == 304
+
+
+def test_approvals_poll(client, parked_run, query_budget):
+    with query_budget(3):
+        response = client.get(f"/api/approvals/workflow/{parked_run}")
+    assert response.status_code == 200
+
+    with query_budget(1):
+        response = client.get(
+            f"/api/approvals/workflow/{parked_run}",
+            headers={"If-None-Match": response.headers["etag"]},
+        )
+    assert response.status_code == 304
+
+
+def test_approval_decision(client, pending_approval, query_budget):
+    with query_budget(9):
+        response = client.post(
+            f"/api/approvals/{pending_approval}/decision",
+            json={"decision": "approve", "decided_by": 1},
+        )
+    assert response.status_code == 200
+
+
+def test_scheduler_round_does_not_grow_with_steps(engine, parked_run, query_budget):
+    with engine.begin() as conn:
+        run_id = conn.execute(
+            insert(WorkflowRun).returning(WorkflowRun.id),
+            [{"user_id": 1, "intent": "wide", "state": RunState.EXECUTING}],
+        ).scalar_one()
+        gate = conn.execute(
+            insert(WorkflowStep).returning(WorkflowStep.id),
+            [{"run_id": run_id, "name": "gate", "state": StepState.RUNNING}],
+        ).scalar_one()
+        conn.execute(
+            insert(WorkflowStep),
+            [
+                {
+                    "run_id": run_id,
+                    "name": f"step {i}",
+                    "state": StepState.PENDING,
+                    "depends_on": [gate],
+                }
+                for i in range(WIDE_RUN_STEPS)
+            ],
+        )
+
+    db = SessionLocal()
+    try:
+        with query_budget(5):
+            result = Scheduler(db).schedule_round(run_id)
+    finally:
+        db.close()
+
+    assert result == {"ready_steps": [], "blocked_steps": []}
@@ -0,0 +1,192 @@
+"""
+Query-plan regression tests: hot query shapes must be served by an index.
+
+Each statement below mirrors a query on a hot path. It is EXPLAINed
+against seeded data and the test fails if the plan scans a whole table.
+On Postgres sequential scans are disabled for the check, so a Seq Scan
+in the plan means no usable index exists at all, regardless of table
+size or statistics.
+"""
+
+import json
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import func, insert, select, text
+
+from models.approvals import Approval, ApprovalStatus
+from models.run_summary import RunSummary
+from models.timeline_event import EventType, TimelineEvent
+from models.users import User
+from models.workflows import RunState, StepState, WorkflowRun, WorkflowStep
+from services.timeline_archive import _live_events
+
+RUNS = 200
+STEPS_PER_RUN = 5
+EVENTS_PER_RUN = 50
+APPROVALS_PER_RUN = 2
+
+RUN_ID = 7
+
+HOT_QUERIES = {
+    "scheduler: pending steps of a run": select(WorkflowStep).where(
+        WorkflowStep.run_id == RUN_ID,
+        WorkflowStep.state == StepState.PENDING,
+    ),
+    "timeline page": _live_events(RUN_ID, after=10, limit=500),
+    "multiplex catch-up": select(TimelineEvent)
+    .where(TimelineEvent.run_id.in_([3, RUN_ID]), TimelineEvent.id > 10)
+    .order_by(TimelineEvent.id)
+    .limit(500),
+    "timeline etag: last event of a run": select(WorkflowRun.state, WorkflowRun.version)
+    .add_columns(
+        select(func.max(TimelineEvent.id)).where(TimelineEvent.run_id == RUN_ID).scalar_subquery()
+    )
+    .where(WorkflowRun.id == RUN_ID),
+    "approvals etag: versions of a run's approvals": select(
+        WorkflowRun.state, func.count(Approval.id), func.sum(Approval.version)
+    )
+    .outerjoin(Approval, Approval.run_id == WorkflowRun.id)
+    .where(WorkflowRun.id == RUN_ID)
+    .group_by(WorkflowRun.id, WorkflowRun.state),
+    "pending approvals of a run": select(Approval).where(
+        Approval.run_id == RUN_ID,
+        Approval.status == ApprovalStatus.REQUIRED,
+    ),
+    "approvals of a run": select(Approval)
+    .where(Approval.run_id == RUN_ID)
+    .order_by(Approval.created_at.desc()),
+    "approver inbox": select(Approval)
+    .where(Approval.approver_id == 1, Approval.status == ApprovalStatus.REQUIRED)
+    .order_by(Approval.id)
+    .limit(50),
+    "approval timers: pending deadlines": select(Approval.id, Approval.expires_at).where(
+        Approval.status == ApprovalStatus.REQUIRED,
+        Approval.expires_at.is_not(None),
+        Approval.expires_at <= datetime(2030, 1, 1),
+    ),
+    "dashboard: a user's runs": select(RunSummary)
+    .where(RunSummary.user_id == 1)
+    .order_by(RunSummary.last_event_at.desc(), RunSummary.run_id.desc())
+    .limit(50),
+}
+
+HOT_TABLES = {"workflow_steps", "timeline_events", "approvals", "run_summaries"}
+
+
+@pytest.fixture(scope="module")
+def seeded(engine):
+    """Enough rows per table that a table scan is a real choice for the planner."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    run_ids = range(1, RUNS + 1)
+
+    with engine.begin() as conn:
+        conn.execute(
+            insert(User), [{"id": 1, "email": "plans@example.com", "hashed_password": "x"}]
+        )
+        conn.execute(
+            insert(WorkflowRun),
+            [
+                {"id": run_id, "user_id": 1, "intent": "seed", "state": RunState.EXECUTING}
+                for run_id in run_ids
+            ],
+        )
+        conn.execute(
+            insert(WorkflowStep),
+            [
+                {
+                    "run_id": run_id,
+                    "name": f"step {i}",
+                    "state": list(StepState)[i % len(StepState)],
+                }
+                for run_id in run_ids
+                for i in range(STEPS_PER_RUN)
+            ],
+        )
+        conn.execute(
+            insert(Approval),
+            [
+                {
+                    "run_id": run_id,
+                    "approver_id": 1,
+                    "reason": "seed",
+                    "status": ApprovalStatus.REQUIRED if i == 0 else ApprovalStatus.APPROVED,
+                    "expires_at": now if i == 0 and run_id % 2 else None,
+                }
+                for run_id in run_ids
+                for i in range(APPROVALS_PER_RUN)
+            ],
+        )
+        conn.execute(
+            insert(TimelineEvent),
+            [
+                {
+                    "run_id": run_id,
+                    "event_type": EventType.STEP_READY,
+                    "message": "seed",
+                    "created_at": now,
+                }
+                for run_id in run_ids
+                for _ in range(EVENTS_PER_RUN)
+            ],
+        )
+        conn.execute(
+            insert(RunSummary),
+            [
+                {
+                    "run_id": run_id,
+                    "user_id": 1,
+                    "intent": "seed",
+                    "state": RunState.EXECUTING,
+                    "started_at": now,
+                    "last_event_at": now,
+                }
+                for run_id in run_ids
+            ],
+        )
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("ANALYZE"))
+
+    yield
+
+    with engine.begin() as conn:
+        for table in (
+            "run_summaries",
+            "timeline_events",
+            "approvals",
+            "workflow_steps",
+            "workflow_runs",
+            "users",
+        ):
+            conn.execute(text(f"DELETE FROM {table}"))
+
+
+def full_scans(conn, statement) -> list[str]:
+    """Describe every whole-table scan of a hot table in the statement's plan."""
+    sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        scans, nodes = [], [plan[0]["Plan"]]
+        while nodes:
+            node = nodes.pop()
+            nodes.extend(node.get("Plans", []))
+            if node["Node Type"] == "Seq Scan" and node["Relation Name"] in HOT_TABLES:
+                scans.append(f"Seq Scan on {node['Relation Name']}")
+        return scans
+
+    # SQLite: SCAN is a full pass (of the table or an index); SEARCH is a lookup
+    details = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+    return [d for d in details if d.startswith("SCAN ") and d.split()[1] in HOT_TABLES]
+
+
+@pytest.mark.parametrize("name", HOT_QUERIES)
+def test_hot_query_uses_index(engine, seeded, name):
+    with engine.begin() as conn:
+        scans = full_scans(conn, HOT_QUERIES[name])
+
+    assert not scans, f"{name} scans a whole table: {scans}"
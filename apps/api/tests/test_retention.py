@@ -0,0 +1,193 @@
+"""Retention: a purged run leaves nothing behind, in the tables or the archive."""
+
+import gzip
+import json
+import os
+import zlib
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import delete, func, insert, select
+
+from config import settings
+from db import SessionLocal
+from models.timeline_archive import TimelineArchive
+from models.timeline_event import EventType, TimelineEvent
+from models.workflows import RunState, WorkflowRun
+from services import retention
+from services.retention import purge_finished_runs
+from services.timeline_archive import iter_timeline, write_segment
+
+EVENTS_PER_RUN = 5
+SEGMENT = "timeline_events_p20200101.seg"
+
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "TIMELINE_ARCHIVE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def archived_event_ids(archive_dir) -> set[int]:
+    """Ids of every event in every segment file, read block by block."""
+    ids = set()
+    for name in os.listdir(archive_dir):
+        data = (archive_dir / name).read_bytes()
+        while data:
+            block = zlib.decompressobj()
+            for line in block.decompress(data).split(b"\n"):
+                ids.add(int(line[6:line.index(b",")]))
+            data = block.unused_data
+    return ids
+
+
+@pytest.fixture
+def runs(engine, user, archive_dir):
+    """
+    An old finished run and a running one, both with events in one
+    archived segment and one live event each.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    old = now - timedelta(days=settings.RETENTION_AFTER_DAYS + 1)
+    with engine.begin() as conn:
+        purged, kept = conn.execute(
+            insert(WorkflowRun).returning(WorkflowRun.id),
+            [
+                {"user_id": user, "intent": "old", "state": RunState.COMPLETED, "updated_at": old},
+                {"user_id": user, "intent": "live", "state": RunState.EXECUTING, "updated_at": old},
+            ],
+        ).scalars().all()
+        conn.execute(
+            insert(TimelineEvent),
+            [
+                {
+                    "run_id": run_id,
+                    "event_type": EventType.STEP_READY,
+                    "message": "e",
+                    "created_at": old,
+                }
+                for run_id in (purged, kept)
+                for _ in range(EVENTS_PER_RUN)
+            ],
+        )
+
+    # Archive every event so far into one segment, as archive_partition does
+    db = SessionLocal()
+    try:
+        events = db.scalars(
+            select(TimelineEvent).order_by(TimelineEvent.run_id, TimelineEvent.id)
+        ).all()
+        entries = write_segment(str(archive_dir / SEGMENT), iter(events))
+        db.execute(insert(TimelineArchive), entries)
+        db.execute(delete(TimelineEvent))
+        db.commit()
+    finally:
+        db.close()
+
+    with engine.begin() as conn:
+        conn.execute(
+            insert(TimelineEvent),
+            [
+                {
+                    "run_id": run_id,
+                    "event_type": EventType.STEP_READY,
+                    "message": "e",
+                    "created_at": old,
+                }
+                for run_id in (purged, kept)
+            ],
+        )
+
+    return purged, kept
+
+
+def test_purge_removes_live_and_archived_events(engine, runs, archive_dir):
+    purged, kept = runs
+    db = SessionLocal()
+    try:
+        kept_before = list(iter_timeline(db, kept))
+        purged_ids = {event_id for event_id, _ in iter_timeline(db, purged)}
+
+        stats = purge_finished_runs(db, max_rows_per_second=0)
+        assert stats.runs == 1 and stats.complete
+
+        for model in (TimelineEvent, TimelineArchive):
+            left = db.scalar(select(func.count()).select_from(model).where(model.run_id == purged))
+            assert left == 0
+        assert not purged_ids & archived_event_ids(archive_dir)
+        assert os.listdir(archive_dir) == ["timeline_events_p20200101.g2.seg"]
+
+        # The other run's archived events are still read through the new segment
+        assert list(iter_timeline(db, kept)) == kept_before
+    finally:
+        db.close()
+
+
+def test_pass_removes_orphaned_segments(user, archive_dir):
+    # Left by a compaction that crashed after its commit, and by one still in flight
+    stale = archive_dir / "timeline_events_p20200101.seg"
+    fresh = archive_dir / "timeline_events_p20200102.seg"
+    stale.write_bytes(b"x")
+    fresh.write_bytes(b"x")
+    hour_ago = datetime.now().timestamp() - 3600
+    os.utime(stale, (hour_ago, hour_ago))
+
+    db = SessionLocal()
+    try:
+        assert purge_finished_runs(db, max_rows_per_second=0).complete
+    finally:
+        db.close()
+
+    assert os.listdir(archive_dir) == [fresh.name]
+
+
+def test_interrupted_batch_is_redone_without_losing_the_archive(
+    engine, user, archive_dir, tmp_path, monkeypatch
+):
+    old = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(
+        days=settings.RETENTION_AFTER_DAYS + 1
+    )
+    with engine.begin() as conn:
+        run_id = conn.execute(
+            insert(WorkflowRun).returning(WorkflowRun.id),
+            {"user_id": user, "intent": "old", "state": RunState.COMPLETED, "updated_at": old},
+        ).scalar_one()
+        conn.execute(
+            insert(TimelineEvent),
+            [
+                {"run_id": run_id, "event_type": EventType.STEP_READY, "message": f"e{i}"}
+                for i in range(7)
+            ],
+        )
+
+    monkeypatch.setattr(settings, "RETENTION_CHUNK_ROWS", 3)
+    monkeypatch.setattr(settings, "RETENTION_ARCHIVE_DIR", str(tmp_path / "runs"))
+
+    compact_segments = retention.compact_segments
+
+    def crash(db, run_ids):
+        raise RuntimeError("killed after the event chunks")
+
+    monkeypatch.setattr(retention, "compact_segments", crash)
+    db = SessionLocal()
+    try:
+        with pytest.raises(RuntimeError):
+            purge_finished_runs(db, max_rows_per_second=0, archive=True)
+        db.rollback()
+
+        # The event chunks committed; the run and its checkpoint did not move
+        left = db.scalar(select(func.count()).where(TimelineEvent.run_id == run_id))
+        assert left == 0
+        assert db.get(WorkflowRun, run_id) is not None
+
+        monkeypatch.setattr(retention, "compact_segments", compact_segments)
+        stats = purge_finished_runs(db, max_rows_per_second=0, archive=True)
+        assert stats.runs == 1 and stats.complete
+        assert db.get(WorkflowRun, run_id) is None
+    finally:
+        db.close()
+
+    (path,) = (tmp_path / "runs").iterdir()
+    with gzip.open(path, "rt") as f:
+        (record,) = [json.loads(line) for line in f]
+    assert [event["message"] for event in record["events"]] == [f"e{i}" for i in range(7)]
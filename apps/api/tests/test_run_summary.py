@@ -0,0 +1,76 @@
+"""Run summaries: adjusting them per transition agrees with a full recount."""
+
+from db import SessionLocal
+from models.run_summary import RunSummary
+from models.workflows import RunState
+from services.approval import ApprovalService
+from services.dispatcher import drive_run
+from services.run_summary import refresh_run_summary
+
+# Columns a recount derives from steps, approvals and the run
+RECOUNTED = [
+    "state",
+    "steps_total",
+    "steps_pending",
+    "steps_ready",
+    "steps_running",
+    "steps_blocked",
+    "steps_succeeded",
+    "steps_failed",
+    "steps_skipped",
+    "blocking_approval_id",
+    "blocking_reason",
+]
+
+
+def summary_and_recount(run_id: int) -> tuple[dict, dict]:
+    db = SessionLocal()
+    try:
+        summary = db.get(RunSummary, run_id)
+        kept = {column: getattr(summary, column) for column in RECOUNTED}
+        recounted = refresh_run_summary(db, run_id)
+        return kept, {column: getattr(recounted, column) for column in RECOUNTED}
+    finally:
+        db.rollback()
+        db.close()
+
+
+def test_summary_matches_a_recount_through_a_run(park_run):
+    run_id, approval_id = park_run()
+
+    kept, recounted = summary_and_recount(run_id)
+    assert kept == recounted
+    assert kept["state"] == RunState.WAITING_APPROVAL
+    assert kept["blocking_approval_id"] == approval_id and kept["steps_blocked"] == 1
+
+    service = ApprovalService()
+    try:
+        assert service.approve_step(approval_id, decided_by=1)["success"]
+    finally:
+        service.close()
+    drive_run(run_id)
+
+    kept, recounted = summary_and_recount(run_id)
+    assert kept == recounted
+    assert kept["state"] == RunState.COMPLETED
+    assert kept["blocking_approval_id"] is None
+    assert kept["steps_succeeded"] == kept["steps_total"]
+
+
+def test_duration_runs_to_the_finish(park_run):
+    run_id, approval_id = park_run()
+    service = ApprovalService()
+    try:
+        service.reject_step(approval_id, decided_by=1)
+    finally:
+        service.close()
+    drive_run(run_id)
+
+    db = SessionLocal()
+    try:
+        summary = db.get(RunSummary, run_id)
+        assert summary.finished_at is not None
+        expected = (summary.finished_at - summary.started_at).total_seconds()
+        assert abs(summary.duration_seconds - expected) < 0.01
+    finally:
+        db.close()
@@ -0,0 +1,94 @@
+"""/timeline and /timeline.ndjson: keyset pages and the streamed export."""
+
+import json
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, select
+
+from main import app
+from models.timeline_event import EventType, TimelineEvent
+from models.workflows import RunState, WorkflowRun
+from services.http_cache import response_cache
+
+EVENTS = 12
+
+
+@pytest.fixture
+def client():
+    response_cache.clear()
+    yield TestClient(app)
+    response_cache.clear()
+
+
+@pytest.fixture
+def run_events(engine, user) -> tuple[int, list[int]]:
+    """A run with EVENTS events; returns (run_id, event ids in order)."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    with engine.begin() as conn:
+        run_id = conn.execute(
+            insert(WorkflowRun).returning(WorkflowRun.id),
+            [{"user_id": user, "intent": "timeline", "state": RunState.EXECUTING}],
+        ).scalar_one()
+        conn.execute(
+            insert(TimelineEvent),
+            [
+                {
+                    "run_id": run_id,
+                    "event_type": EventType.STEP_READY,
+                    "message": f"event {i}",
+                    "created_at": now,
+                }
+                for i in range(EVENTS)
+            ],
+        )
+        ids = conn.scalars(
+            select(TimelineEvent.id)
+            .where(TimelineEvent.run_id == run_id)
+            .order_by(TimelineEvent.id)
+        ).all()
+    return run_id, ids
+
+
+def test_pages_follow_the_cursor_to_the_end(client, run_events):
+    run_id, ids = run_events
+    seen, after, pages = [], 0, 0
+    while after is not None:
+        body = client.get(f"/api/workflows/{run_id}/timeline?after={after}&limit=5").json()
+        seen += [event["id"] for event in body["events"]]
+        after = body["next_cursor"]
+        pages += 1
+
+    assert seen == ids
+    assert pages == 3  # 5 + 5 + 2; the short last page has no cursor
+
+
+def test_full_last_page_has_no_cursor(client, run_events):
+    run_id, ids = run_events
+    body = client.get(f"/api/workflows/{run_id}/timeline?after={ids[1]}&limit=10").json()
+    assert [event["id"] for event in body["events"]] == ids[2:]
+    assert body["next_cursor"] is None
+
+
+def test_ndjson_streams_every_event_after_the_cursor(client, run_events):
+    run_id, ids = run_events
+    response = client.get(f"/api/workflows/{run_id}/timeline.ndjson?after={ids[3]}")
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [event["id"] for event in events] == ids[4:]
+    assert events[0] == {
+        "id": ids[4],
+        "event": "step_ready",
+        "message": "event 4",
+        "timestamp": events[0]["timestamp"],
+        "metadata": {},
+    }
+
+    limited = client.get(f"/api/workflows/{run_id}/timeline.ndjson?limit=3")
+    assert [json.loads(line)["id"] for line in limited.text.splitlines()] == ids[:3]
+
+
+def test_ndjson_of_unknown_run_is_not_found(client):
+    assert client.get("/api/workflows/999999/timeline.ndjson").status_code == 404
@@ -0,0 +1,134 @@
+"""Timeline archive: segment round-trips and reads spanning archive and live rows."""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import delete, insert, select
+
+from config import settings
+from db import SessionLocal, StreamingSessionLocal
+from models.timeline_archive import TimelineArchive
+from models.timeline_event import EventType, TimelineEvent
+from models.workflows import RunState, WorkflowRun
+from services.frames import json_line
+from services.timeline_archive import aiter_timeline, iter_timeline, write_segment
+
+EVENTS = 8
+# Events 0-2 go to the first segment, 3-4 to the second, the rest stay live
+SEGMENTS = {
+    "timeline_events_p20200101.seg": range(0, 3),
+    "timeline_events_p20200102.seg": range(3, 5),
+}
+
+
+@pytest.fixture
+def timeline(engine, user, tmp_path, monkeypatch) -> tuple[int, list[tuple[int, bytes]]]:
+    """
+    A run whose first events are archived in two segments; returns
+    (run_id, every (event_id, json_line) as it read before archiving).
+    """
+    monkeypatch.setattr(settings, "TIMELINE_ARCHIVE_DIR", str(tmp_path))
+    start = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=1)
+    with engine.begin() as conn:
+        run_id = conn.execute(
+            insert(WorkflowRun).returning(WorkflowRun.id),
+            [{"user_id": user, "intent": "archive", "state": RunState.EXECUTING}],
+        ).scalar_one()
+        conn.execute(
+            insert(TimelineEvent),
+            [
+                {
+                    "run_id": run_id,
+                    "event_type": EventType.STEP_READY,
+                    "message": f"event {i}",
+                    "metadata": '{"i": %d}' % i if i % 2 else None,
+                    "created_at": start + timedelta(minutes=i),
+                }
+                for i in range(EVENTS)
+            ],
+        )
+
+    db = SessionLocal()
+    try:
+        events = db.scalars(
+            select(TimelineEvent).where(TimelineEvent.run_id == run_id).order_by(TimelineEvent.id)
+        ).all()
+        expected = [(event.id, json_line(event.id, event.frame_payload())) for event in events]
+
+        for name, positions in SEGMENTS.items():
+            archived = [events[i] for i in positions]
+            db.execute(insert(TimelineArchive), write_segment(str(tmp_path / name), iter(archived)))
+            db.execute(
+                delete(TimelineEvent).where(TimelineEvent.id.in_([e.id for e in archived]))
+            )
+        db.commit()
+    finally:
+        db.close()
+
+    return run_id, expected
+
+
+def window(expected, after: int, limit):
+    tail = [item for item in expected if item[0] > after]
+    return tail if limit is None else tail[:limit]
+
+
+# (after, limit) as positions in the timeline: -1 is before the first event
+WINDOWS = [(-1, None), (-1, 2), (0, 4), (2, 3), (4, None), (6, 5), (7, None)]
+
+
+def resolve(expected, after: int) -> int:
+    return 0 if after < 0 else expected[after][0]
+
+
+def test_segments_round_trip_every_event(timeline):
+    run_id, expected = timeline
+    assert b'"metadata":{"i":1}' in expected[1][1]
+    db = SessionLocal()
+    try:
+        assert list(iter_timeline(db, run_id)) == expected
+        blocks = db.scalars(
+            select(TimelineArchive).where(TimelineArchive.run_id == run_id)
+        ).all()
+    finally:
+        db.close()
+
+    assert [(b.first_event_id, b.last_event_id) for b in blocks] == [
+        (expected[0][0], expected[2][0]),
+        (expected[3][0], expected[4][0]),
+    ]
+
+
+@pytest.mark.parametrize("after, limit", WINDOWS)
+def test_iter_timeline_windows(timeline, after, limit):
+    run_id, expected = timeline
+    after = resolve(expected, after)
+    db = SessionLocal()
+    try:
+        assert list(iter_timeline(db, run_id, after, limit)) == window(expected, after, limit)
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("yield_per", [None, 2])
+@pytest.mark.parametrize("after, limit", WINDOWS)
+async def test_aiter_timeline_matches(timeline, after, limit, yield_per):
+    run_id, expected = timeline
+    after = resolve(expected, after)
+    async with StreamingSessionLocal() as db:
+        items = [
+            item async for item in aiter_timeline(db, run_id, after, limit, yield_per=yield_per)
+        ]
+    assert items == window(expected, after, limit)
+
+
+def test_tag_run_adds_the_run_id_to_archived_and_live_lines(timeline):
+    run_id, expected = timeline
+    db = SessionLocal()
+    try:
+        tagged = list(iter_timeline(db, run_id, tag_run=True))
+    finally:
+        db.close()
+
+    prefixes = [b'{"id":%d,"run_id":%d,' % (event_id, run_id) for event_id, _ in expected]
+    assert [line[: len(prefix)] for (_, line), prefix in zip(tagged, prefixes)] == prefixes
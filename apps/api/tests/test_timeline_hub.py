@@ -0,0 +1,221 @@
+"""Timeline hub: polling from the tail, routing events and slow subscribers."""
+
+import json
+import re
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from config import settings
+from db import StreamingSessionLocal
+from models.timeline_event import EventType, TimelineEvent
+from models.workflows import RunState, WorkflowRun
+from services.timeline_archive import aiter_timeline
+from services.timeline_hub import (
+    CATCH_UP_PAGE_SIZE,
+    LATE_COMMIT_WINDOW,
+    POLL_BATCH_SIZE,
+    HubEvent,
+    Overflow,
+    OverflowPolicy,
+    TimelineHub,
+    stream_frames,
+)
+
+# Per-subscriber queue bound for the overflow tests
+MAX_QUEUE = 2
+
+
+@pytest.fixture
+def run_id(engine, user):
+    with engine.begin() as conn:
+        return conn.execute(
+            insert(WorkflowRun).returning(WorkflowRun.id),
+            [{"user_id": user, "intent": "hub", "state": RunState.EXECUTING}],
+        ).scalar_one()
+
+
+@pytest.fixture
+def hub():
+    """A hub polled by hand: `_fetch` and `_dispatch` are called by the test."""
+    hub = TimelineHub(poll_interval=0)
+    hub.start = lambda: None
+    return hub
+
+
+def write_events(engine, run_id: int, count: int) -> int:
+    """Insert `count` events for the run; returns the highest event id."""
+    now = datetime.now(timezone.utc)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(TimelineEvent),
+            [
+                {
+                    "run_id": run_id,
+                    "event_type": EventType.STEP_READY,
+                    "message": "e",
+                    "created_at": now,
+                }
+                for _ in range(count)
+            ],
+        )
+        return conn.scalar(select(func.max(TimelineEvent.id)))
+
+
+async def poll(hub: TimelineHub) -> list:
+    events = await hub._fetch()
+    hub._dispatch(events)
+    return events
+
+
+async def test_hub_retails_after_idle(engine, hub, run_id):
+    sub = hub.subscribe(run_ids=[run_id])
+    await poll(hub)
+    hub.unsubscribe(sub)
+    assert hub.last_id is None
+
+    # Written while nobody listens: served by catch-up, never paged by the hub
+    tail = write_events(engine, run_id, 3 * POLL_BATCH_SIZE)
+
+    sub = hub.subscribe(run_ids=[run_id])
+    assert await poll(hub) == []
+    assert hub.last_id == tail
+
+    latest = write_events(engine, run_id, 1)
+    events = await poll(hub)
+    assert events[-1].id == latest
+    # Only the late-commit window below the tail is re-read, not the backlog
+    assert min(event.id for event in events) > tail - LATE_COMMIT_WINDOW
+    assert sub.queue.qsize() == len(events)
+
+
+def catch_up(run_id: int):
+    async def page(after: int) -> list[tuple[int, bytes]]:
+        async with StreamingSessionLocal() as db:
+            return [
+                item
+                async for item in aiter_timeline(
+                    db, run_id, after, CATCH_UP_PAGE_SIZE, tag_run=True
+                )
+            ]
+
+    return page
+
+
+def event_ids(chunk: bytes) -> list[int]:
+    return [int(i) for i in re.findall(rb"^id: (\d+)$", chunk, re.MULTILINE)]
+
+
+def message(chunk: bytes) -> dict:
+    assert chunk.startswith(b"data: ") and chunk.count(b"\n\n") == 1
+    return json.loads(chunk[len(b"data: "):])
+
+
+async def overflowed(engine, hub, run_id, policy) -> tuple:
+    """A subscription whose queue overflowed; returns it and the ids of what it missed."""
+    sub = hub.subscribe(run_ids=[run_id], policy=policy)
+    await poll(hub)
+
+    tail = write_events(engine, run_id, MAX_QUEUE + 3)
+    await poll(hub)
+    assert hub.overflows[policy.value] == 1
+
+    # The queue holds only the marker in place of what it dropped
+    assert sub.queue.qsize() == 1
+    assert isinstance(sub.overflow, Overflow)
+    missed = list(range(sub.overflow.first_dropped_id, tail + 1))
+    assert len(missed) == MAX_QUEUE + 3
+    return sub, missed
+
+
+@pytest.fixture
+def small_queues(monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_QUEUE_MAX_EVENTS", MAX_QUEUE)
+
+
+async def test_overflow_resync_replays_dropped_events(engine, hub, run_id, small_queues):
+    sub, missed = await overflowed(engine, hub, run_id, OverflowPolicy.RESYNC)
+    frames = stream_frames(sub, 0, catch_up(run_id), replay=False)
+    try:
+        assert event_ids(await anext(frames)) == missed
+        assert sub.overflow is None
+
+        # Live delivery resumes after the replayed events
+        latest = write_events(engine, run_id, 1)
+        await poll(hub)
+        assert event_ids(await anext(frames)) == [latest]
+    finally:
+        await frames.aclose()
+
+
+async def test_overflow_snapshot_sends_run_states(engine, hub, run_id, small_queues):
+    sub, missed = await overflowed(engine, hub, run_id, OverflowPolicy.SNAPSHOT)
+    frames = stream_frames(sub, 0, catch_up(run_id), replay=False)
+    try:
+        assert message(await anext(frames)) == {
+            "event": "snapshot",
+            "runs": [{"run_id": run_id, "state": "executing", "last_event_id": missed[-1]}],
+        }
+
+        # Events the snapshot covers are not sent again
+        sub.offer(HubEvent(missed[-1], run_id, EventType.STEP_READY, b'{"type":"step_ready"}'))
+        latest = write_events(engine, run_id, 1)
+        await poll(hub)
+        assert event_ids(await anext(frames)) == [latest]
+    finally:
+        await frames.aclose()
+
+
+async def test_overflow_disconnect_closes_the_stream(engine, hub, run_id, small_queues):
+    sub, _ = await overflowed(engine, hub, run_id, OverflowPolicy.DISCONNECT)
+    frames = stream_frames(sub, 0, catch_up(run_id), replay=False)
+
+    assert message(await anext(frames)) == {
+        "event": "overflow",
+        "message": "Client too slow; reconnect with Last-Event-ID",
+        "last_event_id": 0,
+    }
+    with pytest.raises(StopAsyncIteration):
+        await anext(frames)
+
+
+def write_event(engine, run_id: int, event_id: int) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            insert(TimelineEvent),
+            [
+                {
+                    "id": event_id,
+                    "run_id": run_id,
+                    "event_type": EventType.STEP_READY,
+                    "message": "e",
+                    "created_at": datetime.now(timezone.utc).replace(tzinfo=None),
+                }
+            ],
+        )
+
+
+async def test_late_commit_below_the_cursor_is_delivered(engine, hub, run_id):
+    tail = write_events(engine, run_id, 1)
+    sub = hub.subscribe(run_ids=[run_id])
+    await poll(hub)
+    frames = stream_frames(sub, 0, catch_up(run_id))
+    try:
+        assert event_ids(await anext(frames)) == [tail]
+
+        # id N + 1 commits (and is sent) before id N
+        write_event(engine, run_id, tail + 2)
+        await poll(hub)
+        assert event_ids(await anext(frames)) == [tail + 2]
+
+        write_event(engine, run_id, tail + 1)
+        await poll(hub)
+        assert event_ids(await anext(frames)) == [tail + 1]
+
+        # Nothing is sent twice when the hub's window re-reads both
+        latest = write_events(engine, run_id, 1)
+        await poll(hub)
+        assert event_ids(await anext(frames)) == [latest]
+    finally:
+        await frames.aclose()
@@ -0,0 +1,166 @@
+"""Timeline writer: batching, durability modes and flush failures."""
+
+import json
+import time
+from datetime import datetime
+
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import insert, select
+from sqlalchemy.exc import OperationalError
+
+from db import SessionLocal
+from models.timeline_event import EventType, TimelineEvent
+from models.workflows import RunState, WorkflowRun
+from services.timeline import DurabilityMode, TimelineWriter
+
+MISSING_RUN = 999_999
+
+
+@pytest.fixture
+def run_id(engine, user):
+    with engine.begin() as conn:
+        return conn.execute(
+            insert(WorkflowRun).returning(WorkflowRun.id),
+            [{"user_id": user, "intent": "writer", "state": RunState.EXECUTING}],
+        ).scalar_one()
+
+
+def dropped(reason: str) -> float:
+    value = REGISTRY.get_sample_value(
+        "lifeos_timeline_events_dropped_total", {"reason": reason}
+    )
+    return value or 0.0
+
+
+def stored(engine, run_id: int) -> list[str]:
+    with engine.connect() as conn:
+        return conn.scalars(
+            select(TimelineEvent.message)
+            .where(TimelineEvent.run_id == run_id)
+            .order_by(TimelineEvent.id)
+        ).all()
+
+
+def batched(**options) -> TimelineWriter:
+    """A BATCHED writer that only flushes when told to."""
+    return TimelineWriter(mode=DurabilityMode.BATCHED, max_batch=1000, **options)
+
+
+def test_full_buffer_is_flushed_as_one_insert(engine, run_id, monkeypatch):
+    writer = TimelineWriter(mode=DurabilityMode.BATCHED, max_batch=3)
+    batches = []
+    write = writer._write
+    monkeypatch.setattr(writer, "_write", lambda rows: batches.append(len(rows)) or write(rows))
+
+    for i in range(2):
+        writer.record(run_id, None, EventType.STEP_READY, f"event {i}")
+    assert stored(engine, run_id) == []
+
+    writer.record(run_id, None, EventType.STEP_READY, "event 2")
+    assert stored(engine, run_id) == ["event 0", "event 1", "event 2"]
+    assert batches == [3]
+
+
+def test_interval_flushes_a_partial_buffer(engine, run_id):
+    writer = batched(flush_interval=0.01)
+    writer.start()
+    try:
+        writer.record(run_id, None, EventType.STEP_READY, "event")
+        deadline = time.monotonic() + 5
+        while not stored(engine, run_id) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert stored(engine, run_id) == ["event"]
+    finally:
+        writer.close()
+
+
+def test_close_flushes_what_is_left(engine, run_id):
+    writer = batched(flush_interval=3600)
+    writer.start()
+    writer.record(run_id, None, EventType.STEP_READY, "last")
+    assert stored(engine, run_id) == []
+    writer.close()
+    assert stored(engine, run_id) == ["last"]
+
+
+def test_staged_event_commits_with_the_caller(engine, run_id):
+    writer = batched()
+    db = SessionLocal()
+    try:
+        writer.stage(db, run_id, None, EventType.STEP_READY, "rolled back")
+        db.rollback()
+        writer.stage(db, run_id, None, EventType.STEP_READY, "committed")
+        assert stored(engine, run_id) == []
+        db.commit()
+    finally:
+        db.close()
+
+    assert stored(engine, run_id) == ["committed"]
+    assert writer.flush() == 0
+
+
+def test_rejected_row_is_dropped_after_max_attempts(engine, run_id):
+    writer = batched(max_attempts=2)
+    before = dropped("rejected")
+
+    writer.record(run_id, None, EventType.STEP_READY, "first")
+    writer.record(MISSING_RUN, None, EventType.STEP_READY, "poison")  # FK violation
+    writer.record(run_id, None, EventType.STEP_READY, "second")
+
+    # The batch is retried whole, then row by row
+    assert writer.flush() == 0
+    assert writer.flush() == 0
+    assert writer.flush() == 2
+
+    assert stored(engine, run_id) == ["first", "second"]
+    assert dropped("rejected") == before + 1
+
+    # Later batches are written whole again
+    writer.record(run_id, None, EventType.STEP_READY, "third")
+    assert writer.flush() == 1
+    assert stored(engine, run_id) == ["first", "second", "third"]
+
+
+def test_outage_keeps_the_newest_events(engine, run_id, monkeypatch):
+    writer = batched(max_attempts=1, max_buffer=3)
+    before = dropped("buffer_full")
+
+    def unreachable(rows):
+        raise OperationalError("INSERT", {}, Exception("connection refused"))
+
+    monkeypatch.setattr(writer, "_write", unreachable)
+    for i in range(5):
+        writer.record(run_id, None, EventType.STEP_READY, f"event {i}")
+    assert dropped("buffer_full") == before + 2
+
+    # Neither the batch nor the row-by-row pass drops events while the database is down
+    assert writer.flush() == 0
+    assert writer.flush() == 0
+
+    monkeypatch.undo()
+    assert writer.flush() == 3
+    assert stored(engine, run_id) == ["event 2", "event 3", "event 4"]
+
+
+def test_sync_mode_commits_each_event(engine, run_id):
+    writer = TimelineWriter(mode=DurabilityMode.SYNC)
+    writer.record(run_id, None, EventType.STEP_READY, "now")
+    assert stored(engine, run_id) == ["now"]
+    assert writer.flush() == 0
+
+
+def test_payload_timestamp_matches_the_stored_one(engine, run_id):
+    writer = TimelineWriter(mode=DurabilityMode.SYNC)
+    writer.record(run_id, None, EventType.STEP_READY, "now")
+    with engine.connect() as conn:
+        event = conn.execute(
+            select(TimelineEvent.created_at, TimelineEvent.payload).where(
+                TimelineEvent.run_id == run_id
+            )
+        ).one()
+
+    # The same string a row without a payload is encoded with: naive UTC
+    timestamp = json.loads(event.payload)["timestamp"]
+    assert timestamp == event.created_at.isoformat()
+    assert datetime.fromisoformat(timestamp).tzinfo is None
@@ -0,0 +1,116 @@
+"""Tracing: spans nest through the current span, across threads and into the run's work."""
+
+import threading
+
+import pytest
+
+from services.dispatcher import RunDispatcher
+from services.orchestrator import Orchestrator
+from services.tracing import MemoryExporter, Span, folded_stacks, format_tree, tracer
+
+
+@pytest.fixture
+def spans():
+    """Record into memory for the test; tracing is off again afterwards."""
+    exporter = MemoryExporter()
+    tracer.configure(exporter)
+    yield exporter
+    tracer.configure(None)
+
+
+def by_name(exporter: MemoryExporter) -> dict[str, Span]:
+    return {span.name: span for span in exporter.spans()}
+
+
+def test_spans_nest_under_the_current_span(spans):
+    with tracer.span("outer", run_id=7) as outer:
+        with tracer.span("inner") as inner:
+            assert tracer.current() is inner
+        assert tracer.current() is outer
+    assert tracer.current() is None
+
+    assert [span.name for span in spans.spans()] == ["inner", "outer"]  # Exported on exit
+    assert outer.parent_id is None
+    assert inner.parent_id == outer.span_id
+    assert inner.trace_id == outer.trace_id
+    assert inner.run_id == 7  # Inherited
+
+
+def test_unrelated_spans_start_their_own_traces(spans):
+    with tracer.span("first"):
+        pass
+    with tracer.span("second"):
+        pass
+
+    first, second = spans.spans()
+    assert second.parent_id is None
+    assert first.trace_id != second.trace_id
+
+
+def test_a_failing_span_records_the_error_and_closes(spans):
+    with pytest.raises(ValueError):
+        with tracer.span("outer"):
+            with tracer.span("failing"):
+                raise ValueError("boom")
+
+    assert {name: span.error for name, span in by_name(spans).items()} == {
+        "failing": "ValueError",
+        "outer": "ValueError",
+    }
+    assert tracer.current() is None
+
+
+def test_another_thread_nests_under_the_span_it_is_handed(spans):
+    def work(parent):
+        assert tracer.current() is None  # Threads do not inherit the context
+        with tracer.span("worker", parent=parent):
+            pass
+
+    with tracer.span("request") as request:
+        thread = threading.Thread(target=work, args=(tracer.current(),))
+        thread.start()
+        thread.join()
+
+    assert by_name(spans)["worker"].parent_id == request.span_id
+
+
+def test_disabled_tracing_records_nothing():
+    assert not tracer.enabled
+    with tracer.span("ignored") as span:
+        assert span is None
+        assert tracer.current() is None
+
+
+def test_a_woken_drive_nests_under_the_waker(spans, user):
+    orchestrator = Orchestrator()
+    try:
+        run_id = orchestrator.create_workflow(user, "plan groceries").id
+    finally:
+        orchestrator.close()
+    spans.clear()  # The submit's own trace
+
+    dispatcher = RunDispatcher(workers=1)
+    dispatcher.start(recover=False)
+    try:
+        with tracer.span("request") as request:
+            dispatcher.wake(run_id)
+    finally:
+        dispatcher.stop()  # After the queued drive
+
+    recorded = by_name(spans)
+    drive = recorded["dispatcher.drive_run"]
+    assert drive.parent_id == request.span_id
+    assert drive.run_id == run_id
+
+    ids = {span.span_id: span for span in spans.spans()}
+    execute = recorded["executor.execute_step"]
+    assert ids[execute.parent_id] is drive
+    connector = next(span for span in spans.spans() if span.name.startswith("connector."))
+    assert connector.parent_id == execute.span_id
+    assert {span.trace_id for span in spans.spans()} == {request.trace_id}
+
+    # The tree and the flame graph stacks follow the same parents
+    tree = format_tree(spans.spans())
+    assert tree[0].split()[2] == "request"
+    stack = f"request;dispatcher.drive_run;executor.execute_step;{connector.name}"
+    assert stack in folded_stacks(spans.spans())
@@ -0,0 +1,93 @@
+"""Binary WebSocket channel: msgpack frames carrying the same events as SSE."""
+
+import json
+import zlib
+
+import msgpack
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from db import SessionLocal
+from main import app
+from services.approval import ApprovalService
+from services.dispatcher import drive_run
+from services.frames import FRAME_RAW, FRAME_ZLIB, MsgpackCodec, encode_payload, msgpack_event
+from services.timeline import timeline_writer
+from services.timeline_archive import iter_timeline
+
+
+def decode(message: bytes) -> list[dict]:
+    flag, body = message[0], message[1:]
+    if flag == FRAME_ZLIB:
+        body = zlib.decompress(body)
+    else:
+        assert flag == FRAME_RAW
+    return msgpack.unpackb(body)
+
+
+def events(count: int) -> list[bytes]:
+    return [
+        msgpack_event(i, encode_payload("step_ready", f"event {i}", "t", {"i": i}))
+        for i in range(1, count + 1)
+    ]
+
+
+@pytest.mark.parametrize("count", [1, 15, 16, 70_000])
+def test_batch_is_a_msgpack_array_of_event_maps(count):
+    decoded = decode(MsgpackCodec().batch(events(count)))
+    assert len(decoded) == count
+    assert decoded[-1] == {
+        "id": count,
+        "event": "step_ready",
+        "message": f"event {count}",
+        "timestamp": "t",
+        "metadata": {"i": count},
+    }
+
+
+def test_only_larger_messages_are_compressed():
+    codec = MsgpackCodec(compress=True, min_compress=256)
+    small, large = codec.batch(events(1)), codec.batch(events(50))
+    assert small[0] == FRAME_RAW
+    assert large[0] == FRAME_ZLIB
+    assert decode(large) == decode(MsgpackCodec().batch(events(50)))
+
+
+@pytest.fixture
+def finished_run(park_run) -> int:
+    run_id, approval_id = park_run()
+    service = ApprovalService()
+    try:
+        service.approve_step(approval_id, decided_by=1)
+    finally:
+        service.close()
+    drive_run(run_id)
+    timeline_writer.flush()
+    return run_id
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_finished_run_is_replayed_then_closed(finished_run, compress):
+    db = SessionLocal()
+    try:
+        expected = [json.loads(line) for _, line in iter_timeline(db, finished_run, tag_run=True)]
+    finally:
+        db.close()
+
+    received = []
+    url = f"/api/workflows/{finished_run}/ws?compress={str(compress).lower()}"
+    with TestClient(app).websocket_connect(url) as ws:
+        with pytest.raises(WebSocketDisconnect):
+            while True:
+                received += decode(ws.receive_bytes())
+
+    assert received[:-1] == expected
+    assert received[-1]["event"] == "workflow_complete"
+
+
+def test_unknown_run_is_closed_with_4404(user):
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with TestClient(app).websocket_connect("/api/workflows/999999/ws"):
+            pass
+    assert closed.value.code == 4404